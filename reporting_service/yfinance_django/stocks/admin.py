@@ -1,3 +1,15 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import FundamentalsSnapshot, NewsItem
+
+
+@admin.register(FundamentalsSnapshot)
+class FundamentalsSnapshotAdmin(admin.ModelAdmin):
+  list_display = ("ticker", "sector", "market_cap", "pe_ratio", "reporting_period", "checked_at")
+  search_fields = ("ticker",)
+
+
+@admin.register(NewsItem)
+class NewsItemAdmin(admin.ModelAdmin):
+  list_display = ("title", "publisher", "pub_date", "ingested_at")
+  search_fields = ("id", "title")
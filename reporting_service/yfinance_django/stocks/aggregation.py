@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .batching import get_quote_batcher
+from .instrumentation import phase
+from .providers import exchange_timezone
+
+# Multi-resolution intraday bars kept in memory, built from 1m bars.
+#
+# Each ticker holds a ring buffer of its latest 1m bars and, per higher
+# resolution, a ring buffer of aggregated bars whose last entry is still
+# forming. Only 1m bars newer than the ones held are folded in, and each
+# one updates every resolution in O(1): it either extends the forming bar
+# (high/low/close/volume) or starts the next one. A refreshed version of
+# the newest 1m bar only ever raises its high, lowers its low and adds
+# volume, so it is applied as a delta; anything else (a corrected open, a
+# shrunk range) rebuilds just the forming bars from the 1m buffer.
+#
+# Buckets follow the exchange's wall clock, in the ticker's
+# ``exchangeTimezoneName`` (batched downloads come back in UTC): intraday
+# ones are anchored at the session's first bar floored to the quarter
+# hour, so hourly bars start at 9:30 in New York and 9:15 in Mumbai like
+# Yahoo's; day bars are the session date.
+
+RESOLUTIONS = {"1m": 60, "5m": 300, "15m": 900, "1h": 3600, "1d": 86400}
+ANCHOR = 900
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+# 1m bar: (utc epoch, local epoch, open, high, low, close, volume)
+_TS, _LOCAL, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME = range(7)
+
+
+class TickerBars:
+  """Ring buffers of 1m and aggregated bars for one ticker."""
+
+  def __init__(self, capacity):
+    self.minutes = deque(maxlen=capacity)
+    # Aggregated bar: [local start, open, high, low, close, volume, utc offset]
+    self.aggregates = {res: deque(maxlen=capacity) for res in RESOLUTIONS if res != "1m"}
+    self.tz = "UTC"
+    self.session = None
+    self.anchor = None
+    self.latest = None
+
+  def _bucket(self, res, local):
+    seconds = RESOLUTIONS[res]
+    if seconds >= 86400:
+      return local - local % 86400
+    return self.anchor + (local - self.anchor) // seconds * seconds
+
+  def _start_session(self, local):
+    session = local - local % 86400
+    if session != self.session:
+      self.session = session
+      self.anchor = local - local % ANCHOR
+
+  def _add(self, res, m):
+    bars = self.aggregates[res]
+    start = self._bucket(res, m[_LOCAL])
+    bar = bars[-1] if bars else None
+    if bar is not None and bar[0] == start:
+      bar[2] = max(bar[2], m[_HIGH])
+      bar[3] = min(bar[3], m[_LOW])
+      bar[4] = m[_CLOSE]
+      bar[5] += m[_VOLUME]
+    else:
+      bars.append([start, m[_OPEN], m[_HIGH], m[_LOW], m[_CLOSE], m[_VOLUME], m[_LOCAL] - m[_TS]])
+
+  def append(self, m):
+    self._start_session(m[_LOCAL])
+    self.minutes.append(m)
+    for res in self.aggregates:
+      self._add(res, m)
+
+  def revise(self, m):
+    """Replace the newest 1m bar with a refreshed version of it."""
+    old = self.minutes[-1]
+    self.minutes[-1] = m
+    if m[_OPEN] == old[_OPEN] and m[_HIGH] >= old[_HIGH] and m[_LOW] <= old[_LOW]:
+      for bars in self.aggregates.values():
+        bar = bars[-1]
+        bar[2] = max(bar[2], m[_HIGH])
+        bar[3] = min(bar[3], m[_LOW])
+        bar[4] = m[_CLOSE]
+        bar[5] += m[_VOLUME] - old[_VOLUME]
+      return
+    for res, bars in self.aggregates.items():
+      start = bars.pop()[0]
+      forming = []
+      for minute in reversed(self.minutes):
+        if minute[_LOCAL] < start:
+          break
+        forming.append(minute)
+      for minute in reversed(forming):
+        self._add(res, minute)
+
+  def frame(self, res, limit):
+    if res == "1m":
+      rows = [(m[_TS], *m[_OPEN:]) for m in list(self.minutes)[-limit:]]
+    else:
+      # Intraday starts go back to UTC through the offset they were seen
+      # with; day bars are the session date at local midnight.
+      day = res == "1d"
+      rows = [(bar[0] if day else bar[0] - bar[6], *bar[1:6]) for bar in list(self.aggregates[res])[-limit:]]
+    df = pd.DataFrame(rows, columns=["ts"] + FIELDS)
+    ts = df.pop("ts")
+    if res == "1d":
+      index = pd.DatetimeIndex(pd.to_datetime(ts, unit="s"), name="Date").tz_localize(self.tz)
+    else:
+      index = pd.DatetimeIndex(pd.to_datetime(ts, unit="s", utc=True), name="Datetime").tz_convert(self.tz)
+    df.index = index
+    if df["Volume"].notna().all():
+      df["Volume"] = df["Volume"].astype("int64")
+    return df
+
+
+class IntradayAggregator:
+  """Keeps ``TickerBars`` per ticker, fed from batched 1m downloads.
+
+  A ticker is refreshed when a request finds its bars older than
+  ``refresh_after`` seconds; concurrent refreshes share one download
+  through the quote batcher.
+  """
+
+  def __init__(self, capacity=2000, refresh_after=5, max_tickers=1000):
+    self.capacity = capacity
+    self.refresh_after = refresh_after
+    self.max_tickers = max_tickers
+    self._lock = threading.Lock()
+    self._tickers = {}
+    self._refreshed = {}
+
+  def ingest(self, ticker, frame):
+    """Fold in the 1m bars of ``frame`` that are not held yet; returns how many."""
+    if frame is None or frame.empty:
+      return 0
+    # Looked up outside the lock: it may have to ask upstream.
+    tz = exchange_timezone(ticker) if ticker not in self._tickers else None
+    with self._lock:
+      bars = self._tickers.get(ticker)
+      if bars is None:
+        if len(self._tickers) >= self.max_tickers:
+          evicted = next(iter(self._tickers))
+          self._tickers.pop(evicted)
+          self._refreshed.pop(evicted, None)
+        bars = self._tickers[ticker] = TickerBars(self.capacity)
+        bars.tz = tz or exchange_timezone(ticker)
+
+      last = bars.minutes[-1][_TS] if bars.minutes else None
+      # Bars come in time order; everything before the newest held one is final.
+      start = int(np.searchsorted(frame.index.asi8 // 10**9, last)) if last is not None else 0
+      tail = frame.iloc[start:]
+      if tail.empty:
+        return 0
+
+      index = tail.index if tail.index.tz is not None else tail.index.tz_localize("UTC")
+      utc = index.asi8 // 10**9
+      local = index.tz_convert(bars.tz).tz_localize(None).asi8 // 10**9
+      values = tail[FIELDS].to_numpy(dtype=float)
+      folded = 0
+      for i in range(len(tail)):
+        o, h, l, c, v = values[i]
+        m = (int(utc[i]), int(local[i]), o, h, l, c, 0.0 if np.isnan(v) else v)
+        if last is not None and m[_TS] == last:
+          if m != bars.minutes[-1]:
+            bars.revise(m)
+            folded += 1
+        else:
+          bars.append(m)
+          folded += 1
+        last = m[_TS]
+      bars.latest = frame.iloc[-1:]
+      return folded
+
+  @phase("fetch")
+  def refresh(self, tickers, force=False):
+    now = time.monotonic()
+    with self._lock:
+      stale = [
+        t for t in tickers
+        if force or now - self._refreshed.get(t, -self.refresh_after - 1) > self.refresh_after
+      ]
+    if not stale:
+      return
+    frames = get_quote_batcher().bars(stale)
+    for ticker in stale:
+      self.ingest(ticker, frames.get(ticker))
+    with self._lock:
+      for ticker in stale:
+        self._refreshed.pop(ticker, None)
+        self._refreshed[ticker] = now
+      while len(self._refreshed) > self.max_tickers:
+        self._refreshed.pop(next(iter(self._refreshed)))
+
+  def latest(self, tickers):
+    """The newest 1m bar per ticker as a one-row frame, or ``None``."""
+    self.refresh(tickers)
+    with self._lock:
+      return {t: self._tickers[t].latest if t in self._tickers else None for t in tickers}
+
+  def bars(self, ticker, resolution="1m", limit=None):
+    """The last ``limit`` bars of ``resolution``, the newest one possibly still forming."""
+    if resolution not in RESOLUTIONS:
+      raise ValueError(f"Unsupported resolution: {resolution}. Use one of {', '.join(RESOLUTIONS)}")
+    self.refresh([ticker])
+    with self._lock:
+      bars = self._tickers.get(ticker)
+      if bars is None:
+        return None
+      return bars.frame(resolution, limit or self.capacity)
+
+  def stats(self):
+    with self._lock:
+      return {"tickers": len(self._tickers), "minutes": sum(len(b.minutes) for b in self._tickers.values())}
+
+
+_aggregator = None
+
+
+def get_intraday_aggregator():
+  global _aggregator
+  if _aggregator is None:
+    _aggregator = IntradayAggregator(
+      capacity=getattr(settings, "STOCKS_INTRADAY_CAPACITY", 2000),
+      refresh_after=getattr(settings, "STOCKS_INTRADAY_REFRESH_SECONDS", 5),
+    )
+  return _aggregator
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class StocksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stocks'
+
+    def ready(self):
+        if getattr(settings, "STOCKS_PREFETCH_ON_STARTUP", False):
+            from .prefetch import get_prefetcher
+            get_prefetcher().start()
+        if getattr(settings, "STOCKS_NEWS_POLL_ON_STARTUP", False):
+            from .news import get_news_store
+            get_news_store().start()
@@ -0,0 +1,363 @@
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack, closing
+
+import pandas as pd
+from django.conf import settings
+
+from .instrumentation import mark_stale, phase
+from .providers import exchange_timezone, get_provider, is_intraday, period_reach, period_start
+from .resilience import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+# (store column, yfinance column)
+COLUMNS = [
+  ("open", "Open"),
+  ("high", "High"),
+  ("low", "Low"),
+  ("close", "Close"),
+  ("volume", "Volume"),
+  ("dividends", "Dividends"),
+  ("stock_splits", "Stock Splits"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+  ticker TEXT NOT NULL,
+  interval TEXT NOT NULL,
+  ts INTEGER NOT NULL,
+  open REAL, high REAL, low REAL, close REAL, volume REAL,
+  dividends REAL, stock_splits REAL,
+  PRIMARY KEY (ticker, interval, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sync_state (
+  ticker TEXT NOT NULL,
+  interval TEXT NOT NULL,
+  covered_from INTEGER NOT NULL,
+  synced_at REAL NOT NULL,
+  PRIMARY KEY (ticker, interval)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS revisions (
+  ticker TEXT NOT NULL,
+  interval TEXT NOT NULL,
+  revision INTEGER NOT NULL,
+  PRIMARY KEY (ticker, interval)
+) WITHOUT ROWID;
+"""
+
+# A stored bar that moves by more than this when the tail is re-fetched
+# means Yahoo re-adjusted the series (split/dividend), so the ticker is
+# downloaded again from scratch.
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# Periods synced to cover an explicit start date, shortest first.
+COVERING_PERIODS = ["5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "max"]
+
+
+def covering_period(start):
+  """Shortest period whose download is sure to reach back to ``start``."""
+  start = pd.Timestamp(start)
+  if start.tz is not None:
+    start = start.tz_convert(None)
+  for period in COVERING_PERIODS:
+    if period_reach(period) <= start:
+      return period
+  return "max"
+
+
+class BarStore:
+  """Local OHLCV store with incremental backfill.
+
+  Bars are kept in SQLite keyed by ``(ticker, interval, ts)``. Reads first
+  make sure the requested window is covered: tickers never seen before are
+  downloaded for the whole window, known tickers only fetch the tail since
+  their last stored bar. Daily bars are stored by exchange-local date so
+  tickers from different markets line up; intraday bars are stored in UTC.
+  Tickers upstream has no bars for are asked again after
+  ``refresh_after["empty"]`` seconds at the earliest.
+  """
+
+  def __init__(self, path, refresh_after=None):
+    self.path = str(path)
+    self.refresh_after = {"intraday": 60, "daily": 15 * 60, "empty": 5 * 60, **(refresh_after or {})}
+    self._lock = threading.Lock()
+    self._ticker_locks = {}
+    with closing(self._connect()) as conn:
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.executescript(SCHEMA)
+
+  def _connect(self):
+    return sqlite3.connect(self.path, timeout=30)
+
+  def _to_epoch(self, index, interval):
+    index = pd.DatetimeIndex(index)
+    if not is_intraday(interval) and index.tz is not None:
+      index = index.tz_localize(None)
+    elif is_intraday(interval) and index.tz is None:
+      index = index.tz_localize("UTC")
+    return index.asi8 // 10**9
+
+  def _from_epoch(self, values, interval):
+    if is_intraday(interval):
+      return pd.to_datetime(values, unit="s", utc=True)
+    return pd.to_datetime(values, unit="s")
+
+  def _epoch(self, ts, interval):
+    return int(self._to_epoch([ts], interval)[0])
+
+  def _state(self, conn, tickers, interval):
+    placeholders = ",".join("?" * len(tickers))
+    rows = conn.execute(
+      f"SELECT ticker, covered_from, synced_at FROM sync_state WHERE interval = ? AND ticker IN ({placeholders})",
+      [interval, *tickers],
+    ).fetchall()
+    return {ticker: (covered_from, synced_at) for ticker, covered_from, synced_at in rows}
+
+  def _overlap_bar(self, conn, ticker, interval):
+    # Second to last bar: the last one may still be forming.
+    rows = conn.execute(
+      "SELECT ts, close FROM bars WHERE ticker = ? AND interval = ? ORDER BY ts DESC LIMIT 2",
+      [ticker, interval],
+    ).fetchall()
+    return rows[-1] if rows else None
+
+  def write(self, conn, ticker, interval, frame):
+    frame = frame.dropna(subset=["Close"])
+    if frame.empty:
+      return 0
+    epochs = self._to_epoch(frame.index, interval)
+    values = [
+      frame[column].astype(float).tolist() if column in frame else [None] * len(frame)
+      for _, column in COLUMNS
+    ]
+    rows = [(ticker, interval, int(ts), *row) for ts, *row in zip(epochs, *values)]
+    conn.executemany(
+      f"INSERT OR REPLACE INTO bars (ticker, interval, ts, {', '.join(c for c, _ in COLUMNS)}) "
+      f"VALUES (?, ?, ?, {', '.join('?' * len(COLUMNS))})",
+      rows,
+    )
+    return len(rows)
+
+  def _sync_locks(self, tickers):
+    # Sorted, so concurrent syncs of overlapping tickers cannot deadlock.
+    with self._lock:
+      return [self._ticker_locks.setdefault(t, threading.Lock()) for t in sorted(set(tickers))]
+
+  def _mark_synced(self, conn, ticker, interval, covered_from, empty=False):
+    synced_at = time.time()
+    if empty:
+      # Backdated so the ticker goes stale after the shorter "empty" age.
+      refresh_after = self.refresh_after["intraday" if is_intraday(interval) else "daily"]
+      synced_at -= max(refresh_after - self.refresh_after["empty"], 0)
+    conn.execute(
+      "INSERT OR REPLACE INTO sync_state (ticker, interval, covered_from, synced_at) VALUES (?, ?, ?, ?)",
+      [ticker, interval, covered_from, synced_at],
+    )
+
+  def _download(self, tickers, interval, **window):
+    data = get_provider().download(tickers, interval=interval, group_by="ticker", actions=True, **window)
+    frames = {}
+    if data is None or data.empty:
+      return frames
+    for ticker in tickers:
+      try:
+        frames[ticker] = data[ticker]
+      except KeyError:
+        continue
+    return frames
+
+  @phase("fetch")
+  def sync(self, tickers, period="6mo", interval="1d"):
+    """Make sure ``period`` of ``interval`` bars is stored for every ticker.
+
+    Coverage is recorded from ``period_reach``, not the padded
+    ``period_start``, so a session-counted download never claims days it
+    did not fetch.
+    """
+    start = self._epoch(period_reach(period), interval)
+    refresh_after = self.refresh_after["intraday" if is_intraday(interval) else "daily"]
+
+    with ExitStack() as stack:
+      for lock in self._sync_locks(tickers):
+        stack.enter_context(lock)
+      conn = stack.enter_context(closing(self._connect()))
+      state = self._state(conn, tickers, interval)
+      now = time.time()
+      missing = [t for t in tickers if t not in state or state[t][0] > start]
+      stale = [t for t in tickers if t not in missing and now - state[t][1] > refresh_after]
+
+      # Tail refresh for tickers we already hold, one download for all of them.
+      if stale:
+        overlaps = {t: self._overlap_bar(conn, t, interval) for t in stale}
+        known = [o[0] for o in overlaps.values() if o]
+        tail_from = self._from_epoch([min(known)], interval)[0] if known else period_start(period)
+        try:
+          frames = self._download(stale, interval, start=tail_from.strftime("%Y-%m-%d"))
+        except UpstreamUnavailable as e:
+          # Serve the bars we already have rather than failing.
+          logger.warning(f"Tail refresh skipped, serving stored bars: {str(e)}")
+          mark_stale()
+          stale = []
+        for ticker in stale:
+          frame = frames.get(ticker)
+          overlap = overlaps[ticker]
+          if frame is None or frame.dropna(subset=["Close"]).empty:
+            self._mark_synced(conn, ticker, interval, state[ticker][0], empty=overlap is None)
+            continue
+          if overlap and self._was_readjusted(frame, overlap, interval):
+            logger.info(f"{ticker} was re-adjusted upstream, backfilling again")
+            conn.execute("DELETE FROM bars WHERE ticker = ? AND interval = ?", [ticker, interval])
+            conn.execute(
+              "INSERT INTO revisions (ticker, interval, revision) VALUES (?, ?, 1) "
+              "ON CONFLICT (ticker, interval) DO UPDATE SET revision = revision + 1",
+              [ticker, interval],
+            )
+            missing.append(ticker)
+            continue
+          self.write(conn, ticker, interval, frame)
+          self._mark_synced(conn, ticker, interval, state[ticker][0])
+        # Don't hold SQLite's write lock across the backfill download.
+        conn.commit()
+
+      if missing:
+        logger.info(f"Backfilling {period} of {interval} bars for {missing}")
+        frames = self._download(missing, interval, period=period)
+        for ticker in missing:
+          frame = frames.get(ticker)
+          written = self.write(conn, ticker, interval, frame) if frame is not None else 0
+          self._mark_synced(conn, ticker, interval, start, empty=not written)
+      conn.commit()
+
+  def _was_readjusted(self, frame, overlap, interval):
+    ts, stored_close = overlap
+    epochs = self._to_epoch(frame.index, interval)
+    matches = frame["Close"].to_numpy()[epochs == ts]
+    if not len(matches) or not stored_close:
+      return False
+    return abs(matches[0] - stored_close) / abs(stored_close) > ADJUSTMENT_TOLERANCE
+
+  @phase("fetch")
+  def _read(self, tickers, period, interval, since=None):
+    start = self._epoch(period_start(period) if since is None else since, interval)
+    placeholders = ",".join("?" * len(tickers))
+    with closing(self._connect()) as conn:
+      df = pd.read_sql_query(
+        f"SELECT * FROM bars WHERE interval = ? AND ts >= ? AND ticker IN ({placeholders}) ORDER BY ts",
+        conn,
+        params=[interval, start, *tickers],
+      )
+    df["ts"] = self._from_epoch(df["ts"], interval)
+    if df["volume"].notna().all():
+      df["volume"] = df["volume"].astype("int64")
+    return df.rename(columns=dict(COLUMNS))
+
+  def _trim(self, df, period, interval, ticker):
+    # "Nd" periods mean the last N sessions, not N calendar days.
+    if not (period.endswith("d") and period[:-1].isdigit()):
+      return df
+    sessions = int(period[:-1])
+    if not is_intraday(interval):
+      return df.tail(sessions)
+    if df.empty:
+      return df
+    # Intraday bars are stored in UTC; sessions are exchange-local dates.
+    days = df.index.tz_convert(exchange_timezone(ticker)).normalize()
+    return df[days >= days.unique()[-sessions:].min()]
+
+  def history(self, ticker, period="5d", interval="1d", start=None, end=None):
+    """OHLCV bars for one ticker, shaped like ``Ticker.history``.
+
+    ``start``/``end`` (dates, ``end`` exclusive like yfinance) take
+    precedence over ``period``.
+    """
+    ticker = ticker.upper()
+    if start is not None:
+      period = covering_period(start)
+    self.sync([ticker], period, interval)
+    df = self._read([ticker], period, interval, since=start)
+    index_name = "Datetime" if is_intraday(interval) else "Date"
+    df = df.drop(columns=["ticker", "interval"]).set_index("ts").rename_axis(index_name)
+    if end is not None:
+      df = df[df.index < self._from_epoch([self._epoch(end, interval)], interval)[0]]
+    return df if start is not None else self._trim(df, period, interval, ticker)
+
+  def version(self, ticker, period="5d", interval="1d", start=None):
+    """Fingerprint of the stored window; changes whenever a bar is added or revised."""
+    ticker = ticker.upper()
+    if start is not None:
+      period = covering_period(start)
+    self.sync([ticker], period, interval)
+    since = self._epoch(period_start(period) if start is None else start, interval)
+    with closing(self._connect()) as conn:
+      return conn.execute(
+        "SELECT COUNT(*), MAX(ts), TOTAL(close), TOTAL(volume) FROM bars "
+        "WHERE ticker = ? AND interval = ? AND ts >= ?",
+        [ticker, interval, since],
+      ).fetchone()
+
+  def held(self, tickers, interval="1d"):
+    """The ``tickers`` that have stored bars, in the given order."""
+    tickers = [t.upper() for t in tickers]
+    if not tickers:
+      return []
+    placeholders = ",".join("?" * len(tickers))
+    with closing(self._connect()) as conn:
+      rows = conn.execute(
+        f"SELECT ticker FROM sync_state s WHERE interval = ? AND ticker IN ({placeholders}) "
+        "AND EXISTS (SELECT 1 FROM bars b WHERE b.ticker = s.ticker AND b.interval = s.interval)",
+        [interval, *tickers],
+      ).fetchall()
+    found = {ticker for ticker, in rows}
+    return [t for t in tickers if t in found]
+
+  def revision(self, tickers, interval="1d"):
+    """Grows whenever stored history of ``tickers`` is rewritten rather than appended to."""
+    tickers = [t.upper() for t in tickers]
+    if not tickers:
+      return 0
+    placeholders = ",".join("?" * len(tickers))
+    with closing(self._connect()) as conn:
+      return conn.execute(
+        f"SELECT TOTAL(revision) FROM revisions WHERE interval = ? AND ticker IN ({placeholders})",
+        [interval, *tickers],
+      ).fetchone()[0]
+
+  def bars(self, tickers, period="6mo", interval="1d"):
+    """Bars in long format, one row per ticker and timestamp."""
+    tickers = [t.upper() for t in tickers]
+    self.sync(tickers, period, interval)
+    return self._read(tickers, period, interval)
+
+  def wide(self, tickers, column="Close", period="6mo", interval="1d", since=None):
+    """One OHLCV column with one frame column per ticker, aligned on timestamp.
+
+    With ``since``, only bars at or after that timestamp are returned (the
+    window is still synced as a whole).
+    """
+    tickers = [t.upper() for t in tickers]
+    self.sync(tickers, period, interval)
+    df = self._read(tickers, period, interval, since)
+    wide = df.pivot(index="ts", columns="ticker", values=column)
+    wide = wide.reindex(columns=[t for t in tickers if t in wide.columns])
+    return wide if since is not None or not tickers else self._trim(wide, period, interval, tickers[0])
+
+  def closes(self, tickers, period="6mo", interval="1d", since=None):
+    return self.wide(tickers, "Close", period, interval, since)
+
+
+_store = None
+
+
+def get_bar_store():
+  global _store
+  if _store is None:
+    _store = BarStore(
+      getattr(settings, "STOCKS_BAR_STORE_PATH", "bars.sqlite3"),
+      getattr(settings, "STOCKS_BAR_STORE_REFRESH", None),
+    )
+  return _store
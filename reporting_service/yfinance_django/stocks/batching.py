@@ -0,0 +1,107 @@
+import logging
+import threading
+
+from django.conf import settings
+
+from .instrumentation import phase
+from .providers import get_provider, uncached
+
+logger = logging.getLogger(__name__)
+
+
+class _Batch:
+  def __init__(self):
+    self.tickers = []
+    self.full = threading.Event()
+    self.done = threading.Event()
+    self.data = None
+    self.error = None
+
+
+class QuoteBatcher:
+  """Coalesces live-quote lookups from concurrent requests.
+
+  The first request to arrive opens a batch and waits ``window`` seconds
+  (or until ``max_size`` tickers joined); every request arriving meanwhile
+  adds its tickers to the same batch. A single ``download`` then fetches
+  1m bars for all of them and each waiting request picks its own rows out
+  of the shared frame. The download skips the response cache: its key
+  would depend on who happened to share the batch, and live quotes must be
+  fresher than the cache's intraday TTL.
+  """
+
+  def __init__(self, window=0.05, max_size=200, timeout=30):
+    self.window = window
+    self.max_size = max_size
+    self.timeout = timeout
+    self._lock = threading.Lock()
+    self._open = None
+    self.batches = 0
+    self.requests = 0
+
+  def _join(self, tickers):
+    with self._lock:
+      self.requests += 1
+      batch = self._open
+      leader = batch is None
+      if leader:
+        batch = self._open = _Batch()
+      for ticker in tickers:
+        if ticker not in batch.tickers:
+          batch.tickers.append(ticker)
+      if len(batch.tickers) >= self.max_size:
+        self._open = None
+        batch.full.set()
+    return batch, leader
+
+  def _run(self, batch):
+    batch.full.wait(self.window)
+    with self._lock:
+      if self._open is batch:
+        self._open = None
+      self.batches += 1
+    try:
+      batch.data = uncached(get_provider()).download(
+        list(batch.tickers), period="1d", interval="1m", group_by="ticker",
+      )
+    except Exception as e:
+      logger.error(f"Batched quote download failed: {str(e)}")
+      batch.error = e
+    finally:
+      batch.done.set()
+
+  @phase("fetch")
+  def bars(self, tickers):
+    """Today's 1m bars per ticker; tickers without data map to ``None``."""
+    batch, leader = self._join(tickers)
+    if leader:
+      self._run(batch)
+    elif not batch.done.wait(self.timeout):
+      raise TimeoutError("Timed out waiting for batched quote download")
+
+    if batch.error is not None:
+      raise batch.error
+    results = {}
+    for ticker in tickers:
+      try:
+        results[ticker] = batch.data[ticker].dropna()
+      except (KeyError, TypeError):
+        results[ticker] = None
+    return results
+
+  def stats(self):
+    with self._lock:
+      return {"requests": self.requests, "batches": self.batches}
+
+
+_batcher = None
+
+
+def get_quote_batcher():
+  global _batcher
+  if _batcher is None:
+    _batcher = QuoteBatcher(
+      window=getattr(settings, "STOCKS_QUOTE_BATCH_WINDOW_MS", 50) / 1000.0,
+      max_size=getattr(settings, "STOCKS_QUOTE_BATCH_MAX", 200),
+    )
+  return _batcher
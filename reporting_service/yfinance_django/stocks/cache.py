@@ -0,0 +1,279 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+from .instrumentation import mark_stale, record_cache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def is_empty(value):
+  if value is None:
+    return True
+  empty = getattr(value, "empty", None)
+  if isinstance(empty, bool):
+    return empty
+  try:
+    return len(value) == 0
+  except TypeError:
+    return False
+
+
+class SharedFileCache(FileBasedCache):
+  """``FileBasedCache`` whose ``add`` is atomic across processes.
+
+  Django's ``add`` checks for the key and then writes it, so two workers
+  can both take the same fetch lease. Here the entry is written to a temp
+  file and hard-linked into place, which fails if the key already exists.
+  """
+
+  def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+    if self.has_key(key, version):  # also removes an expired entry
+      return False
+    self._createdir()
+    fname = self._key_to_file(key, version)
+    fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+    try:
+      with open(fd, "wb") as f:
+        self._write_content(f, timeout, value)
+      os.link(tmp_path, fname)
+      return True
+    except FileExistsError:
+      return False
+    finally:
+      os.remove(tmp_path)
+
+
+class _InFlight:
+  def __init__(self):
+    self.event = threading.Event()
+    self.value = None
+    self.error = None
+    self.stale = False
+
+
+class TieredCache:
+  """In-process LRU with per-entry expiry, optionally backed by a shared
+  Django cache so several workers can reuse each other's fetches.
+
+  Concurrent misses for the same key are coalesced: the first caller runs
+  ``fetch`` and everybody else waits for its result instead of going
+  upstream too.
+
+  With a shared cache, misses are coalesced across processes as well: the
+  fetching process holds a lease on the key for up to ``lease_timeout``
+  seconds and other processes wait for its result to appear in the shared
+  cache instead of fetching it again.
+
+  Expired entries are kept for another ``stale_for`` seconds as
+  last-known-good values: when a refetch fails, the stale value is served
+  instead (and the current request marked stale).
+  """
+
+  def __init__(self, max_entries=2048, shared=None, empty_ttl=30, stale_for=0, lease_timeout=15, poll_interval=0.05):
+    self.max_entries = max_entries
+    self.shared = shared
+    self.empty_ttl = empty_ttl
+    self.stale_for = stale_for
+    self.lease_timeout = lease_timeout
+    self.poll_interval = poll_interval
+    self._entries = OrderedDict()
+    self._inflight = {}
+    self._lock = threading.Lock()
+    self._stats = Counter()
+
+  def _count(self, name):
+    with self._lock:
+      self._stats[name] += 1
+    record_cache(name)
+
+  def _shared_key(self, key):
+    return "stocks:" + hashlib.sha1(repr(key).encode()).hexdigest()
+
+  def _get_local(self, key, allow_stale=False):
+    entry = self._entries.get(key)
+    if entry is None:
+      return _MISSING
+    expires_at, value = entry
+    now = time.monotonic()
+    if expires_at < now:
+      if expires_at + self.stale_for < now:
+        del self._entries[key]
+        return _MISSING
+      if not allow_stale:
+        return _MISSING
+    self._entries.move_to_end(key)
+    return value
+
+  def _set_local(self, key, value, ttl):
+    self._entries[key] = (time.monotonic() + ttl, value)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_entries:
+      self._entries.popitem(last=False)
+
+  def get(self, key):
+    with self._lock:
+      value = self._get_local(key)
+    if value is not _MISSING:
+      self._count("memory_hits")
+      return value
+
+    if self.shared is not None:
+      try:
+        found = self.shared.get(self._shared_key(key), _MISSING)
+      except Exception as e:
+        logger.warning(f"Shared cache read failed: {e}")
+        found = _MISSING
+      if found is not _MISSING and found[0] > time.time():
+        expires_at, value = found
+        self._count("shared_hits")
+        with self._lock:
+          self._set_local(key, value, expires_at - time.time())
+        return value
+    return _MISSING
+
+  def get_stale(self, key):
+    """The last value stored under ``key``, even if expired (within ``stale_for``)."""
+    with self._lock:
+      value = self._get_local(key, allow_stale=True)
+    if value is not _MISSING or self.shared is None:
+      return value
+    try:
+      found = self.shared.get(self._shared_key(key), _MISSING)
+    except Exception:
+      return _MISSING
+    if found is _MISSING or found[0] + self.stale_for < time.time():
+      return _MISSING
+    return found[1]
+
+  def _read_shared(self, key):
+    try:
+      found = self.shared.get(self._shared_key(key), _MISSING)
+    except Exception:
+      return _MISSING
+    if found is _MISSING or found[0] <= time.time():
+      return _MISSING
+    return found
+
+  def _claim(self, key):
+    """Take the cross-process fetch lease for ``key``; False if another process holds it."""
+    if self.shared is None:
+      return True
+    try:
+      return self.shared.add(self._shared_key(key) + ":lease", os.getpid(), self.lease_timeout)
+    except Exception as e:
+      logger.warning(f"Shared cache lease failed: {e}")
+      return True
+
+  def _release(self, key):
+    try:
+      self.shared.delete(self._shared_key(key) + ":lease")
+    except Exception as e:
+      logger.warning(f"Shared cache lease release failed: {e}")
+
+  def _await_peer(self, key):
+    """Wait for the process holding the lease to publish ``key``."""
+    deadline = time.monotonic() + self.lease_timeout
+    lease = self._shared_key(key) + ":lease"
+    while time.monotonic() < deadline:
+      time.sleep(self.poll_interval)
+      found = self._read_shared(key)
+      if found is not _MISSING:
+        expires_at, value = found
+        with self._lock:
+          self._set_local(key, value, expires_at - time.time())
+        return value
+      try:
+        if not self.shared.has_key(lease):
+          break  # the other fetch failed; try ourselves
+      except Exception:
+        break
+    return _MISSING
+
+  def set(self, key, value, ttl):
+    if is_empty(value):
+      ttl = min(ttl, self.empty_ttl)
+    with self._lock:
+      self._set_local(key, value, ttl)
+    if self.shared is not None:
+      try:
+        self.shared.set(self._shared_key(key), (time.time() + ttl, value), ttl + self.stale_for)
+      except Exception as e:
+        logger.warning(f"Shared cache write failed: {e}")
+
+  def get_or_fetch(self, key, ttl, fetch):
+    value = self.get(key)
+    if value is not _MISSING:
+      return value
+
+    with self._lock:
+      value = self._get_local(key)
+      if value is not _MISSING:
+        self._stats["memory_hits"] += 1
+        record_cache("memory_hits")
+        return value
+      call = self._inflight.get(key)
+      leader = call is None
+      if leader:
+        call = self._inflight[key] = _InFlight()
+
+    if not leader:
+      self._count("coalesced")
+      call.event.wait()
+      if call.error is not None:
+        raise call.error
+      if call.stale:
+        mark_stale()
+      return call.value
+
+    claimed = self._claim(key)
+    try:
+      if not claimed:
+        value = self._await_peer(key)
+        if value is not _MISSING:
+          self._count("coalesced")
+          call.value = value
+          return value
+      self._count("misses")
+      call.value = fetch()
+      self.set(key, call.value, ttl)
+      return call.value
+    except Exception as e:
+      stale = self.get_stale(key)
+      if stale is _MISSING:
+        call.error = e
+        raise
+      logger.warning(f"Serving stale data after fetch failure: {e}")
+      self._count("stale")
+      mark_stale()
+      call.value, call.stale = stale, True
+      return stale
+    finally:
+      if claimed and self.shared is not None:
+        self._release(key)
+      with self._lock:
+        self._inflight.pop(key, None)
+      call.event.set()
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._stats.clear()
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats["entries"] = len(self._entries)
+    hits = stats.get("memory_hits", 0) + stats.get("shared_hits", 0) + stats.get("coalesced", 0)
+    lookups = hits + stats.get("misses", 0)
+    stats["hit_ratio"] = round(hits / lookups, 4) if lookups else None
+    return stats
@@ -0,0 +1,195 @@
+import threading
+from collections import deque
+
+import numpy as np
+from django.conf import settings
+
+from .bar_store import get_bar_store
+
+# Rolling windows in daily bars, and the store period read to fill them.
+WINDOWS = {
+  "1mo": (21, "2mo"),
+  "3mo": (63, "6mo"),
+  "6mo": (126, "1y"),
+  "1y": (252, "2y"),
+}
+WINDOW_ALIASES = {"1m": "1mo", "3m": "3mo", "6m": "6mo"}
+
+
+def resolve_window(window):
+  window = WINDOW_ALIASES.get(window, window)
+  if window not in WINDOWS:
+    raise ValueError(f"Unsupported window: {window}. Use one of {', '.join(WINDOWS)}")
+  return window
+
+
+class RollingCorrelation:
+  """Pairwise correlation of daily returns over the last ``window`` bars.
+
+  Instead of re-running ``DataFrame.corr()`` on every request, the engine
+  keeps running sums, sums of squares and cross-products for every ticker
+  pair. A new bar is folded in (and the bar leaving the window taken out)
+  with a few O(N^2) array updates. Pairs only count bars where both
+  tickers have a return, like pandas' pairwise-complete ``corr``.
+
+  The latest bar may still be forming, so it is treated as provisional and
+  replaced whenever its close changes.
+  """
+
+  def __init__(self, window):
+    self.window = window
+    self.tickers = []
+    self._positions = {}
+    self._rows = deque()
+    self._last_ts = None
+    self._prev_close = None
+    self._last_close = None
+
+  def _reset_sums(self, size):
+    self._n = np.zeros((size, size))
+    self._sx = np.zeros((size, size))
+    self._sxx = np.zeros((size, size))
+    self._sxy = np.zeros((size, size))
+
+  def _apply(self, x, m, sign):
+    # x holds returns with missing ones zeroed; m marks the valid entries.
+    self._n += sign * np.outer(m, m)
+    self._sx += sign * np.outer(x, m)
+    self._sxx += sign * np.outer(x * x, m)
+    self._sxy += sign * np.outer(x, x)
+
+  def _push(self, returns):
+    m = (~np.isnan(returns)).astype(float)
+    x = np.nan_to_num(returns)
+    self._rows.append((x, m))
+    self._apply(x, m, 1)
+    if len(self._rows) > self.window:
+      old_x, old_m = self._rows.popleft()
+      self._apply(old_x, old_m, -1)
+
+  def _pop(self):
+    x, m = self._rows.pop()
+    self._apply(x, m, -1)
+
+  def rebuild(self, closes):
+    """Recompute every sum from a wide frame of closes (one column per ticker)."""
+    self.tickers = list(closes.columns)
+    self._positions = {t: i for i, t in enumerate(self.tickers)}
+    self._rows.clear()
+    self._reset_sums(len(self.tickers))
+    self._last_ts = None
+    if len(closes) < 2:
+      return
+
+    returns = closes.pct_change(fill_method=None).iloc[1:].tail(self.window).to_numpy()
+    valid = ~np.isnan(returns)
+    x = np.nan_to_num(returns)
+    m = valid.astype(float)
+    self._n = m.T @ m
+    self._sx = x.T @ m
+    self._sxx = (x * x).T @ m
+    self._sxy = x.T @ x
+    self._rows.extend(zip(x, m))
+
+    values = closes.to_numpy()
+    self._prev_close, self._last_close = values[-2], values[-1]
+    self._last_ts = closes.index[-1]
+
+  def update(self, closes):
+    """Fold in bars from ``closes``, which must start at the last seen bar."""
+    if self._last_ts is None or closes.empty:
+      return
+    closes = closes.reindex(columns=self.tickers)
+    values = closes.to_numpy()
+    index = list(closes.index)
+
+    prev = self._last_close
+    if index[0] == self._last_ts:
+      if len(index) == 1 and np.array_equal(values[0], self._last_close, equal_nan=True):
+        return
+      # Replace the provisional last bar with its refreshed close.
+      self._pop()
+      prev = self._prev_close
+
+    for ts, close in zip(index, values):
+      if ts < self._last_ts:
+        continue
+      with np.errstate(divide="ignore", invalid="ignore"):
+        self._push(close / prev - 1)
+      self._prev_close, self._last_close, prev = prev, close, close
+      self._last_ts = ts
+
+  def matrix(self, tickers):
+    """Correlation matrix for ``tickers`` (all known), as a 2-D array."""
+    idx = [self._positions[t] for t in tickers]
+    grid = np.ix_(idx, idx)
+    n, sx, sxx, sxy = self._n[grid], self._sx[grid], self._sxx[grid], self._sxy[grid]
+    with np.errstate(divide="ignore", invalid="ignore"):
+      cov = n * sxy - sx * sx.T
+      var = (n * sxx - sx * sx) * (n * sxx - sx * sx).T
+      corr = cov / np.sqrt(var)
+    corr[n < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+class CorrelationEngine:
+  """Keeps one ``RollingCorrelation`` per window in sync with the bar store.
+
+  The tracked universe is the ``max_tickers`` most recently requested
+  tickers that have stored bars. A change to it, or a rewrite of a
+  ticker's stored history (the bar store re-downloads a series Yahoo
+  re-adjusted), triggers one full rebuild; otherwise requests only read
+  the bars that arrived since the last one.
+  """
+
+  def __init__(self, max_tickers=200):
+    self.max_tickers = max_tickers
+    self._lock = threading.Lock()
+    self._windows = {}
+    self._recent = {}
+
+  def _candidates(self, tickers):
+    # Most recently requested last; the oldest fall out beyond the cap.
+    for ticker in tickers:
+      self._recent.pop(ticker, None)
+      self._recent[ticker] = None
+    while len(self._recent) > max(self.max_tickers, len(tickers)):
+      self._recent.pop(next(iter(self._recent)))
+    return list(self._recent)
+
+  def correlations(self, tickers, window="6mo"):
+    window = resolve_window(window)
+    size, period = WINDOWS[window]
+    store = get_bar_store()
+    requested = list(dict.fromkeys(t.upper() for t in tickers))
+
+    with self._lock:
+      candidates = self._candidates(requested)
+      store.sync(candidates, period=period)
+      universe = store.held(candidates)
+      for ticker in set(candidates) - set(universe):
+        self._recent.pop(ticker)
+      if not universe:
+        return [], np.empty((0, 0))
+      revision = store.revision(universe)
+
+      rolling, built_at = self._windows.get(window, (None, None))
+      if rolling is None or set(universe) != set(rolling.tickers) or revision != built_at or rolling._last_ts is None:
+        rolling = RollingCorrelation(size)
+        rolling.rebuild(store.closes(universe, period=period).reindex(columns=universe))
+        self._windows[window] = (rolling, revision)
+      else:
+        rolling.update(store.closes(rolling.tickers, period=period, since=rolling._last_ts))
+
+      known = [t for t in tickers if t in rolling._positions]
+      return known, rolling.matrix(known)
+
+
+_engine = None
+
+
+def get_correlation_engine():
+  global _engine
+  if _engine is None:
+    _engine = CorrelationEngine(max_tickers=getattr(settings, "STOCKS_CORRELATION_MAX_TICKERS", 200))
+  return _engine
@@ -0,0 +1,120 @@
+import logging
+
+from .aggregation import get_intraday_aggregator
+from .fanout import fetch_all
+from .fundamentals import get_fundamentals_store
+from .instrumentation import mark_stale
+from .news import MAX_PAGE, get_news_store
+
+logger = logging.getLogger(__name__)
+
+# Everything a ticker's dashboard page shows, in one request. Sections are
+# grouped by the data they are built from, and each source is loaded once
+# and concurrently: the fundamentals snapshot (one ``info`` plus the
+# statements) backs summary, ratios, history and stock-info, the news
+# store backs news, and the intraday aggregator's latest 1m bar backs
+# live. Each section has the payload of the endpoint it replaces.
+
+SOURCES = {
+  "summary": "fundamentals",
+  "ratios": "fundamentals",
+  "history": "fundamentals",
+  "stock-info": "fundamentals",
+  "news": "news",
+  "live": "quote",
+}
+SECTIONS = tuple(SOURCES)
+
+
+def parse_sections(text):
+  """``"summary,live"`` -> ``["summary", "live"]``; every section when empty."""
+  sections = list(dict.fromkeys(s.strip().lower() for s in (text or "").split(",") if s.strip()))
+  unknown = [s for s in sections if s not in SOURCES]
+  if unknown:
+    raise ValueError(f"Unknown sections: {', '.join(unknown)}. Use {', '.join(SECTIONS)}")
+  return sections or list(SECTIONS)
+
+
+def dashboard_kind(request):
+  """Data kind for HTTP caching: the fastest-moving section requested."""
+  try:
+    sections = parse_sections(request.GET.get("sections"))
+  except ValueError:
+    return "quote"
+  if "live" in sections:
+    return "quote"
+  return "news" if "news" in sections else "fundamentals"
+
+
+def basic_info(ticker, info):
+  return {
+    "Ticker": ticker,
+    "LongBusinessSummary": info.get("longBusinessSummary"),
+    "Sector": info.get("sector"),
+    "FullTimeEmployees": info.get("fullTimeEmployees"),
+    "Website": info.get("website"),
+    "MarketCap": info.get("marketCap"),
+    "Beta": info.get("beta"),
+    "TrailingEPS": info.get("trailingEps"),
+    "TrailingPE": info.get("trailingPE"),
+  }
+
+
+def load_news(ticker, limit):
+  store = get_news_store()
+  store.track([ticker])
+  store.start()
+  if store.stale([ticker]):
+    try:
+      store.ingest(ticker)
+    except Exception as e:
+      logger.error(f"Ingesting news for {ticker} failed: {str(e)}")
+      stored = store.latest([ticker], limit)[ticker]
+      if not stored:
+        raise
+      mark_stale()
+      return stored
+  return store.latest([ticker], limit)[ticker]
+
+
+def load(source, ticker, news_limit):
+  if source == "fundamentals":
+    return get_fundamentals_store().snapshot(ticker)
+  if source == "news":
+    return load_news(ticker, news_limit)
+  return get_intraday_aggregator().latest([ticker])[ticker]
+
+
+def build_section(section, ticker, data):
+  if section == "summary":
+    return data.summary
+  if section in ("ratios", "history"):
+    payload = data.ratios if section == "ratios" else data.history
+    return payload if payload is not None else {"error": "Financial data not available"}
+  if section == "stock-info":
+    return basic_info(ticker, data.info)
+  if section == "news":
+    return data if data else "No news found"
+  if data is None:
+    return {"error": "No data found"}
+  return data.reset_index().to_dict(orient="records")[0]
+
+
+async def bundle(ticker, sections, news_limit=20):
+  """``{"Ticker": ..., section: payload, ...}``, loading each source once."""
+  ticker = ticker.strip().upper()
+  news_limit = min(news_limit, MAX_PAGE)
+  sources = list(dict.fromkeys(SOURCES[s] for s in sections))
+  loaded = await fetch_all(sources, lambda source: load(source, ticker, news_limit))
+
+  result = {"Ticker": ticker}
+  for section in sections:
+    data = loaded[SOURCES[section]]
+    if isinstance(data, Exception):
+      result[section] = {"error": f"Failed to fetch {section}: {str(data)}"}
+      continue
+    try:
+      result[section] = build_section(section, ticker, data)
+    except Exception as e:
+      result[section] = {"error": f"Failed to build {section}: {str(e)}"}
+  return result
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+# Server-side reduction of bar series to a target point count. OHLC mode
+# aggregates bars into wider candles; LTTB keeps the subset of original
+# bars that best preserves the shape of a line chart.
+
+# Candle widths tried in order, narrowest first.
+OHLC_RULES = ["2min", "5min", "15min", "30min", "1h", "2h", "4h", "1D", "W-FRI", "ME", "QE", "YE"]
+
+OHLC_AGGREGATES = {
+  "Open": "first",
+  "High": "max",
+  "Low": "min",
+  "Close": "last",
+  "Volume": "sum",
+  "Dividends": "sum",
+  "Stock Splits": "max",
+}
+
+MODES = ("ohlc", "lttb")
+
+
+def resample_ohlc(df, target):
+  """Aggregate ``df`` into the narrowest candles that fit in ``target`` rows.
+
+  Buckets without any bars (nights, weekends) are dropped, and each candle
+  is labelled with the timestamp of its first bar.
+  """
+  if len(df) <= target:
+    return df
+  stamps = pd.Series(df.index, index=df.index)
+  spacing = pd.Timedelta(int(np.median(np.diff(df.index.asi8))))
+  for rule in OHLC_RULES:
+    # Skip candles no wider than the bars themselves.
+    if rule[0].isdigit() and pd.Timedelta(rule) <= spacing:
+      continue
+    first = stamps.resample(rule).first().dropna()
+    if len(first) <= target:
+      break
+
+  spec = {column: how for column, how in OHLC_AGGREGATES.items() if column in df.columns}
+  candles = df.resample(rule).agg(spec)
+  candles.index = stamps.resample(rule).first()
+  candles = candles[candles.index.notna()].rename_axis(df.index.name)
+  if "Volume" in candles and df["Volume"].dtype.kind == "i":
+    candles["Volume"] = candles["Volume"].astype("int64")
+  return candles
+
+
+def lttb(x, y, target):
+  """Largest-Triangle-Three-Buckets: indices of ``target`` points of ``(x, y)``.
+
+  The first and last points are always kept; from every bucket in between
+  the point forming the largest triangle with the previously kept point and
+  the average of the next bucket is chosen.
+  """
+  n = len(x)
+  if target >= n or target < 3:
+    return np.arange(n)
+
+  x = np.asarray(x, dtype=float)
+  y = np.asarray(y, dtype=float)
+  edges = np.linspace(1, n - 1, target - 1).astype(int)
+  selected = np.empty(target, dtype=int)
+  selected[0], selected[-1] = 0, n - 1
+
+  a = 0
+  for i in range(target - 2):
+    lo, hi = edges[i], edges[i + 1]
+    next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+    avg_x = x[next_lo:next_hi].mean()
+    avg_y = y[next_lo:next_hi].mean()
+    area = np.abs(
+      (x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a])
+    )
+    a = lo + int(np.argmax(area))
+    selected[i + 1] = a
+  return selected
+
+
+def downsample_lttb(df, target, column="Close"):
+  """Rows of ``df`` chosen by LTTB on ``column``."""
+  if len(df) <= target:
+    return df
+  series = df[column].ffill().bfill()
+  return df.iloc[lttb(df.index.asi8, series.to_numpy(), target)]
+
+
+def downsample(df, target, mode="ohlc"):
+  if mode == "lttb":
+    return downsample_lttb(df, target)
+  if mode == "ohlc":
+    return resample_ohlc(df, target)
+  raise ValueError(f"Unsupported downsample mode: {mode}. Use one of {', '.join(MODES)}")
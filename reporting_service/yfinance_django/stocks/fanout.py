@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TickerTimeout(Exception):
+  pass
+
+
+_executor = None
+
+
+def get_executor():
+  # A dedicated pool so the fan-out is not capped by the event loop's
+  # default executor, which is sized from the CPU count.
+  global _executor
+  if _executor is None:
+    _executor = ThreadPoolExecutor(
+      max_workers=getattr(settings, "STOCKS_FANOUT_THREADS", 32),
+      thread_name_prefix="stocks-fanout",
+    )
+  return _executor
+
+
+def _reset_after_fork():
+  # Pool threads do not survive a fork; the child starts its own pool.
+  global _executor
+  _executor = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def fetch_all(tickers, fetch, limit=None, timeout=None):
+  """Run the blocking ``fetch(ticker)`` for every ticker concurrently.
+
+  At most ``limit`` upstream calls are in flight at once and each one is
+  given ``timeout`` seconds. Returns ``{ticker: result}`` where a failed or
+  timed-out ticker maps to the exception instead, so callers can still
+  answer with whatever succeeded.
+  """
+  limit = limit or getattr(settings, "STOCKS_FANOUT_CONCURRENCY", 8)
+  timeout = timeout or getattr(settings, "STOCKS_FANOUT_TIMEOUT", 10)
+  semaphore = asyncio.Semaphore(limit)
+  run = sync_to_async(fetch, thread_sensitive=False, executor=get_executor())
+
+  async def one(ticker):
+    async with semaphore:
+      try:
+        return await asyncio.wait_for(run(ticker), timeout)
+      except asyncio.TimeoutError:
+        logger.warning(f"Fetching {ticker} timed out after {timeout}s")
+        return TickerTimeout(f"Timed out after {timeout}s")
+      except Exception as e:
+        return e
+
+  results = await asyncio.gather(*(one(t) for t in tickers))
+  return dict(zip(tickers, results))
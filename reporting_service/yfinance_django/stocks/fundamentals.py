@@ -0,0 +1,277 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+from datetime import timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .instrumentation import mark_stale, phase
+from .models import FundamentalsSnapshot
+from .providers import get_provider
+from .ratios import BALANCE_ROWS, INCOME_ROWS, compute_ratio_arrays, format_ratios, latest_values
+from .resilience import UpstreamUnavailable
+from .search import founding_year, get_search_index
+
+logger = logging.getLogger(__name__)
+
+# Normalized fundamentals per ticker, persisted in the project database.
+# A snapshot is re-checked every STOCKS_FUNDAMENTALS_CHECK_SECONDS by
+# fetching ``info`` alone; the statements are only fetched again (and the
+# derived payloads recomputed) when ``info`` reports a new quarter or
+# fiscal year, or when they are older than the max age.
+
+
+def _scalar(value):
+  return value.item() if hasattr(value, "item") else value
+
+
+def _finite(value):
+  """``value`` as a plain scalar, or None for NaN/inf (statement cells often are)."""
+  value = _scalar(value)
+  if isinstance(value, float) and not math.isfinite(value):
+    return None
+  return value if pd.notna(value) else None
+
+
+def _clean(data):
+  # JSONField rejects NaN/inf on save, and they are not valid JSON anyway.
+  if isinstance(data, dict):
+    return {k: _clean(v) for k, v in data.items()}
+  if isinstance(data, (list, tuple)):
+    return [_clean(v) for v in data]
+  if isinstance(data, (float, int)) or hasattr(data, "item"):
+    return _finite(data)
+  return data
+
+
+def reporting_period(info):
+  quarter = info.get("mostRecentQuarter")
+  fiscal_year = info.get("lastFiscalYearEnd")
+  if quarter is None and fiscal_year is None:
+    return ""
+  return f"{quarter or ''}:{fiscal_year or ''}"
+
+
+def ttm(quarterly, row):
+  if quarterly is None or quarterly.empty or row not in quarterly.index:
+    return None
+  return _finite(quarterly.loc[row].iloc[:4].sum(min_count=1))
+
+
+def build_summary(info, revenue_ttm=None, net_income_ttm=None):
+  return {
+    "MarketCap": info.get("marketCap"),
+    "RevenueTTM": revenue_ttm,
+    "Sector": info.get("sector"),
+    "NetIncomeTTM": net_income_ttm,
+    "EPS": info.get("epsTrailingTwelveMonths") or info.get("earningsPerShare"),
+    "Employees": info.get("fullTimeEmployees"),
+    "PERatio": info.get("trailingPE"),
+    "BookValue": info.get("bookValue"),
+    "Founded": info.get("founded") or info.get("longBusinessSummary"),
+    "FoundedYear": founding_year(info),
+    "DividendYield": info.get("dividendYield"),
+  }
+
+
+# Model column for each screenable ratio.
+RATIO_FIELDS = {
+  "GrossProfitMargin": "gross_margin",
+  "OperatingMargin": "operating_margin",
+  "NetProfitMargin": "net_margin",
+  "ReturnOnEquity": "return_on_equity",
+  "ReturnOnAssets": "return_on_assets",
+  "CurrentRatio": "current_ratio",
+  "QuickRatio": "quick_ratio",
+  "DebtToEquity": "debt_to_equity",
+  "InterestCoverage": "interest_coverage",
+}
+
+
+def build_ratios(income, balance):
+  """Formatted ratios payload plus the raw value of each ratio (or None)."""
+  if income.empty or balance.empty:
+    return None, {}
+  arrays = compute_ratio_arrays(latest_values([income], INCOME_ROWS), latest_values([balance], BALANCE_ROWS))
+  raw = {}
+  for name, (values, valid) in arrays.items():
+    value = float(values[0])
+    raw[name] = value if valid[0] and math.isfinite(value) else None
+  return format_ratios(arrays, 0), raw
+
+
+def _row_value(frame, row, column):
+  try:
+    return _finite(frame.loc[row].get(column))
+  except KeyError:
+    return None
+
+
+def build_history(income, balance, shares_out):
+  """Revenue, net income, EPS and ROE for the last five fiscal years."""
+  if income.empty or balance.empty:
+    return None
+
+  data = []
+  for year in income.columns[:5]:
+    revenue = _row_value(income, "Total Revenue", year)
+    net_income = _row_value(income, "Net Income", year)
+    equity = _row_value(balance, "Total Stockholder Equity", year)
+
+    data.append({
+      "Year": year.year if hasattr(year, "year") else str(year),
+      "Revenue": revenue,
+      "NetIncome": net_income,
+      "EPS": net_income / shares_out if pd.notna(net_income) and net_income and shares_out else None,
+      "ROE": net_income / equity if pd.notna(net_income) and net_income and pd.notna(equity) and equity else None,
+    })
+  return data
+
+
+def apply_info(snapshot, info):
+  # TTM sums come from the statements and survive info-only refreshes.
+  info = _clean(info)
+  previous = snapshot.summary or {}
+  summary = build_summary(info, previous.get("RevenueTTM"), previous.get("NetIncomeTTM"))
+
+  snapshot.info = info
+  snapshot.summary = summary
+  snapshot.sector = info.get("sector")
+  snapshot.industry = info.get("industry")
+  snapshot.market_cap = summary["MarketCap"]
+  snapshot.pe_ratio = summary["PERatio"]
+  snapshot.eps = summary["EPS"]
+  snapshot.book_value = summary["BookValue"]
+  snapshot.dividend_yield = summary["DividendYield"]
+  snapshot.employees = summary["Employees"]
+  snapshot.revenue_ttm = summary["RevenueTTM"]
+  snapshot.net_income_ttm = summary["NetIncomeTTM"]
+
+
+def apply_statements(snapshot, income, balance, quarterly):
+  snapshot.revenue_ttm = ttm(quarterly, "Total Revenue")
+  snapshot.net_income_ttm = ttm(quarterly, "Net Income")
+  snapshot.summary = build_summary(snapshot.info, snapshot.revenue_ttm, snapshot.net_income_ttm)
+  ratios, raw = build_ratios(income, balance)
+  snapshot.ratios = _clean(ratios)
+  for name, field in RATIO_FIELDS.items():
+    setattr(snapshot, field, raw.get(name))
+  snapshot.history = build_history(income, balance, _finite(snapshot.info.get("sharesOutstanding")))
+
+
+def content_version(snapshot):
+  """Digest of what the fundamentals endpoints serve from ``snapshot``.
+
+  Re-checks that find nothing new leave it unchanged, unlike ``checked_at``.
+  """
+  payload = json.dumps([snapshot.summary, snapshot.ratios, snapshot.history], sort_keys=True, default=str)
+  return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _has_data(info, *frames):
+  # yfinance answers unknown tickers with a few None fields and empty frames.
+  return any(v is not None for v in info.values()) or any(f is not None and not f.empty for f in frames)
+
+
+class FundamentalsStore:
+  """Reads and refreshes ``FundamentalsSnapshot`` rows."""
+
+  def __init__(self, check_after=6 * 3600, max_age=7 * 86400):
+    self.check_after = timedelta(seconds=check_after)
+    self.max_age = timedelta(seconds=max_age)
+    self._lock = threading.Lock()
+    self._ticker_locks = {}
+
+  def _ticker_lock(self, ticker):
+    with self._lock:
+      return self._ticker_locks.setdefault(ticker, threading.Lock())
+
+  def _statement(self, fetch, ticker):
+    try:
+      return fetch(ticker)
+    except Exception as e:
+      logger.error(f"Fetching {fetch.__name__} for {ticker} failed: {str(e)}")
+      return None
+
+  def ingest(self, ticker, snapshot=None):
+    """Fetch statements and info for ``ticker`` and store a fresh snapshot."""
+    market = get_provider()
+    info = market.info(ticker)
+    income = self._statement(market.financials, ticker)
+    balance = self._statement(market.balance_sheet, ticker)
+    quarterly = self._statement(market.quarterly_income_stmt, ticker)
+
+    now = timezone.now()
+    created = snapshot is None
+    if created:
+      snapshot = FundamentalsSnapshot(ticker=ticker, statements_at=now)
+    apply_info(snapshot, info or {})
+    if created and not _has_data(snapshot.info, income, balance, quarterly):
+      # Unknown ticker: serve the empty snapshot but do not store it.
+      return snapshot
+    get_search_index().index_company(ticker, info)
+    snapshot.reporting_period = reporting_period(info)
+    snapshot.checked_at = now
+    if income is not None and balance is not None:
+      apply_statements(snapshot, income, balance, quarterly)
+      snapshot.statements_at = now
+    else:
+      # Keep whatever statements we had and retry on the next check.
+      snapshot.statements_at = now - self.max_age
+    if not created:
+      snapshot.save()
+      return snapshot
+    try:
+      with transaction.atomic():
+        snapshot.save(force_insert=True)
+    except IntegrityError:
+      # Another worker stored the ticker first; this fetch is as fresh.
+      snapshot.save(force_update=True)
+    return snapshot
+
+  def _check(self, snapshot):
+    info = get_provider().info(snapshot.ticker)
+    period = reporting_period(info)
+    now = timezone.now()
+    if period != snapshot.reporting_period or now - snapshot.statements_at > self.max_age:
+      logger.info(f"New reporting period for {snapshot.ticker}, refreshing statements")
+      return self.ingest(snapshot.ticker, snapshot)
+
+    apply_info(snapshot, info)
+    get_search_index().index_company(snapshot.ticker, info)
+    snapshot.checked_at = now
+    snapshot.save()
+    return snapshot
+
+  @phase("fetch")
+  def snapshot(self, ticker):
+    ticker = ticker.strip().upper()
+    with self._ticker_lock(ticker):
+      snapshot = FundamentalsSnapshot.objects.filter(ticker=ticker).first()
+      if snapshot is None:
+        return self.ingest(ticker)
+      if timezone.now() - snapshot.checked_at > self.check_after:
+        try:
+          return self._check(snapshot)
+        except UpstreamUnavailable as e:
+          logger.warning(f"Serving stored fundamentals for {ticker}: {str(e)}")
+          mark_stale()
+      return snapshot
+
+
+_store = None
+
+
+def get_fundamentals_store():
+  global _store
+  if _store is None:
+    _store = FundamentalsStore(
+      check_after=getattr(settings, "STOCKS_FUNDAMENTALS_CHECK_SECONDS", 6 * 3600),
+      max_age=getattr(settings, "STOCKS_FUNDAMENTALS_MAX_AGE_SECONDS", 7 * 86400),
+    )
+  return _store
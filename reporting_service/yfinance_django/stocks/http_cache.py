@@ -0,0 +1,102 @@
+import hashlib
+import logging
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .instrumentation import is_stale
+from .providers import is_intraday
+
+logger = logging.getLogger(__name__)
+
+# HTTP caching for the API views. Successful GETs carry a strong ETag and a
+# Cache-Control max-age that matches how fast their data moves
+# (STOCKS_HTTP_MAX_AGE, per kind of data). Views that can tell the version
+# of their data cheaply (a fundamentals snapshot's check time, a
+# fingerprint of the stored bars) answer conditional GETs with 304 before
+# doing any work; the others hash the body they produced, which still
+# saves sending it again. Responses served from last-known-good data during
+# an upstream outage (X-Data-Stale) must be revalidated, so shared caches
+# don't keep them for the kind's full max-age.
+
+
+def max_age(kind):
+  return getattr(settings, "STOCKS_HTTP_MAX_AGE", {}).get(kind, 0)
+
+
+def bars_kind(request):
+  return "intraday" if is_intraday(request.GET.get("interval", "1d")) else "daily"
+
+
+def versioned_etag(request, version):
+  # The query string and Accept header pick the representation.
+  key = "|".join([request.get_full_path(), request.headers.get("Accept", ""), str(version)])
+  return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+
+def body_etag(response):
+  return quote_etag(hashlib.sha1(response.content).hexdigest())
+
+
+def http_cache(kind, version=None):
+  """Caching headers and conditional GETs for a view.
+
+  ``kind`` names the entry of STOCKS_HTTP_MAX_AGE to use, or is a callable
+  taking the request. ``version``, if given, is called like the view and
+  returns ``(tag, last_modified)`` for the data it would serve, or
+  ``None`` when it cannot tell; it must not be costlier than a lookup.
+  """
+  def decorator(view):
+    def before(request, args, kwargs):
+      if version is None or request.method not in ("GET", "HEAD"):
+        return None, None, None
+      try:
+        current = version(request, *args, **kwargs)
+      except Exception as e:
+        logger.warning(f"No data version for {request.path}: {str(e)}")
+        current = None
+      if current is None:
+        return None, None, None
+      tag, modified = current
+      etag = versioned_etag(request, tag)
+      modified = int(modified.timestamp()) if modified else None
+      return get_conditional_response(request, etag=etag, last_modified=modified), etag, modified
+
+    def finish(request, response, etag, modified):
+      if request.method not in ("GET", "HEAD") or response.streaming or response.status_code not in (200, 304):
+        return response
+      if etag is None:
+        if response.status_code != 200:
+          return response
+        etag = body_etag(response)
+      response.headers.setdefault("ETag", etag)
+      if modified:
+        response.headers.setdefault("Last-Modified", http_date(modified))
+      if is_stale():
+        patch_cache_control(response, no_cache=True, max_age=0)
+      else:
+        patch_cache_control(response, public=True, max_age=max_age(kind(request) if callable(kind) else kind))
+      patch_vary_headers(response, ["Accept"])
+      if response.status_code == 200:
+        response = get_conditional_response(request, etag=response["ETag"], last_modified=modified, response=response)
+      return response
+
+    if iscoroutinefunction(view):
+      @wraps(view)
+      async def wrapper(request, *args, **kwargs):
+        response, etag, modified = before(request, args, kwargs)
+        if response is None:
+          response = await view(request, *args, **kwargs)
+        return finish(request, response, etag, modified)
+    else:
+      @wraps(view)
+      def wrapper(request, *args, **kwargs):
+        response, etag, modified = before(request, args, kwargs)
+        if response is None:
+          response = view(request, *args, **kwargs)
+        return finish(request, response, etag, modified)
+    return wrapper
+  return decorator
@@ -0,0 +1,383 @@
+import copy
+import re
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .bar_store import get_bar_store
+from .providers import exchange_timezone, is_intraday
+
+# Technical indicators over stored OHLCV bars, in two modes:
+#
+# * ``compute_indicators`` evaluates a set over a whole window with array
+#   operations, for charts that load history.
+# * ``IncrementalIndicators`` keeps the running state (last EMA values,
+#   Wilder averages, the trailing window, session VWAP sums) and folds in
+#   one bar at a time, for live charts that receive a new 1m bar per tick.
+#
+# Both give the same numbers: EMAs are seeded with the first value
+# (``adjust=False``), RSI's Wilder averages with the mean of the first N
+# gains and losses, and every output stays empty until its lookback is
+# filled. Intraday VWAP restarts with each exchange-local session. Sets are
+# written like ``rsi14,macd,bb20,sma50,ema20,vwap``.
+
+DEFAULT_LENGTHS = {"sma": 20, "ema": 20, "rsi": 14, "bb": 20}
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_WIDTH = 2.0
+MAX_LENGTH = 500
+
+_SPEC = re.compile(r"^(sma|ema|rsi|bb|macd|vwap)(\d*)$")
+
+
+def parse_set(text):
+  """``"rsi14,macd,bb20"`` -> ``[("rsi", 14), ("macd", None), ("bb", 20)]``."""
+  specs = []
+  for item in (text or "").split(","):
+    item = item.strip().lower()
+    if not item:
+      continue
+    match = _SPEC.match(item)
+    if not match:
+      raise ValueError(f"Unknown indicator: {item}. Use sma, ema, rsi, bb, macd or vwap")
+    kind, length = match.group(1), match.group(2)
+    if kind in ("macd", "vwap"):
+      if length:
+        raise ValueError(f"{kind} does not take a length")
+      spec = (kind, None)
+    else:
+      n = int(length) if length else DEFAULT_LENGTHS[kind]
+      if not 2 <= n <= MAX_LENGTH:
+        raise ValueError(f"{item}: length must be between 2 and {MAX_LENGTH}")
+      spec = (kind, n)
+    if spec not in specs:
+      specs.append(spec)
+  if not specs:
+    raise ValueError("No indicators given")
+  return specs
+
+
+def output_names(kind, n):
+  if kind == "macd":
+    return ["macd", "macd_signal", "macd_hist"]
+  if kind == "vwap":
+    return ["vwap"]
+  if kind == "bb":
+    return [f"bb{n}_mid", f"bb{n}_upper", f"bb{n}_lower"]
+  return [f"{kind}{n}"]
+
+
+def _masked(values, first_valid):
+  values = np.asarray(values, dtype=float).copy()
+  values[:first_valid] = np.nan
+  return values
+
+
+def _ema(values, n):
+  return pd.Series(values).ewm(span=n, adjust=False).mean().to_numpy()
+
+
+def sma(close, n):
+  out = np.full(len(close), np.nan)
+  if len(close) >= n:
+    sums = np.cumsum(np.insert(close, 0, 0.0))
+    out[n - 1:] = (sums[n:] - sums[:-n]) / n
+  return out
+
+
+def ema(close, n):
+  return _masked(_ema(close, n), n - 1)
+
+
+def _wilder(values, n):
+  # Seeded with the mean of the first n values, then smoothed by 1/n.
+  seeded = pd.Series(values[n - 1:], dtype=float)
+  seeded.iloc[0] = values[:n].mean()
+  return seeded.ewm(alpha=1 / n, adjust=False).mean().to_numpy()
+
+
+def rsi(close, n):
+  out = np.full(len(close), np.nan)
+  if len(close) <= n:
+    return out
+  delta = np.diff(close)
+  avg_gain = _wilder(np.where(delta > 0, delta, 0.0), n)
+  avg_loss = _wilder(np.where(delta < 0, -delta, 0.0), n)
+  with np.errstate(divide="ignore", invalid="ignore"):
+    out[n:] = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+  return out
+
+
+def macd(close):
+  line = _ema(close, MACD_FAST) - _ema(close, MACD_SLOW)
+  signal = _ema(line, MACD_SIGNAL)
+  first_line = MACD_SLOW - 1
+  first_signal = first_line + MACD_SIGNAL - 1
+  return _masked(line, first_line), _masked(signal, first_signal), _masked(line - signal, first_signal)
+
+
+def bollinger(close, n, width=BB_WIDTH):
+  rolling = pd.Series(close).rolling(n)
+  mid = rolling.mean().to_numpy()
+  std = rolling.std(ddof=0).to_numpy()
+  return mid, mid + width * std, mid - width * std
+
+
+def session_keys(index, interval, tz="UTC"):
+  """Session each bar belongs to: its date in ``tz`` for intraday bars, one session otherwise."""
+  if is_intraday(interval):
+    if index.tz is None:
+      index = index.tz_localize("UTC")
+    # Local wall-clock days, so sessions that cross midnight UTC stay whole.
+    return np.asarray(index.tz_convert(tz).tz_localize(None).asi8 // (86400 * 10**9))
+  return np.zeros(len(index), dtype=np.int64)
+
+
+def vwap(high, low, close, volume, sessions):
+  typical = (high + low + close) / 3
+  volume = np.nan_to_num(volume)
+  frame = pd.DataFrame({"pv": typical * volume, "v": volume, "s": sessions})
+  sums = frame.groupby("s")[["pv", "v"]].cumsum()
+  with np.errstate(divide="ignore", invalid="ignore"):
+    return np.where(sums["v"] > 0, sums["pv"] / sums["v"], np.nan)
+
+
+def compute_indicators(bars, specs, interval="1d", tz="UTC"):
+  """Indicator columns for every bar of an OHLCV frame, as a DataFrame.
+
+  ``tz`` is the exchange timezone intraday VWAP sessions are dated in.
+  """
+  close = bars["Close"].to_numpy(dtype=float)
+  columns = {"Close": close}
+  for kind, n in specs:
+    if kind == "sma":
+      columns[f"sma{n}"] = sma(close, n)
+    elif kind == "ema":
+      columns[f"ema{n}"] = ema(close, n)
+    elif kind == "rsi":
+      columns[f"rsi{n}"] = rsi(close, n)
+    elif kind == "macd":
+      columns["macd"], columns["macd_signal"], columns["macd_hist"] = macd(close)
+    elif kind == "bb":
+      columns[f"bb{n}_mid"], columns[f"bb{n}_upper"], columns[f"bb{n}_lower"] = bollinger(close, n)
+    elif kind == "vwap":
+      columns["vwap"] = vwap(
+        bars["High"].to_numpy(dtype=float), bars["Low"].to_numpy(dtype=float), close,
+        bars["Volume"].to_numpy(dtype=float), session_keys(bars.index, interval, tz),
+      )
+  return pd.DataFrame(columns, index=bars.index)
+
+
+class _Ema:
+  def __init__(self, n):
+    self.alpha = 2 / (n + 1)
+    self.n = n
+    self.count = 0
+    self.value = None
+
+  def update(self, x):
+    self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+    self.count += 1
+    return self.value if self.count >= self.n else None
+
+
+class _Window:
+  def __init__(self, n):
+    self.values = deque(maxlen=n)
+
+  def update(self, x):
+    self.values.append(x)
+    return len(self.values) == self.values.maxlen
+
+
+class _Rsi:
+  def __init__(self, n):
+    self.n = n
+    self.prev = None
+    self.count = 0
+    self.gain = self.loss = 0.0
+
+  def update(self, x):
+    prev, self.prev = self.prev, x
+    if prev is None:
+      return None
+    delta = x - prev
+    gain, loss = max(delta, 0.0), max(-delta, 0.0)
+    self.count += 1
+    if self.count <= self.n:
+      # Sums of the first n moves; their mean seeds the Wilder averages.
+      self.gain += gain
+      self.loss += loss
+      if self.count < self.n:
+        return None
+      self.gain /= self.n
+      self.loss /= self.n
+    else:
+      alpha = 1 / self.n
+      self.gain += alpha * (gain - self.gain)
+      self.loss += alpha * (loss - self.loss)
+    return 100.0 if self.loss == 0 else 100 - 100 / (1 + self.gain / self.loss)
+
+
+class _Macd:
+  def __init__(self):
+    self.fast, self.slow, self.signal = _Ema(MACD_FAST), _Ema(MACD_SLOW), _Ema(MACD_SIGNAL)
+    self.count = 0
+
+  def update(self, x):
+    self.fast.update(x)
+    self.slow.update(x)
+    line = self.fast.value - self.slow.value
+    self.signal.update(line)
+    signal = self.signal.value
+    self.count += 1
+    if self.count < MACD_SLOW:
+      return None, None, None
+    if self.count < MACD_SLOW + MACD_SIGNAL - 1:
+      return line, None, None
+    return line, signal, line - signal
+
+
+class _Vwap:
+  def __init__(self):
+    self.session = None
+    self.pv = self.v = 0.0
+
+  def update(self, high, low, close, volume, session):
+    if session != self.session:
+      self.session, self.pv, self.v = session, 0.0, 0.0
+    volume = 0.0 if volume is None or np.isnan(volume) else volume
+    self.pv += (high + low + close) / 3 * volume
+    self.v += volume
+    return self.pv / self.v if self.v > 0 else None
+
+
+class IncrementalIndicators:
+  """Running indicator state that is advanced one bar at a time.
+
+  The newest bar may still be forming, so it is applied to a copy of the
+  state; the copy is only committed once a later bar arrives, and a
+  refreshed version of the same bar simply replaces it.
+  """
+
+  def __init__(self, specs, interval="1m", tz="UTC"):
+    self.specs = specs
+    self.interval = interval
+    self.tz = tz
+    self._state = {spec: self._new(spec) for spec in specs}
+    self._pending = None
+    self.last_ts = None
+    self.values = {}
+
+  def _new(self, spec):
+    kind, n = spec
+    if kind == "ema":
+      return _Ema(n)
+    if kind in ("sma", "bb"):
+      return _Window(n)
+    if kind == "rsi":
+      return _Rsi(n)
+    if kind == "macd":
+      return _Macd()
+    return _Vwap()
+
+  def _apply(self, state, ts, bar):
+    close = float(bar["Close"])
+    values = {"Close": close}
+    for (kind, n), s in state.items():
+      if kind == "ema":
+        values[f"ema{n}"] = s.update(close)
+      elif kind == "sma":
+        full = s.update(close)
+        values[f"sma{n}"] = float(np.mean(s.values)) if full else None
+      elif kind == "bb":
+        full = s.update(close)
+        mid = std = None
+        if full:
+          window = np.fromiter(s.values, dtype=float)
+          mid, std = float(window.mean()), float(window.std())
+        values[f"bb{n}_mid"] = mid
+        values[f"bb{n}_upper"] = mid + BB_WIDTH * std if full else None
+        values[f"bb{n}_lower"] = mid - BB_WIDTH * std if full else None
+      elif kind == "rsi":
+        values[f"rsi{n}"] = s.update(close)
+      elif kind == "macd":
+        values["macd"], values["macd_signal"], values["macd_hist"] = s.update(close)
+      elif kind == "vwap":
+        session = int(session_keys(pd.DatetimeIndex([ts]), self.interval, self.tz)[0])
+        values["vwap"] = s.update(
+          float(bar["High"]), float(bar["Low"]), close, float(bar["Volume"]), session,
+        )
+    return values
+
+  def update(self, ts, bar, final=False):
+    """Fold in one bar; returns the indicator values as of that bar.
+
+    ``final`` bars are known to be complete and skip the provisional copy.
+    """
+    if self.last_ts is not None and ts < self.last_ts:
+      return self.values
+    if self._pending is not None and ts > self.last_ts:
+      self._state = self._pending
+    self._pending = None
+    state = self._state if final else copy.deepcopy(self._state)
+    self.values = self._apply(state, ts, bar)
+    if not final:
+      self._pending = state
+    self.last_ts = ts
+    return self.values
+
+  def feed(self, bars):
+    """Fold in a frame of bars; all but the last are treated as complete."""
+    rows = list(zip(bars.index, bars.to_dict(orient="records")))
+    for i, (ts, bar) in enumerate(rows):
+      self.update(ts, bar, final=i < len(rows) - 1)
+    return self.values
+
+
+class IndicatorEngine:
+  """Keeps ``IncrementalIndicators`` per ticker and set in step with the bar store.
+
+  Bars are read (and possibly synced from upstream) outside any lock, so a
+  slow download only holds up requests for the same ticker and set.
+  """
+
+  def __init__(self, max_states=512):
+    self.max_states = max_states
+    self._lock = threading.Lock()
+    self._states = {}
+
+  def _entry(self, ticker, specs, interval):
+    key = (ticker, interval, tuple(specs))
+    tz = exchange_timezone(ticker) if is_intraday(interval) else "UTC"
+    with self._lock:
+      entry = self._states.get(key)
+      if entry is None:
+        entry = (IncrementalIndicators(specs, interval, tz), threading.Lock())
+        if len(self._states) >= self.max_states:
+          self._states.pop(next(iter(self._states)))
+        self._states[key] = entry
+      return entry
+
+  def latest(self, ticker, specs, period="5d", interval="1m"):
+    ticker = ticker.upper()
+    state, lock = self._entry(ticker, specs, interval)
+    with lock:
+      since = state.last_ts
+    # Bars older than the state's last one are skipped by ``update``, so
+    # concurrent reads of overlapping windows fold in safely.
+    bars = get_bar_store().history(ticker, period=period, interval=interval, start=since)
+    with lock:
+      state.feed(bars)
+      return state.last_ts, dict(state.values)
+
+
+_engine = None
+
+
+def get_indicator_engine():
+  global _engine
+  if _engine is None:
+    _engine = IndicatorEngine()
+  return _engine
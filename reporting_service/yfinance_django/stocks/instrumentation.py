@@ -0,0 +1,228 @@
+import contextvars
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.http import JsonResponse as BaseJsonResponse
+
+# Per-request timing. ``timing_middleware`` opens a ``RequestMetrics`` for
+# each request; code below it reports into whichever request is current
+# through ``phase``, ``record_upstream`` and ``record_cache``. The context
+# follows the request into ``sync_to_async`` worker threads; background
+# threads (pollers, prefetchers) have no request and report nowhere.
+#
+# Phases:
+#   fetch      loading data: provider calls, cache lookups, bar store reads
+#   upstream   the part of fetch spent in calls to the market data source
+#   serialize  encoding the response body
+#   compute    everything else in the request
+# Time in parallel fan-out threads is summed, so fetch can exceed total.
+
+PHASES = ("fetch", "upstream", "serialize")
+CACHE_EVENTS = ("memory_hits", "shared_hits", "coalesced", "misses", "stale")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar("stocks_request_metrics", default=None)
+_active = contextvars.ContextVar("stocks_active_phases", default=frozenset())
+
+
+class RequestMetrics:
+  def __init__(self):
+    self.started = time.perf_counter()
+    self.phases = Counter()
+    self.upstream_calls = Counter()
+    self.cache = Counter()
+    self.stale = False
+    self._lock = threading.Lock()
+
+  def add_phase(self, name, seconds):
+    with self._lock:
+      self.phases[name] += seconds
+
+  def add_upstream(self, kind):
+    with self._lock:
+      self.upstream_calls[kind] += 1
+
+  def add_cache(self, event):
+    with self._lock:
+      self.cache[event] += 1
+
+  def breakdown(self, total):
+    with self._lock:
+      phases = dict(self.phases)
+    fetch, serialize = phases.get("fetch", 0.0), phases.get("serialize", 0.0)
+    return {
+      "fetch": fetch,
+      "upstream": phases.get("upstream", 0.0),
+      "serialize": serialize,
+      "compute": max(total - fetch - serialize, 0.0),
+      "total": total,
+    }
+
+  def server_timing(self, total):
+    parts = []
+    calls = sum(self.upstream_calls.values())
+    for name, seconds in self.breakdown(total).items():
+      entry = f"{name};dur={seconds * 1000:.1f}"
+      if name == "upstream":
+        entry += f';desc="{calls} calls"'
+      parts.append(entry)
+    hits = self.cache["memory_hits"] + self.cache["shared_hits"] + self.cache["coalesced"]
+    stale = f' stale={self.cache["stale"]}' if self.stale else ""
+    parts.append(f'cache;desc="hits={hits} misses={self.cache["misses"]}{stale}"')
+    return ", ".join(parts)
+
+
+def current():
+  return _current.get()
+
+
+def start_request():
+  metrics = RequestMetrics()
+  return metrics, _current.set(metrics)
+
+
+def end_request(token):
+  _current.reset(token)
+
+
+@contextmanager
+def phase(name):
+  """Time the enclosed block as ``name`` for the current request.
+
+  Nested blocks of the same phase (a bar store read that calls the
+  provider, say) are only counted once, by the outermost one.
+  """
+  metrics = _current.get()
+  active = _active.get()
+  if metrics is None or name in active:
+    yield
+    return
+  token = _active.set(active | {name})
+  started = time.perf_counter()
+  try:
+    yield
+  finally:
+    metrics.add_phase(name, time.perf_counter() - started)
+    _active.reset(token)
+
+
+def record_upstream(kind, seconds):
+  registry.observe_upstream(kind, seconds)
+  metrics = _current.get()
+  if metrics is not None:
+    metrics.add_upstream(kind)
+
+
+def record_cache(event):
+  registry.count_cache(event)
+  metrics = _current.get()
+  if metrics is not None:
+    metrics.add_cache(event)
+
+
+def mark_stale():
+  """Flag the current response as built from last-known-good data."""
+  metrics = _current.get()
+  if metrics is not None:
+    metrics.stale = True
+
+
+def is_stale():
+  """Whether ``mark_stale`` was called for the current response."""
+  metrics = _current.get()
+  return metrics is not None and metrics.stale
+
+
+class JsonResponse(BaseJsonResponse):
+  """``JsonResponse`` that reports its encoding time as serialize."""
+
+  def __init__(self, *args, **kwargs):
+    with phase("serialize"):
+      super().__init__(*args, **kwargs)
+
+
+class Registry:
+  """Process-wide counters rendered in the Prometheus text format."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.requests = Counter()
+    self.durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 1))
+    self.duration_sums = Counter()
+    self.phase_seconds = Counter()
+    self.upstream_calls = Counter()
+    self.upstream_seconds = Counter()
+    self.cache_events = Counter()
+
+  def observe_request(self, view, method, status, metrics, total):
+    with self._lock:
+      self.requests[(view, method, str(status))] += 1
+      buckets = self.durations[view]
+      for i, bound in enumerate(DURATION_BUCKETS):
+        if total <= bound:
+          buckets[i] += 1
+          break
+      else:
+        buckets[-1] += 1
+      self.duration_sums[view] += total
+      for name, seconds in metrics.breakdown(total).items():
+        if name != "total":
+          self.phase_seconds[(view, name)] += seconds
+
+  def observe_upstream(self, kind, seconds):
+    with self._lock:
+      self.upstream_calls[kind] += 1
+      self.upstream_seconds[kind] += seconds
+
+  def count_cache(self, event):
+    with self._lock:
+      self.cache_events[event] += 1
+
+  def render(self, gauges=None):
+    lines = []
+
+    def family(name, kind, help_text):
+      lines.append(f"# HELP {name} {help_text}")
+      lines.append(f"# TYPE {name} {kind}")
+
+    with self._lock:
+      family("stocks_requests_total", "counter", "Requests handled, by view, method and status.")
+      for (view, method, status), count in sorted(self.requests.items()):
+        lines.append(f'stocks_requests_total{{view="{view}",method="{method}",status="{status}"}} {count}')
+
+      family("stocks_request_duration_seconds", "histogram", "Request latency by view.")
+      for view, buckets in sorted(self.durations.items()):
+        cumulative = 0
+        for bound, count in zip(DURATION_BUCKETS, buckets):
+          cumulative += count
+          lines.append(f'stocks_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+        cumulative += buckets[-1]
+        lines.append(f'stocks_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {cumulative}')
+        lines.append(f'stocks_request_duration_seconds_sum{{view="{view}"}} {self.duration_sums[view]:.6f}')
+        lines.append(f'stocks_request_duration_seconds_count{{view="{view}"}} {cumulative}')
+
+      family("stocks_request_phase_seconds_total", "counter", "Time spent per request phase, by view.")
+      for (view, name), seconds in sorted(self.phase_seconds.items()):
+        lines.append(f'stocks_request_phase_seconds_total{{view="{view}",phase="{name}"}} {seconds:.6f}')
+
+      family("stocks_upstream_calls_total", "counter", "Calls made to the market data source, by data type.")
+      for kind, count in sorted(self.upstream_calls.items()):
+        lines.append(f'stocks_upstream_calls_total{{kind="{kind}"}} {count}')
+
+      family("stocks_upstream_seconds_total", "counter", "Time spent in market data calls, by data type.")
+      for kind, seconds in sorted(self.upstream_seconds.items()):
+        lines.append(f'stocks_upstream_seconds_total{{kind="{kind}"}} {seconds:.6f}')
+
+      family("stocks_cache_events_total", "counter", "Provider cache lookups by outcome.")
+      for event in CACHE_EVENTS:
+        lines.append(f'stocks_cache_events_total{{event="{event}"}} {self.cache_events[event]}')
+
+    for name, (help_text, value) in (gauges or {}).items():
+      family(name, "gauge", help_text)
+      lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
@@ -0,0 +1,220 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, reverse
+
+import stocks.urls
+from stocks.providers import build_provider, set_provider
+
+# Query strings for routes that need one to answer at all.
+DEFAULT_QUERIES = {
+  "portfolio": "?holdings={tickers}",
+  "search": "?q=headline",
+}
+
+# Query strings benchmarked on top of each route's default request.
+VARIANTS = {
+  "stock_data": ["?period=1y&points=100&downsample=lttb", "?period=1y&format=columns"],
+  "screener": ["?PERatio__lt=30&order=-MarketCap&limit=50"],
+  "indicators": ["?set=rsi14,macd,vwap&period=5d&interval=1m&mode=latest"],
+}
+
+
+def current_rss():
+  """Resident set size in bytes (Linux), else the process peak so far."""
+  try:
+    with open("/proc/self/statm") as f:
+      return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+  except (OSError, ValueError, IndexError):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+class RssSampler:
+  def __init__(self, interval=0.01):
+    self.interval = interval
+    self.peak = 0
+    self._stop = threading.Event()
+
+  def _run(self):
+    while not self._stop.is_set():
+      self.peak = max(self.peak, current_rss())
+      self._stop.wait(self.interval)
+
+  def __enter__(self):
+    self.peak = current_rss()
+    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread.start()
+    return self
+
+  def __exit__(self, *exc):
+    self._stop.set()
+    self._thread.join()
+    self.peak = max(self.peak, current_rss())
+
+
+def git_revision():
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return "unknown"
+
+
+class Command(BaseCommand):
+  help = "Drive every stocks route concurrently against replayed market data and report latency, throughput and process memory."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--tickers", default="AAPL,MSFT,NVDA")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint.")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per endpoint first.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--replay-dir", default=settings.STOCKS_REPLAY_DIR)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated upstream latency per replayed call.")
+    parser.add_argument("--only", help="Comma-separated route names to run.")
+    parser.add_argument("--output", default=os.path.join(settings.BASE_DIR, "benchmarks"))
+    parser.add_argument("--compare", help="Earlier results file to print deltas against.")
+
+  def handle(self, *args, **options):
+    if not os.path.isdir(options["replay_dir"]):
+      raise CommandError(
+        f"No replay fixtures in {options['replay_dir']}; record some with record_market_data first."
+      )
+
+    tickers = [t.strip().upper() for t in options["tickers"].split(",") if t.strip()]
+    cases = self.cases(tickers, options["only"])
+
+    with tempfile.TemporaryDirectory() as scratch, override_settings(
+      STOCKS_REPLAY_DIR=options["replay_dir"],
+      STOCKS_REPLAY_LATENCY_MS=options["latency_ms"],
+      STOCKS_PREFETCH_ON_STARTUP=False,
+      # Keep the benchmark's bars and snapshots out of the real stores.
+      STOCKS_BAR_STORE_PATH=os.path.join(scratch, "bars.sqlite3"),
+      STOCKS_SEARCH_INDEX_PATH=os.path.join(scratch, "search.sqlite3"),
+    ):
+      set_provider(build_provider("replay"))
+      setup_test_environment()
+      old_name = connection.creation.create_test_db(verbosity=0)
+      try:
+        results = [self.run_case(name, url, options) for name, url in cases]
+      finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        set_provider(None)
+
+    report = {
+      "revision": git_revision(),
+      "created": datetime.now(timezone.utc).isoformat(),
+      "python": platform.python_version(),
+      "tickers": tickers,
+      "requests": options["requests"],
+      "concurrency": options["concurrency"],
+      "latency_ms": options["latency_ms"],
+      "results": results,
+    }
+    path = self.save(report, options["output"])
+    self.print_table(results, self.load(options["compare"]) if options["compare"] else None)
+    self.stdout.write(f"Results saved to {path}")
+
+  def cases(self, tickers, only):
+    wanted = {n.strip() for n in only.split(",")} if only else None
+    kwargs = {"ticker": tickers[0], "tickers": ",".join(tickers)}
+    cases = []
+    for pattern in stocks.urls.urlpatterns:
+      if not isinstance(pattern, URLPattern) or not pattern.name:
+        continue
+      if wanted and pattern.name not in wanted:
+        continue
+      params = {k: kwargs[k] for k in pattern.pattern.converters}
+      url = reverse(pattern.name, kwargs=params)
+      cases.append((pattern.name, url + DEFAULT_QUERIES.get(pattern.name, "").format(**kwargs)))
+      for query in VARIANTS.get(pattern.name, []):
+        cases.append((f"{pattern.name}{query}", url + query))
+    return cases
+
+  def request(self, clients, url):
+    client = getattr(clients, "client", None)
+    if client is None:
+      client = clients.client = Client()
+    started = time.perf_counter()
+    response = client.get(url)
+    if response.streaming:
+      # Event streams never end; time the first chunk instead.
+      next(iter(response.streaming_content))
+      response.close()
+    return time.perf_counter() - started, response.status_code
+
+  def run_case(self, name, url, options):
+    clients = threading.local()
+    with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+      list(pool.map(lambda _: self.request(clients, url), range(options["warmup"])))
+      with RssSampler() as rss:
+        started = time.perf_counter()
+        samples = list(pool.map(lambda _: self.request(clients, url), range(options["requests"])))
+        elapsed = time.perf_counter() - started
+
+    latencies = np.array([s[0] for s in samples]) * 1000
+    statuses = {}
+    for _, status in samples:
+      statuses[str(status)] = statuses.get(str(status), 0) + 1
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+      "name": name,
+      "url": url,
+      "p50_ms": round(float(p50), 3),
+      "p95_ms": round(float(p95), 3),
+      "p99_ms": round(float(p99), 3),
+      "mean_ms": round(float(latencies.mean()), 3),
+      "requests_per_sec": round(len(samples) / elapsed, 1),
+      # Sampled while this endpoint ran, but for the whole process: memory
+      # held by earlier endpoints (caches, stores) is included.
+      "process_peak_rss_mb": round(rss.peak / 2**20, 1),
+      "statuses": statuses,
+    }
+
+  def save(self, report, output):
+    if output.endswith(".json"):
+      path = output
+      os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    else:
+      os.makedirs(output, exist_ok=True)
+      stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+      path = os.path.join(output, f"{stamp}-{report['revision']}.json")
+    with open(path, "w") as f:
+      json.dump(report, f, indent=2)
+    return path
+
+  def load(self, path):
+    with open(path) as f:
+      return {r["name"]: r for r in json.load(f)["results"]}
+
+  def print_table(self, results, baseline=None):
+    header = f"{'endpoint':<48} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>9} {'proc RSS MB':>12}  status"
+    self.stdout.write(header)
+    self.stdout.write("-" * len(header))
+    for r in results:
+      line = (
+        f"{r['name'][:48]:<48} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+        f"{r['requests_per_sec']:>9.1f} {r['process_peak_rss_mb']:>12.1f}  "
+        + ",".join(f"{k}x{v}" for k, v in sorted(r["statuses"].items()))
+      )
+      before = (baseline or {}).get(r["name"])
+      if before and before["p50_ms"]:
+        change = (r["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+        line += f"  p50 {change:+.0f}% vs {before['p50_ms']:.2f}"
+      self.stdout.write(line)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from stocks.models import FundamentalsSnapshot, NewsMention
+from stocks.search import get_search_index
+
+
+class Command(BaseCommand):
+  help = "Index the stored fundamentals snapshots and news for full-text search."
+
+  def handle(self, *args, **options):
+    index = get_search_index()
+    companies = 0
+    for ticker, info in FundamentalsSnapshot.objects.values_list("ticker", "info").iterator():
+      companies += index.index_company(ticker, info or {})
+
+    stories = {}
+    for mention in NewsMention.objects.select_related("item").order_by("id").iterator():
+      stories.setdefault(mention.ticker, []).append(mention.item)
+    for ticker, items in stories.items():
+      index.index_news(ticker, items)
+
+    self.stdout.write(f"Indexed {companies} companies and news for {len(stories)} tickers")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from stocks.fundamentals import get_fundamentals_store
+
+
+class Command(BaseCommand):
+  help = "Fetch and store fundamentals snapshots so the screener can query them."
+
+  def add_arguments(self, parser):
+    parser.add_argument("tickers", nargs="*")
+    parser.add_argument("--file", help="Read tickers from a file, one per line.")
+    parser.add_argument("--force", action="store_true", help="Re-fetch statements even if the stored ones are current.")
+
+  def handle(self, *args, **options):
+    tickers = list(options["tickers"])
+    if options["file"]:
+      with open(options["file"]) as f:
+        tickers += [line.strip() for line in f if line.strip()]
+
+    store = get_fundamentals_store()
+    for ticker in dict.fromkeys(t.strip().upper() for t in tickers):
+      try:
+        snapshot = store.ingest(ticker) if options["force"] else store.snapshot(ticker)
+        self.stdout.write(f"Stored {ticker} ({snapshot.sector or 'no sector'})")
+      except Exception as e:
+        self.stderr.write(f"Failed to ingest {ticker}: {e}")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from stocks.news import get_news_store
+
+
+class Command(BaseCommand):
+  help = "Fetch and store the current news for tickers (the watchlists by default), e.g. from cron."
+
+  def add_arguments(self, parser):
+    parser.add_argument("tickers", nargs="*")
+    parser.add_argument("--file", help="Read tickers from a file, one per line.")
+
+  def handle(self, *args, **options):
+    store = get_news_store()
+    tickers = list(options["tickers"])
+    if options["file"]:
+      with open(options["file"]) as f:
+        tickers += [line.strip() for line in f if line.strip()]
+    if not tickers:
+      tickers = store.watchlist
+
+    for ticker in dict.fromkeys(t.strip().upper() for t in tickers):
+      try:
+        count = store.ingest(ticker)
+        self.stdout.write(f"Ingested {count} stories for {ticker}")
+      except Exception as e:
+        self.stderr.write(f"Failed to ingest news for {ticker}: {e}")
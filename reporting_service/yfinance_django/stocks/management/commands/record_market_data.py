@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stocks.providers import FRAME_KINDS, RecordingProvider, YFinanceProvider
+
+# (period, interval) windows the stocks views ask for; shorter daily windows
+# are sliced out of the 2y recording on replay.
+HISTORY_WINDOWS = [("5d", "1d"), ("1d", "1m"), ("6mo", "1d"), ("2y", "1d")]
+
+
+class Command(BaseCommand):
+  help = "Record yfinance responses for the given tickers as replay fixtures."
+
+  def add_arguments(self, parser):
+    parser.add_argument("tickers", nargs="+")
+    parser.add_argument("--output", default=settings.STOCKS_REPLAY_DIR)
+
+  def handle(self, *args, **options):
+    recorder = RecordingProvider(YFinanceProvider(), options["output"])
+    tickers = [t.strip().upper() for t in options["tickers"]]
+
+    for ticker in tickers:
+      try:
+        for period, interval in HISTORY_WINDOWS:
+          recorder.history(ticker, period=period, interval=interval)
+        recorder.info(ticker)
+        recorder.news(ticker)
+        for kind in FRAME_KINDS:
+          getattr(recorder, kind)(ticker)
+        self.stdout.write(f"Recorded {ticker}")
+      except Exception as e:
+        self.stderr.write(f"Failed to record {ticker}: {e}")
@@ -0,0 +1,129 @@
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.text import compress_string
+
+from .instrumentation import end_request, registry, start_request
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+# Bodies smaller than this are not worth compressing.
+MIN_COMPRESS_SIZE = 200
+# Brotli's top qualities are meant for static assets; 5 compresses better
+# than gzip at about the same speed.
+BROTLI_QUALITY = 5
+
+_CODING_SUFFIX = re.compile(r'-(?:br|gzip)"')
+
+
+def _finish(request, response, metrics):
+  total = time.perf_counter() - metrics.started
+  match = getattr(request, "resolver_match", None)
+  view = match.url_name if match and match.url_name else "unmatched"
+  registry.observe_request(view, request.method, response.status_code, metrics, total)
+  response["Server-Timing"] = metrics.server_timing(total)
+  if metrics.stale:
+    response["X-Data-Stale"] = "true"
+  return response
+
+
+@sync_and_async_middleware
+def timing_middleware(get_response):
+  """Times every request and reports its phases as ``Server-Timing``."""
+  if iscoroutinefunction(get_response):
+    async def middleware(request):
+      metrics, token = start_request()
+      try:
+        response = await get_response(request)
+      finally:
+        end_request(token)
+      return _finish(request, response, metrics)
+  else:
+    def middleware(request):
+      metrics, token = start_request()
+      try:
+        response = get_response(request)
+      finally:
+        end_request(token)
+      return _finish(request, response, metrics)
+  return middleware
+
+
+def accepted_encodings(header):
+  accepted = set()
+  for part in header.split(","):
+    name, _, params = part.partition(";")
+    params = params.strip().replace(" ", "")
+    if params.startswith("q="):
+      try:
+        if float(params[2:]) <= 0:
+          continue
+      except ValueError:
+        continue
+    accepted.add(name.strip().lower())
+  return accepted
+
+
+def _strip_codings(request):
+  # Compressed responses carry the view's ETag with the coding appended,
+  # so it stays strong; compare what clients send back without it.
+  sent = request.META.get("HTTP_IF_NONE_MATCH")
+  if sent:
+    request.META["HTTP_IF_NONE_MATCH"] = _CODING_SUFFIX.sub('"', sent)
+  return sent or ""
+
+
+def _tag_coding(response, coding):
+  etag = response.get("ETag")
+  if etag and etag.endswith('"'):
+    response["ETag"] = f'{etag[:-1]}-{coding}"'
+
+
+def _compress(request, response, sent):
+  if response.status_code == 304:
+    # Hand back the validator in the form the client holds.
+    for coding in ("br", "gzip"):
+      etag = response.get("ETag")
+      if etag and f'{etag[:-1]}-{coding}"' in sent:
+        _tag_coding(response, coding)
+        break
+    return response
+  if response.streaming or response.has_header("Content-Encoding") or len(response.content) < MIN_COMPRESS_SIZE:
+    return response
+
+  patch_vary_headers(response, ["Accept-Encoding"])
+  accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+  if brotli is not None and "br" in accepted:
+    coding, body = "br", brotli.compress(response.content, quality=BROTLI_QUALITY)
+  elif "gzip" in accepted:
+    coding, body = "gzip", compress_string(response.content)
+  else:
+    return response
+  if len(body) >= len(response.content):
+    return response
+
+  response.content = body
+  response["Content-Length"] = str(len(body))
+  response["Content-Encoding"] = coding
+  _tag_coding(response, coding)
+  return response
+
+
+@sync_and_async_middleware
+def compression_middleware(get_response):
+  """Compresses responses with brotli (when installed) or gzip."""
+  if iscoroutinefunction(get_response):
+    async def middleware(request):
+      sent = _strip_codings(request)
+      return _compress(request, await get_response(request), sent)
+  else:
+    def middleware(request):
+      sent = _strip_codings(request)
+      return _compress(request, get_response(request), sent)
+  return middleware
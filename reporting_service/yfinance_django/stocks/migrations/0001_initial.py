@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FundamentalsSnapshot',
+            fields=[
+                ('ticker', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('reporting_period', models.CharField(blank=True, max_length=64)),
+                ('checked_at', models.DateTimeField()),
+                ('statements_at', models.DateTimeField()),
+                ('sector', models.CharField(blank=True, max_length=128, null=True)),
+                ('market_cap', models.FloatField(null=True)),
+                ('pe_ratio', models.FloatField(null=True)),
+                ('eps', models.FloatField(null=True)),
+                ('book_value', models.FloatField(null=True)),
+                ('dividend_yield', models.FloatField(null=True)),
+                ('employees', models.BigIntegerField(null=True)),
+                ('revenue_ttm', models.FloatField(null=True)),
+                ('net_income_ttm', models.FloatField(null=True)),
+                ('info', models.JSONField(default=dict)),
+                ('summary', models.JSONField(default=dict)),
+                ('ratios', models.JSONField(null=True)),
+                ('history', models.JSONField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='current_ratio',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='debt_to_equity',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='gross_margin',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='industry',
+            field=models.CharField(blank=True, max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='interest_coverage',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='net_margin',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='operating_margin',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='quick_ratio',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='return_on_assets',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='fundamentalssnapshot',
+            name='return_on_equity',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='fundamentalssnapshot',
+            name='dividend_yield',
+            field=models.FloatField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='fundamentalssnapshot',
+            name='market_cap',
+            field=models.FloatField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='fundamentalssnapshot',
+            name='pe_ratio',
+            field=models.FloatField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='fundamentalssnapshot',
+            name='sector',
+            field=models.CharField(blank=True, db_index=True, max_length=128, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='fundamentalssnapshot',
+            index=models.Index(fields=['sector', 'market_cap'], name='stocks_fund_sector_mcap_idx'),
+        ),
+    ]
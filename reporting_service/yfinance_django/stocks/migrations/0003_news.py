@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0002_screener_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsItem',
+            fields=[
+                ('id', models.CharField(max_length=128, primary_key=True, serialize=False)),
+                ('title', models.TextField()),
+                ('link', models.TextField(blank=True)),
+                ('publisher', models.CharField(blank=True, max_length=255)),
+                ('type', models.CharField(blank=True, max_length=32)),
+                ('thumbnail', models.JSONField(default=dict)),
+                ('pub_date', models.DateTimeField(db_index=True, null=True)),
+                ('ingested_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='NewsMention',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=32)),
+                ('pub_date', models.DateTimeField(null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mentions', to='stocks.newsitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ticker', 'pub_date'], name='stocks_news_ticker_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ticker', 'item'), name='stocks_news_ticker_item_uniq')],
+            },
+        ),
+    ]
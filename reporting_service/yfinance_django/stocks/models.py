@@ -1,3 +1,93 @@
 from django.db import models
 
-# Create your models here.
+
+class FundamentalsSnapshot(models.Model):
+  """Everything the fundamentals endpoints serve for one ticker.
+
+  Statements are fetched once per reporting period; the derived payloads
+  (summary with TTM sums, ratios, yearly history) are computed when the
+  snapshot is ingested so endpoints only read them back.
+  """
+
+  ticker = models.CharField(max_length=32, primary_key=True)
+
+  # Latest quarter / fiscal year end reported by ``info``; a change means a
+  # new filing and triggers a statements refresh.
+  reporting_period = models.CharField(max_length=64, blank=True)
+  checked_at = models.DateTimeField()
+  statements_at = models.DateTimeField()
+
+  sector = models.CharField(max_length=128, null=True, blank=True, db_index=True)
+  industry = models.CharField(max_length=128, null=True, blank=True)
+  market_cap = models.FloatField(null=True, db_index=True)
+  pe_ratio = models.FloatField(null=True, db_index=True)
+  eps = models.FloatField(null=True)
+  book_value = models.FloatField(null=True)
+  dividend_yield = models.FloatField(null=True, db_index=True)
+  employees = models.BigIntegerField(null=True)
+  revenue_ttm = models.FloatField(null=True)
+  net_income_ttm = models.FloatField(null=True)
+
+  # Unformatted ratios from the latest annual statements, for screening.
+  gross_margin = models.FloatField(null=True)
+  operating_margin = models.FloatField(null=True)
+  net_margin = models.FloatField(null=True)
+  return_on_equity = models.FloatField(null=True)
+  return_on_assets = models.FloatField(null=True)
+  current_ratio = models.FloatField(null=True)
+  quick_ratio = models.FloatField(null=True)
+  debt_to_equity = models.FloatField(null=True)
+  interest_coverage = models.FloatField(null=True)
+
+  info = models.JSONField(default=dict)
+  summary = models.JSONField(default=dict)
+  ratios = models.JSONField(null=True)
+  history = models.JSONField(null=True)
+
+  class Meta:
+    indexes = [
+      models.Index(fields=["sector", "market_cap"], name="stocks_fund_sector_mcap_idx"),
+    ]
+
+  def __str__(self):
+    return self.ticker
+
+
+class NewsItem(models.Model):
+  """A news story, stored once however many tickers it mentions."""
+
+  id = models.CharField(max_length=128, primary_key=True)
+  title = models.TextField()
+  link = models.TextField(blank=True)
+  publisher = models.CharField(max_length=255, blank=True)
+  type = models.CharField(max_length=32, blank=True)
+  thumbnail = models.JSONField(default=dict)
+  pub_date = models.DateTimeField(null=True, db_index=True)
+  ingested_at = models.DateTimeField(auto_now_add=True)
+
+  def __str__(self):
+    return self.title
+
+
+class NewsMention(models.Model):
+  """Links a story to a ticker whose feed carried it.
+
+  The auto-increment id doubles as the feed cursor: it only grows, so
+  stories ingested late (with an older ``pub_date``) are still picked up
+  by clients polling for what is new.
+  """
+
+  item = models.ForeignKey(NewsItem, on_delete=models.CASCADE, related_name="mentions")
+  ticker = models.CharField(max_length=32)
+  pub_date = models.DateTimeField(null=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=["ticker", "item"], name="stocks_news_ticker_item_uniq"),
+    ]
+    indexes = [
+      models.Index(fields=["ticker", "pub_date"], name="stocks_news_ticker_date_idx"),
+    ]
+
+  def __str__(self):
+    return f"{self.ticker}: {self.item_id}"
@@ -0,0 +1,114 @@
+import threading
+import time
+import warnings
+
+import numpy as np
+from django.conf import settings
+
+from .bar_store import get_bar_store
+
+METRICS = ("change", "volatility", "volume_spike")
+
+
+def top_k(values, k, largest=True):
+  """Indices of the ``k`` largest (or smallest) values, best first.
+
+  Uses ``argpartition`` so only the selected ``k`` entries get sorted.
+  NaNs never make the cut.
+  """
+  keys = np.where(np.isnan(values), np.inf, -values if largest else values)
+  k = min(k, int(np.isfinite(keys).sum()))
+  if k <= 0:
+    return np.array([], dtype=int)
+  idx = np.argpartition(keys, k - 1)[:k]
+  return idx[np.argsort(keys[idx], kind="stable")]
+
+
+class MoversSnapshot:
+  """Per-ticker movers metrics for one universe, computed in one pass.
+
+  ``change`` is the percent change across the last ``sessions`` closes,
+  ``volatility`` the standard deviation of daily returns (in percent) and
+  ``volume_spike`` the last session's volume over the average of the
+  sessions before it. The best and worst ``depth`` entries of each metric
+  are selected up front, so queries are O(k) slices.
+  """
+
+  def __init__(self, tickers, closes, volumes, sessions=5, depth=50):
+    self.tickers = np.array(tickers)
+    self.created = time.monotonic()
+    self.depth = depth
+    self.sessions = len(closes)
+
+    closes = closes.reindex(columns=tickers)
+    volumes = volumes.reindex(columns=tickers)
+    recent = closes.tail(sessions).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+      # All-NaN columns (unknown tickers) just yield NaN metrics.
+      warnings.simplefilter("ignore", RuntimeWarning)
+      change = np.nan_to_num((recent[-1] - recent[0]) / recent[0] * 100, nan=0.0) if len(recent) >= 2 else np.full(len(tickers), np.nan)
+      returns = closes.pct_change(fill_method=None).to_numpy()[1:] * 100
+      volatility = np.nanstd(returns, axis=0, ddof=1) if len(returns) >= 2 else np.full(len(tickers), np.nan)
+      vol = volumes.to_numpy(dtype=float)
+      volume_spike = vol[-1] / np.nanmean(vol[:-1], axis=0) if len(vol) >= 2 else np.full(len(tickers), np.nan)
+    volume_spike[~np.isfinite(volume_spike)] = np.nan
+
+    self.values = {"change": change, "volatility": volatility, "volume_spike": volume_spike}
+    self._ranked = {
+      (metric, largest): top_k(values, depth, largest)
+      for metric, values in self.values.items()
+      for largest in (True, False)
+    }
+
+  def top(self, metric, k=5, largest=True):
+    """``[(ticker, value), ...]`` for the ``k`` highest (or lowest) values."""
+    if k < 1:
+      return []
+    ranked = self._ranked[(metric, largest)] if k <= self.depth else top_k(self.values[metric], k, largest)
+    values = self.values[metric]
+    return [(str(self.tickers[i]), float(values[i])) for i in ranked[:k]]
+
+
+class MoversIndex:
+  """Caches one ``MoversSnapshot`` per ticker universe.
+
+  Gainers, losers, most-volatile and volume-spike queries for the same
+  universe share a snapshot, which is rebuilt from the bar store once it
+  is older than ``refresh`` seconds.
+  """
+
+  def __init__(self, refresh=60, period="1mo", sessions=5, max_universes=64):
+    self.refresh = refresh
+    self.period = period
+    self.sessions = sessions
+    self.max_universes = max_universes
+    self._lock = threading.Lock()
+    self._snapshots = {}
+
+  def snapshot(self, tickers):
+    key = tuple(dict.fromkeys(t.upper() for t in tickers))
+    with self._lock:
+      snapshot = self._snapshots.get(key)
+    if snapshot is not None and time.monotonic() - snapshot.created < self.refresh:
+      return snapshot
+
+    bars = get_bar_store().bars(list(key), period=self.period)
+    closes = bars.pivot(index="ts", columns="ticker", values="Close")
+    volumes = bars.pivot(index="ts", columns="ticker", values="Volume")
+    snapshot = MoversSnapshot(list(key), closes, volumes, sessions=self.sessions)
+
+    with self._lock:
+      self._snapshots[key] = snapshot
+      while len(self._snapshots) > self.max_universes:
+        self._snapshots.pop(next(iter(self._snapshots)))
+    return snapshot
+
+
+_index = None
+
+
+def get_movers_index():
+  global _index
+  if _index is None:
+    _index = MoversIndex(refresh=getattr(settings, "STOCKS_MOVERS_REFRESH_SECONDS", 60))
+  return _index
@@ -0,0 +1,207 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from .instrumentation import phase
+from .models import NewsItem, NewsMention
+from .prefetch import get_leader_lease
+from .providers import get_provider
+from .search import get_search_index
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE = 200
+MAX_TRACKED = 1000
+
+
+def parse_item(raw):
+  """A ``NewsItem`` from one entry of yfinance's ``Ticker.news``, or ``None``."""
+  content = raw.get("content") if isinstance(raw, dict) else None
+  if not isinstance(content, dict):
+    return None
+  title = content.get("title", "N/A")
+  pub = content.get("pubDate")
+  item_id = raw.get("id") or content.get("id")
+  if not item_id:
+    item_id = hashlib.sha1(f"{title}|{pub}".encode()).hexdigest()
+  return NewsItem(
+    id=str(item_id),
+    title=title or "",
+    link=content.get("link", "N/A") or "",
+    publisher=content.get("publisher", "N/A") or "",
+    type=content.get("type", "N/A") or "",
+    thumbnail=content.get("thumbnail") or {},
+    pub_date=parse_datetime(pub) if isinstance(pub, str) else None,
+  )
+
+
+def format_item(item):
+  return {
+    "id": item.id,
+    "title": item.title,
+    "link": item.link,
+    "publisher": item.publisher,
+    "time": item.pub_date.strftime("%Y-%m-%dT%H:%M:%SZ") if item.pub_date else "N/A",
+    "type": item.type,
+    "thumbnail": item.thumbnail,
+  }
+
+
+class NewsStore:
+  """Ingests ticker news into the database and serves it back.
+
+  Stories are deduplicated by Yahoo's id, so one shared across tickers is
+  stored once with a mention per ticker. A background poller re-ingests
+  the watchlists, and tickers requested within the last ``track_for``
+  seconds, each ``refresh_after`` seconds; requests only ingest a ticker
+  themselves when it has not been polled recently (e.g. the first time it
+  is asked for). Tickers upstream has no news for are not polled.
+
+  Only the worker holding the ``lease`` polls, so the deployment spends
+  one poller's worth of the upstream budget.
+  """
+
+  def __init__(self, watchlist=(), refresh_after=300, track_for=3600, lease=None):
+    self.watchlist = [t.strip().upper() for t in watchlist]
+    self.refresh_after = refresh_after
+    self.track_for = track_for
+    self.lease = lease
+    self._ingested = {}
+    # Requested ticker -> when it was last asked for, oldest first.
+    self._requested = {}
+    self._lock = threading.Lock()
+    self._thread = None
+
+  def ingest(self, ticker):
+    """Fetch the current news for ``ticker`` and store what is new."""
+    ticker = ticker.strip().upper()
+    items = {}
+    for raw in get_provider().news(ticker) or []:
+      item = parse_item(raw)
+      if item is not None:
+        items[item.id] = item
+    with transaction.atomic():
+      NewsItem.objects.bulk_create(items.values(), ignore_conflicts=True)
+      NewsMention.objects.bulk_create(
+        [NewsMention(item_id=i.id, ticker=ticker, pub_date=i.pub_date) for i in items.values()],
+        ignore_conflicts=True,
+      )
+    get_search_index().index_news(ticker, items.values())
+    with self._lock:
+      self._ingested[ticker] = time.monotonic()
+      if not items:
+        self._requested.pop(ticker, None)
+    return len(items)
+
+  def track(self, tickers):
+    """Poll ``tickers`` for the next ``track_for`` seconds."""
+    now = time.monotonic()
+    with self._lock:
+      for ticker in tickers:
+        self._requested.pop(ticker, None)
+        self._requested[ticker] = now
+      while len(self._requested) > MAX_TRACKED:
+        self._requested.pop(next(iter(self._requested)))
+
+  def tracked(self):
+    """The watchlists plus tickers requested recently."""
+    expired = time.monotonic() - self.track_for
+    with self._lock:
+      while self._requested and next(iter(self._requested.values())) < expired:
+        self._requested.pop(next(iter(self._requested)))
+      return list(dict.fromkeys(self.watchlist + list(self._requested)))
+
+  def stale(self, tickers):
+    """Tickers not ingested within ``refresh_after`` seconds."""
+    now = time.monotonic()
+    with self._lock:
+      return [t for t in tickers if now - self._ingested.get(t, -self.refresh_after - 1) > self.refresh_after]
+
+  @phase("fetch")
+  def latest(self, tickers, limit=20):
+    """Newest ``limit`` stories per ticker, as ``{ticker: [item, ...]}``."""
+    results = {}
+    for ticker in tickers:
+      mentions = (
+        NewsMention.objects.filter(ticker=ticker)
+        .select_related("item")
+        .order_by("-pub_date", "-id")[:limit]
+      )
+      results[ticker] = [format_item(m.item) for m in mentions]
+    return results
+
+  @phase("fetch")
+  def feed(self, tickers, since=None, limit=50):
+    """One page of stories for ``tickers``, merged and deduplicated.
+
+    Without ``since`` the newest stories are returned; with it, stories
+    mentioned after that cursor, oldest first. Either way the returned
+    ``cursor`` is what to pass as ``since`` to get only what is new.
+    """
+    mentions = NewsMention.objects.filter(ticker__in=tickers).select_related("item")
+    if since is None:
+      rows = list(mentions.order_by("-pub_date", "-id")[:limit])
+      cursor = mentions.aggregate(last=Max("id"))["last"] or 0
+      has_more = False
+    else:
+      rows = list(mentions.filter(id__gt=since).order_by("id")[:limit + 1])
+      has_more = len(rows) > limit
+      rows = rows[:limit]
+      cursor = rows[-1].id if rows else since
+
+    items = {}
+    for mention in rows:
+      entry = items.get(mention.item_id)
+      if entry is None:
+        entry = items[mention.item_id] = {**format_item(mention.item), "tickers": []}
+      entry["tickers"].append(mention.ticker)
+    return {"items": list(items.values()), "cursor": str(cursor), "has_more": has_more}
+
+  def poll(self):
+    for ticker in self.tracked():
+      try:
+        self.ingest(ticker)
+      except Exception as e:
+        logger.error(f"Ingesting news for {ticker} failed: {str(e)}")
+
+  def start(self):
+    with self._lock:
+      if self._thread is not None and self._thread.is_alive():
+        return
+      self._thread = threading.Thread(target=self._run, name="stocks-news", daemon=True)
+      self._thread.start()
+
+  def _run(self):
+    # Wake often enough to keep the lease while leading, and poll when due.
+    lease = self.lease or get_leader_lease()
+    step = min(self.refresh_after, lease.ttl / 3)
+    polled = None
+    while True:
+      started = time.monotonic()
+      if lease.held() and (polled is None or started - polled >= self.refresh_after):
+        polled = started
+        self.poll()
+        close_old_connections()
+      time.sleep(max(step - (time.monotonic() - started), 0))
+
+
+_store = None
+
+
+def get_news_store():
+  global _store
+  if _store is None:
+    watchlist = [t for tickers in getattr(settings, "STOCKS_WATCHLISTS", {}).values() for t in tickers]
+    _store = NewsStore(
+      watchlist=list(dict.fromkeys(watchlist)),
+      refresh_after=getattr(settings, "STOCKS_NEWS_REFRESH_SECONDS", 300),
+      track_for=getattr(settings, "STOCKS_NEWS_TRACK_SECONDS", 3600),
+      lease=get_leader_lease(),
+    )
+  return _store
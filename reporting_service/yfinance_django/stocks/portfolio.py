@@ -0,0 +1,177 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from .bar_store import get_bar_store
+
+# Portfolio risk and return over daily bars from the bar store.
+#
+# Holdings are aligned into one T x N matrix of daily returns (closes are
+# forward-filled across the union of trading days, so a market holiday
+# counts as a flat day rather than dropping the date for every holding),
+# and every statistic is a matrix product over it: the portfolio series is
+# R @ w, its variance w' S w, per-holding betas and risk contributions
+# come from one covariance pass.
+
+TRADING_DAYS = 252
+MAX_HOLDINGS = 500
+
+
+def parse_holdings(text):
+  """``"AAPL:0.4,MSFT:0.6"`` -> ``(["AAPL", "MSFT"], array([0.4, 0.6]))``.
+
+  Weights are normalized to sum to one, so shares, amounts or percentages
+  all work; holdings given without weights are equally weighted. Short
+  (negative) weights are rejected: the portfolio's wealth could then fall
+  below zero, where annualized return and drawdown are undefined.
+  """
+  tickers, weights = [], []
+  for item in (text or "").split(","):
+    item = item.strip()
+    if not item:
+      continue
+    ticker, _, weight = item.partition(":")
+    ticker = ticker.strip().upper()
+    if ticker in tickers:
+      raise ValueError(f"Duplicate holding: {ticker}")
+    try:
+      weights.append(float(weight) if weight.strip() else None)
+    except ValueError:
+      raise ValueError(f"Invalid weight for {ticker}: {weight}")
+    tickers.append(ticker)
+
+  if not tickers:
+    raise ValueError("No holdings given")
+  if len(tickers) > MAX_HOLDINGS:
+    raise ValueError(f"At most {MAX_HOLDINGS} holdings are supported")
+  if all(w is None for w in weights):
+    weights = [1.0] * len(tickers)
+  elif any(w is None for w in weights):
+    raise ValueError("Give a weight for every holding, or for none")
+
+  weights = np.array(weights, dtype=float)
+  if not np.isfinite(weights).all() or weights.sum() == 0:
+    raise ValueError("Weights must be finite and must not sum to zero")
+  if (weights < 0).any():
+    raise ValueError("Weights must not be negative")
+  return tickers, weights / weights.sum()
+
+
+def aligned_returns(closes):
+  """Daily simple returns, with closes carried over non-trading days."""
+  filled = closes.ffill()
+  returns = filled.pct_change(fill_method=None).iloc[1:]
+  # Before a holding's first close there is nothing to carry; count it flat.
+  return returns.index, np.nan_to_num(returns.to_numpy(), nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def max_drawdown(wealth, dates):
+  peaks = np.maximum.accumulate(wealth)
+  drawdowns = wealth / peaks - 1
+  trough = int(np.argmin(drawdowns))
+  peak = int(np.argmax(wealth[:trough + 1]))
+  return {
+    "max_drawdown": float(drawdowns[trough]),
+    "peak": dates[peak],
+    "trough": dates[trough],
+  }
+
+
+def value_at_risk(returns, mean, sigma, confidence, horizon):
+  """Historical and parametric (normal) VaR and expected shortfall, as positive losses."""
+  if horizon > 1:
+    # Overlapping horizon-day returns for the historical estimate.
+    wealth = np.cumprod(1 + returns)
+    wealth = np.insert(wealth, 0, 1.0)
+    returns = wealth[horizon:] / wealth[:-horizon] - 1
+  cutoff = np.quantile(returns, 1 - confidence)
+  z = NormalDist().inv_cdf(1 - confidence)
+  parametric = -(mean * horizon + z * sigma * math.sqrt(horizon))
+  tail = -(mean * horizon - sigma * math.sqrt(horizon) * NormalDist().pdf(z) / (1 - confidence))
+  return {
+    "confidence": confidence,
+    "horizon_days": horizon,
+    "historical_var": float(-cutoff),
+    "historical_es": float(-returns[returns <= cutoff].mean()),
+    "parametric_var": float(parametric),
+    "parametric_es": float(tail),
+  }
+
+
+def analyze(tickers, weights, benchmark=None, period="1y", confidence=0.95, horizon=1, series=False):
+  """Return, volatility, beta, VaR and drawdown for a weighted portfolio."""
+  universe = list(dict.fromkeys(tickers + ([benchmark.upper()] if benchmark else [])))
+  closes = get_bar_store().closes(universe, period=period)
+
+  held = [t for t in tickers if t in closes.columns and closes[t].notna().any()]
+  missing = [t for t in tickers if t not in held]
+  if not held:
+    raise ValueError("No price data for any holding")
+  positions = {t: i for i, t in enumerate(tickers)}
+  w = weights[[positions[t] for t in held]]
+  w = w / w.sum()
+
+  dates, matrix = aligned_returns(closes)
+  if len(dates) < 2:
+    raise ValueError("Not enough price history for this period")
+  columns = {t: i for i, t in enumerate(closes.columns)}
+  R = matrix[:, [columns[t] for t in held]]
+
+  portfolio = R @ w
+  wealth = np.cumprod(1 + portfolio)
+  days = len(portfolio)
+  centered = R - R.mean(axis=0)
+  cov = centered.T @ centered / (days - 1)
+  variance = float(w @ cov @ w)
+  sigma = math.sqrt(max(variance, 0.0))
+  mean = float(portfolio.mean())
+  labels = [d.isoformat() for d in dates]
+
+  result = {
+    "holdings": len(held),
+    "missing": missing,
+    "period": period,
+    "start": labels[0],
+    "end": labels[-1],
+    "observations": days,
+    "total_return": float(wealth[-1] - 1),
+    "annualized_return": float(wealth[-1] ** (TRADING_DAYS / days) - 1),
+    "annualized_volatility": sigma * math.sqrt(TRADING_DAYS),
+    "sharpe": mean / sigma * math.sqrt(TRADING_DAYS) if sigma else None,
+    **max_drawdown(wealth, labels),
+    "var": value_at_risk(portfolio, mean, sigma, confidence, horizon),
+  }
+
+  # Each holding's share of portfolio variance: w_i (S w)_i / w' S w.
+  marginal = cov @ w
+  contributions = w * marginal / variance if variance else np.zeros_like(w)
+  result["weights"] = [
+    {"Ticker": t, "weight": float(wi), "risk_contribution": float(ci)}
+    for t, wi, ci in zip(held, w, contributions)
+  ]
+
+  if benchmark:
+    benchmark = benchmark.upper()
+    if benchmark in columns and closes[benchmark].notna().any():
+      b = matrix[:, columns[benchmark]]
+      b_centered = b - b.mean()
+      b_var = float(b_centered @ b_centered)
+      betas = centered.T @ b_centered / b_var if b_var else np.full(len(held), np.nan)
+      beta = float(w @ betas)
+      bench_wealth = np.cumprod(1 + b)
+      result["benchmark"] = {
+        "ticker": benchmark,
+        "beta": beta,
+        "correlation": float(np.corrcoef(portfolio, b)[0, 1]) if b_var and variance else None,
+        "total_return": float(bench_wealth[-1] - 1),
+        "alpha_annualized": float((mean - beta * b.mean()) * TRADING_DAYS),
+      }
+      for row, holding_beta in zip(result["weights"], betas):
+        row["beta"] = None if np.isnan(holding_beta) else float(holding_beta)
+    else:
+      result["benchmark"] = {"ticker": benchmark, "error": "No price data for benchmark"}
+
+  if series:
+    result["series"] = {"dates": labels, "returns": portfolio.tolist(), "cumulative": (wealth - 1).tolist()}
+  return result
@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .aggregation import get_intraday_aggregator
+from .quotes import latest_quotes
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+  """Elects one worker process to poll upstream for all of them.
+
+  The leader holds ``KEY`` in a shared cache and renews it while it
+  polls; if it stops, the key expires after ``ttl`` seconds and the next
+  worker to ask takes over. Without a shared cache every process leads.
+  """
+
+  KEY = "stocks:prefetch:leader"
+
+  def __init__(self, shared=None, ttl=90):
+    self.shared = shared
+    self.ttl = ttl
+    self._token = uuid.uuid4().hex
+
+  @property
+  def _id(self):
+    # Includes the pid so workers forked from a preloaded master differ.
+    return f"{os.getpid()}-{self._token}"
+
+  def held(self):
+    """Claim or renew the lease; always true without a shared cache."""
+    if self.shared is None:
+      return True
+    try:
+      if self.shared.add(self.KEY, self._id, self.ttl):
+        return True
+      if self.shared.get(self.KEY) == self._id:
+        self.shared.touch(self.KEY, self.ttl)
+        return True
+    except Exception as e:
+      logger.warning(f"Leader election failed: {str(e)}")
+      return True
+    return False
+
+
+class WatchlistPrefetcher:
+  """Keeps the latest quotes for configured watchlists warm in memory.
+
+  A background thread refreshes every watchlist each ``interval`` seconds
+  with one batched download and stores the ready-to-serve
+  ``latest_quotes`` payload, so the endpoints reading a watchlist never
+  wait on upstream. A snapshot older than ``max_age`` (e.g. if the thread
+  is not running) is refreshed synchronously on read.
+
+  With a ``shared`` cache, worker processes elect one leader (through a
+  ``LeaderLease``) that polls upstream and publishes each snapshot; the
+  others serve what it published.
+  """
+
+  def __init__(self, watchlists, interval=30, max_age=None, shared=None, lease=None):
+    self.watchlists = {name: [t.strip().upper() for t in tickers] for name, tickers in watchlists.items()}
+    self.interval = interval
+    self.max_age = max_age or interval * 3
+    self.shared = shared
+    self.lease = lease or LeaderLease(shared, interval * 3)
+    self._snapshots = {}
+    self._lock = threading.Lock()
+    self._thread = None
+
+  def _shared_key(self, name):
+    return f"stocks:prefetch:{name}"
+
+  def refresh(self, name):
+    tickers = self.watchlists[name]
+    aggregator = get_intraday_aggregator()
+    aggregator.refresh(tickers, force=True)
+    bars = aggregator.latest(tickers)
+    snapshot = latest_quotes(bars, tickers)
+    with self._lock:
+      self._snapshots[name] = (time.monotonic(), snapshot)
+    if self.shared is not None:
+      try:
+        self.shared.set(self._shared_key(name), (time.time(), snapshot), self.max_age)
+      except Exception as e:
+        logger.warning(f"Publishing watchlist {name} failed: {str(e)}")
+    return snapshot
+
+  def _published(self, name):
+    try:
+      entry = self.shared.get(self._shared_key(name))
+    except Exception:
+      return None
+    if entry is None or time.time() - entry[0] > self.max_age:
+      return None
+    with self._lock:
+      self._snapshots[name] = (time.monotonic() - (time.time() - entry[0]), entry[1])
+    return entry[1]
+
+  def is_leader(self):
+    return self.lease.held()
+
+  def refresh_all(self):
+    for name in self.watchlists:
+      try:
+        self.refresh(name)
+      except Exception as e:
+        logger.error(f"Prefetching watchlist {name} failed: {str(e)}")
+
+  def snapshot(self, name):
+    if name not in self.watchlists:
+      raise KeyError(f"Unknown watchlist: {name}")
+    self.start()
+    with self._lock:
+      entry = self._snapshots.get(name)
+    if entry is not None and time.monotonic() - entry[0] <= min(self.interval, self.max_age):
+      return entry[1]
+    published = self._published(name) if self.shared is not None else None
+    if published is not None:
+      return published
+    if entry is None or time.monotonic() - entry[0] > self.max_age:
+      return self.refresh(name)
+    return entry[1]
+
+  def start(self):
+    with self._lock:
+      if self._thread is not None and self._thread.is_alive():
+        return
+      self._thread = threading.Thread(target=self._run, name="stocks-prefetch", daemon=True)
+      self._thread.start()
+
+  def _run(self):
+    while True:
+      started = time.monotonic()
+      if self.is_leader():
+        self.refresh_all()
+      time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+
+_lease = None
+_prefetcher = None
+
+
+def _shared_cache():
+  alias = getattr(settings, "STOCKS_SHARED_CACHE", None)
+  return caches[alias] if alias else None
+
+
+def get_leader_lease():
+  """The lease shared by every background poller of this process."""
+  global _lease
+  if _lease is None:
+    _lease = LeaderLease(_shared_cache(), ttl=getattr(settings, "STOCKS_PREFETCH_INTERVAL_SECONDS", 30) * 3)
+  return _lease
+
+
+def get_prefetcher():
+  global _prefetcher
+  if _prefetcher is None:
+    _prefetcher = WatchlistPrefetcher(
+      getattr(settings, "STOCKS_WATCHLISTS", {}),
+      interval=getattr(settings, "STOCKS_PREFETCH_INTERVAL_SECONDS", 30),
+      shared=_shared_cache(),
+      lease=get_leader_lease(),
+    )
+  return _prefetcher
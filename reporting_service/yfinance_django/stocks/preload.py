@@ -0,0 +1,36 @@
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+from .bar_store import get_bar_store
+from .prefetch import get_prefetcher
+
+logger = logging.getLogger(__name__)
+
+
+def preload_tickers():
+  tickers = list(getattr(settings, "STOCKS_PRELOAD_TICKERS", []))
+  for watchlist in getattr(settings, "STOCKS_WATCHLISTS", {}).values():
+    tickers.extend(watchlist)
+  return list(dict.fromkeys(t.strip().upper() for t in tickers))
+
+
+def preload():
+  """Warm the shared stores once, before worker processes are forked.
+
+  Syncs ``STOCKS_PRELOAD_WINDOWS`` of bars for the watchlist and preload
+  tickers into the bar store and publishes the first watchlist snapshots,
+  so workers start from warm data instead of each fetching it.
+  """
+  tickers = preload_tickers()
+  store = get_bar_store()
+  for period, interval in getattr(settings, "STOCKS_PRELOAD_WINDOWS", []):
+    try:
+      store.sync(tickers, period, interval)
+      logger.info(f"Preloaded {period} of {interval} bars for {len(tickers)} tickers")
+    except Exception as e:
+      logger.error(f"Preloading {period}/{interval} bars failed: {str(e)}")
+  get_prefetcher().refresh_all()
+  # Connections must not be shared with the forked workers.
+  connections.close_all()
@@ -0,0 +1,642 @@
+import json
+import logging
+import math
+import os
+import time
+
+import pandas as pd
+import yfinance as yf
+from django.conf import settings
+from django.core.cache import caches
+
+from .cache import TieredCache
+from .instrumentation import phase, record_upstream
+from .resilience import (
+  AdaptiveRateLimiter, CircuitBreaker, UpstreamUnavailable, YFRateLimitError, is_client_error, is_throttle,
+)
+
+logger = logging.getLogger(__name__)
+
+# Every piece of market data the views need goes through one of these
+# providers, so the upstream source can be swapped (live Yahoo, recorded
+# fixtures, ...) without touching the views themselves.
+
+FRAME_KINDS = ("financials", "balance_sheet", "cashflow", "quarterly_income_stmt")
+
+
+class MarketDataProvider:
+  name = "base"
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    raise NotImplementedError
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    raise NotImplementedError
+
+  def info(self, ticker):
+    raise NotImplementedError
+
+  def financials(self, ticker):
+    raise NotImplementedError
+
+  def balance_sheet(self, ticker):
+    raise NotImplementedError
+
+  def cashflow(self, ticker):
+    raise NotImplementedError
+
+  def quarterly_income_stmt(self, ticker):
+    raise NotImplementedError
+
+  def news(self, ticker):
+    raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+  name = "yfinance"
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    if start or end:
+      return yf.Ticker(ticker).history(start=start, end=end, interval=interval, **kwargs)
+    return yf.Ticker(ticker).history(period=period, interval=interval, **kwargs)
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    kwargs.setdefault("progress", False)
+    if start or end:
+      data = yf.download(tickers, start=start, end=end, interval=interval, group_by=group_by, **kwargs)
+    else:
+      data = yf.download(tickers, period=period, interval=interval, group_by=group_by, **kwargs)
+    # yf.download reports per-ticker failures instead of raising; surface
+    # throttling when it left us with nothing.
+    if (data is None or data.empty) and any(is_throttle(e) for e in getattr(yf.shared, "_ERRORS", {}).values()):
+      raise YFRateLimitError() if YFRateLimitError is not None else UpstreamUnavailable("Too Many Requests")
+    return data
+
+  def info(self, ticker):
+    return yf.Ticker(ticker).info
+
+  def financials(self, ticker):
+    return yf.Ticker(ticker).financials
+
+  def balance_sheet(self, ticker):
+    return yf.Ticker(ticker).balance_sheet
+
+  def cashflow(self, ticker):
+    return yf.Ticker(ticker).cashflow
+
+  def quarterly_income_stmt(self, ticker):
+    return yf.Ticker(ticker).quarterly_income_stmt
+
+  def news(self, ticker):
+    return yf.Ticker(ticker).news
+
+
+def is_intraday(interval):
+  return interval[-1] in ("m", "h") and not interval.endswith("mo")
+
+
+def period_start(period, now=None):
+  """Earliest timestamp a yfinance ``period`` string can reach back to."""
+  now = now or pd.Timestamp.now().normalize()
+  if period == "max":
+    return pd.Timestamp("1970-01-01")
+  if period == "ytd":
+    return pd.Timestamp(year=now.year, month=1, day=1)
+
+  count = int("".join(c for c in period if c.isdigit()) or 1)
+  unit = period.lstrip("0123456789")
+  if unit == "d":
+    # Trading days: pad for weekends and holidays.
+    return now - pd.Timedelta(days=math.ceil(count * 7 / 5) + 4)
+  if unit == "wk":
+    return now - pd.Timedelta(weeks=count)
+  if unit == "mo":
+    return now - pd.DateOffset(months=count)
+  if unit == "y":
+    return now - pd.DateOffset(years=count)
+  raise ValueError(f"Unsupported period: {period}")
+
+
+def period_reach(period, now=None):
+  """Timestamp a ``period`` download is sure to reach back to.
+
+  The same as ``period_start`` except for "Nd" periods, which count
+  sessions: those are only sure to reach the Nth business day before
+  tomorrow (the exchange's date can be ahead of ours), holidays only
+  taking them further back.
+  """
+  now = now or pd.Timestamp.now().normalize()
+  unit = period.lstrip("0123456789")
+  if unit != "d":
+    return period_start(period, now)
+  count = int(period[:-1] or 1)
+  return pd.bdate_range(end=now + pd.Timedelta(days=1), periods=count)[0]
+
+
+def history_key(period="1mo", interval="1d", start=None, end=None):
+  if start or end:
+    return f"history_{start or ''}_{end or ''}_{interval}"
+  return f"history_{period}_{interval}"
+
+
+def encode_frame(df):
+  def encode_labels(labels):
+    if isinstance(labels, pd.DatetimeIndex):
+      tz = str(labels.tz) if labels.tz is not None else None
+      return {"type": "datetime", "name": labels.name, "tz": tz, "values": [ts.isoformat() for ts in labels]}
+    return {"type": "plain", "name": labels.name, "values": [str(v) for v in labels]}
+
+  values = df.astype(object).where(df.notna(), None).values.tolist()
+  return {"index": encode_labels(df.index), "columns": encode_labels(df.columns), "data": values}
+
+
+def decode_frame(payload):
+  def decode_labels(labels):
+    name = labels.get("name")
+    if labels["type"] == "datetime":
+      if labels["tz"]:
+        return pd.DatetimeIndex(pd.to_datetime(labels["values"], utc=True).tz_convert(labels["tz"]), name=name)
+      return pd.DatetimeIndex(pd.to_datetime(labels["values"]), name=name)
+    return pd.Index(labels["values"], name=name)
+
+  df = pd.DataFrame(
+    payload["data"],
+    index=decode_labels(payload["index"]),
+    columns=decode_labels(payload["columns"]),
+  )
+  return df.infer_objects()
+
+
+class ReplayProvider(MarketDataProvider):
+  """Serves market data recorded on disk instead of calling Yahoo.
+
+  Fixtures live under ``<root>/<TICKER>/`` with one file per data type:
+  ``info.json``, ``news.json`` and ``<kind>.parquet`` or ``<kind>.json`` for
+  frames (``history_5d_1d``, ``financials``, ...). Bar windows without an
+  exact recording are sliced out of the longest one with the same interval.
+  Missing fixtures behave like an unknown ticker upstream: empty frames, an
+  empty dict or list.
+  """
+
+  name = "replay"
+
+  def __init__(self, root, latency_ms=0):
+    self.root = str(root)
+    self.latency = float(latency_ms) / 1000.0
+
+  def _path(self, ticker, name):
+    return os.path.join(self.root, ticker.upper().replace("/", "_"), name)
+
+  def _simulate_latency(self):
+    if self.latency:
+      time.sleep(self.latency)
+
+  def _read_frame(self, ticker, kind, warn=True):
+    self._simulate_latency()
+    parquet_path = self._path(ticker, f"{kind}.parquet")
+    if os.path.exists(parquet_path):
+      return pd.read_parquet(parquet_path)
+    json_path = self._path(ticker, f"{kind}.json")
+    if os.path.exists(json_path):
+      with open(json_path) as f:
+        return decode_frame(json.load(f))
+    if warn:
+      logger.warning(f"No replay fixture for {ticker}/{kind}")
+    return pd.DataFrame()
+
+  def _read_json(self, ticker, name, default):
+    self._simulate_latency()
+    path = self._path(ticker, f"{name}.json")
+    if not os.path.exists(path):
+      logger.warning(f"No replay fixture for {ticker}/{name}")
+      return default
+    with open(path) as f:
+      return json.load(f)
+
+  def _sliced_history(self, ticker, interval, start=None, end=None, period=None):
+    # No recording for this exact window: cut it out of the longest
+    # recorded window with the same interval.
+    directory = self._path(ticker, "")
+    suffix = f"_{interval}"
+    candidates = []
+    if os.path.isdir(directory):
+      for filename in os.listdir(directory):
+        kind = filename.rsplit(".", 1)[0]
+        if kind.startswith("history_") and kind.endswith(suffix):
+          candidates.append(kind)
+    frames = [self._read_frame(ticker, kind) for kind in candidates]
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+      logger.warning(f"No replay fixture for {ticker} {interval} bars")
+      return pd.DataFrame()
+
+    df = min(frames, key=lambda f: f.index[0].value)
+    if period and not is_intraday(interval) and period.endswith("d") and period[:-1].isdigit():
+      return df.tail(int(period[:-1]))
+    if period:
+      start = period_start(period)
+    index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+    keep = index >= (pd.Timestamp(start) if start else index[0])
+    if end:
+      keep &= index < pd.Timestamp(end)
+    return df[keep]
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    ranged = bool(start or end)
+    df = self._read_frame(ticker, history_key(period, interval, start, end), warn=False)
+    if df.empty:
+      df = self._sliced_history(ticker, interval, start, end, None if ranged else period)
+    return df
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    if isinstance(tickers, str):
+      tickers = tickers.replace(",", " ").split()
+
+    frames = {}
+    for ticker in tickers:
+      hist = self.history(ticker, period=period, interval=interval, start=start, end=end)
+      if hist.empty:
+        continue
+      # yf.download drops the exchange timezone from daily bars and returns
+      # intraday ones in UTC.
+      if hist.index.tz is not None:
+        hist = hist.tz_convert("UTC") if is_intraday(interval) else hist.tz_localize(None)
+      frames[ticker] = hist
+    if not frames:
+      return pd.DataFrame()
+
+    # Mirror yf.download: (Ticker, Price) columns when grouped by ticker,
+    # (Price, Ticker) otherwise.
+    data = pd.concat(frames, axis=1, names=["Ticker", "Price"])
+    if group_by != "ticker":
+      data = data.swaplevel(axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+    return data
+
+  def info(self, ticker):
+    return self._read_json(ticker, "info", {})
+
+  def financials(self, ticker):
+    return self._read_frame(ticker, "financials")
+
+  def balance_sheet(self, ticker):
+    return self._read_frame(ticker, "balance_sheet")
+
+  def cashflow(self, ticker):
+    return self._read_frame(ticker, "cashflow")
+
+  def quarterly_income_stmt(self, ticker):
+    return self._read_frame(ticker, "quarterly_income_stmt")
+
+  def news(self, ticker):
+    return self._read_json(ticker, "news", [])
+
+
+class RecordingProvider(MarketDataProvider):
+  """Passes calls through to another provider and saves every response in
+  the layout ``ReplayProvider`` reads."""
+
+  name = "recording"
+
+  def __init__(self, inner, root):
+    self.inner = inner
+    self.root = str(root)
+
+  def _path(self, ticker, name):
+    directory = os.path.join(self.root, ticker.upper().replace("/", "_"))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+  def _write_frame(self, ticker, kind, df):
+    if df is None or df.empty:
+      return df
+    with open(self._path(ticker, f"{kind}.json"), "w") as f:
+      json.dump(encode_frame(df), f)
+    return df
+
+  def _write_json(self, ticker, name, data):
+    with open(self._path(ticker, f"{name}.json"), "w") as f:
+      json.dump(data, f, default=str)
+    return data
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    df = self.inner.history(ticker, period=period, interval=interval, start=start, end=end, **kwargs)
+    return self._write_frame(ticker, history_key(period, interval, start, end), df)
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    data = self.inner.download(tickers, period=period, interval=interval, start=start, end=end, group_by=group_by, **kwargs)
+    if isinstance(data.columns, pd.MultiIndex) and not data.empty:
+      level = 0 if group_by == "ticker" else 1
+      for ticker in data.columns.get_level_values(level).unique():
+        frame = data.xs(ticker, axis=1, level=level).dropna(how="all")
+        self._write_frame(ticker, history_key(period, interval, start, end), frame)
+    return data
+
+  def info(self, ticker):
+    return self._write_json(ticker, "info", self.inner.info(ticker))
+
+  def financials(self, ticker):
+    return self._write_frame(ticker, "financials", self.inner.financials(ticker))
+
+  def balance_sheet(self, ticker):
+    return self._write_frame(ticker, "balance_sheet", self.inner.balance_sheet(ticker))
+
+  def cashflow(self, ticker):
+    return self._write_frame(ticker, "cashflow", self.inner.cashflow(ticker))
+
+  def quarterly_income_stmt(self, ticker):
+    return self._write_frame(ticker, "quarterly_income_stmt", self.inner.quarterly_income_stmt(ticker))
+
+  def news(self, ticker):
+    return self._write_json(ticker, "news", self.inner.news(ticker) or [])
+
+
+class InstrumentedProvider(MarketDataProvider):
+  """Reports every call to the wrapped provider as an upstream call."""
+
+  def __init__(self, inner):
+    self.inner = inner
+    self.name = inner.name
+
+  def _call(self, kind, fetch):
+    started = time.perf_counter()
+    try:
+      with phase("fetch"), phase("upstream"):
+        return fetch()
+    finally:
+      record_upstream(kind, time.perf_counter() - started)
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    return self._call(
+      "history", lambda: self.inner.history(ticker, period=period, interval=interval, start=start, end=end, **kwargs),
+    )
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    return self._call(
+      "download",
+      lambda: self.inner.download(tickers, period=period, interval=interval, start=start, end=end, group_by=group_by, **kwargs),
+    )
+
+  def info(self, ticker):
+    return self._call("info", lambda: self.inner.info(ticker))
+
+  def financials(self, ticker):
+    return self._call("financials", lambda: self.inner.financials(ticker))
+
+  def balance_sheet(self, ticker):
+    return self._call("balance_sheet", lambda: self.inner.balance_sheet(ticker))
+
+  def cashflow(self, ticker):
+    return self._call("cashflow", lambda: self.inner.cashflow(ticker))
+
+  def quarterly_income_stmt(self, ticker):
+    return self._call("quarterly_income_stmt", lambda: self.inner.quarterly_income_stmt(ticker))
+
+  def news(self, ticker):
+    return self._call("news", lambda: self.inner.news(ticker))
+
+
+class GuardedProvider(MarketDataProvider):
+  """Rate limits upstream calls and stops making them while upstream is down.
+
+  Throttling and outages surface as ``UpstreamUnavailable``, which the
+  cache above answers with last-known-good data when it has some.
+  """
+
+  def __init__(self, inner, limiter, breaker):
+    self.inner = inner
+    self.name = inner.name
+    self.limiter = limiter
+    self.breaker = breaker
+
+  def _call(self, fetch):
+    self.breaker.before_call()
+    try:
+      self.limiter.acquire()
+    except UpstreamUnavailable:
+      self.breaker.cancel()
+      raise
+
+    try:
+      result = fetch()
+    except Exception as e:
+      if is_throttle(e):
+        self.limiter.throttled()
+        self.breaker.failed()
+        raise UpstreamUnavailable(str(e), retry_after=self.limiter.retry_after()) from e
+      if is_client_error(e):
+        self.breaker.succeeded()
+      else:
+        self.breaker.failed()
+      raise
+    self.limiter.succeeded()
+    self.breaker.succeeded()
+    return result
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    return self._call(lambda: self.inner.history(ticker, period=period, interval=interval, start=start, end=end, **kwargs))
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    return self._call(
+      lambda: self.inner.download(tickers, period=period, interval=interval, start=start, end=end, group_by=group_by, **kwargs),
+    )
+
+  def info(self, ticker):
+    return self._call(lambda: self.inner.info(ticker))
+
+  def financials(self, ticker):
+    return self._call(lambda: self.inner.financials(ticker))
+
+  def balance_sheet(self, ticker):
+    return self._call(lambda: self.inner.balance_sheet(ticker))
+
+  def cashflow(self, ticker):
+    return self._call(lambda: self.inner.cashflow(ticker))
+
+  def quarterly_income_stmt(self, ticker):
+    return self._call(lambda: self.inner.quarterly_income_stmt(ticker))
+
+  def news(self, ticker):
+    return self._call(lambda: self.inner.news(ticker))
+
+
+class CachedProvider(MarketDataProvider):
+  """Wraps another provider with a ``TieredCache``.
+
+  TTLs are picked per data type from ``ttls`` (STOCKS_CACHE_TTLS):
+  intraday bars expire after a minute, daily bars after a few minutes, and
+  statements/``info`` after a day.
+  """
+
+  def __init__(self, inner, cache, ttls=None):
+    self.inner = inner
+    self.name = inner.name
+    self.cache = cache
+    self.ttls = dict(ttls or {})
+
+  def _ttl(self, kind):
+    # Kinds without a TTL (STOCKS_CACHE_TTLS) are not kept.
+    return self.ttls.get(kind, 0)
+
+  def _bars_ttl(self, interval):
+    if is_intraday(interval):
+      return self._ttl("intraday")
+    return self._ttl("daily")
+
+  def _cached(self, key, ttl, fetch):
+    with phase("fetch"):
+      return self.cache.get_or_fetch((self.name,) + key, ttl, fetch)
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    key = ("history", ticker.upper(), period, interval, start, end, tuple(sorted(kwargs.items())))
+    return self._cached(
+      key, self._bars_ttl(interval),
+      lambda: self.inner.history(ticker, period=period, interval=interval, start=start, end=end, **kwargs),
+    )
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    symbols = tickers.replace(",", " ").split() if isinstance(tickers, str) else list(tickers)
+    kwargs.pop("progress", None)
+    key = ("download", tuple(symbols), period, interval, start, end, group_by, tuple(sorted(kwargs.items())))
+    return self._cached(
+      key, self._bars_ttl(interval),
+      lambda: self.inner.download(symbols, period=period, interval=interval, start=start, end=end, group_by=group_by, **kwargs),
+    )
+
+  def info(self, ticker):
+    return self._cached(("info", ticker.upper()), self._ttl("info"), lambda: self.inner.info(ticker))
+
+  def financials(self, ticker):
+    return self._cached(("financials", ticker.upper()), self._ttl("financials"), lambda: self.inner.financials(ticker))
+
+  def balance_sheet(self, ticker):
+    return self._cached(("balance_sheet", ticker.upper()), self._ttl("financials"), lambda: self.inner.balance_sheet(ticker))
+
+  def cashflow(self, ticker):
+    return self._cached(("cashflow", ticker.upper()), self._ttl("financials"), lambda: self.inner.cashflow(ticker))
+
+  def quarterly_income_stmt(self, ticker):
+    return self._cached(
+      ("quarterly_income_stmt", ticker.upper()), self._ttl("financials"),
+      lambda: self.inner.quarterly_income_stmt(ticker),
+    )
+
+  def news(self, ticker):
+    return self._cached(("news", ticker.upper()), self._ttl("news"), lambda: self.inner.news(ticker))
+
+
+_provider = None
+_cache = None
+_limiter = None
+_breaker = None
+
+
+def get_cache():
+  global _cache
+  if _cache is None:
+    alias = getattr(settings, "STOCKS_SHARED_CACHE", None)
+    _cache = TieredCache(
+      max_entries=getattr(settings, "STOCKS_CACHE_MAX_ENTRIES", 2048),
+      shared=caches[alias] if alias else None,
+      stale_for=getattr(settings, "STOCKS_CACHE_STALE_SECONDS", 24 * 3600),
+      lease_timeout=getattr(settings, "STOCKS_SHARED_LEASE_SECONDS", 15),
+    )
+  return _cache
+
+
+def get_rate_limiter():
+  global _limiter
+  if _limiter is None:
+    # The budget is for the whole deployment, so each worker gets its share.
+    processes = max(getattr(settings, "STOCKS_WORKER_PROCESSES", 1), 1)
+    _limiter = AdaptiveRateLimiter(
+      rate=getattr(settings, "STOCKS_UPSTREAM_RATE", 5) / processes,
+      burst=max(getattr(settings, "STOCKS_UPSTREAM_BURST", 10) // processes, 1),
+      max_wait=getattr(settings, "STOCKS_UPSTREAM_MAX_WAIT_SECONDS", 2),
+    )
+  return _limiter
+
+
+def get_circuit_breaker():
+  global _breaker
+  if _breaker is None:
+    _breaker = CircuitBreaker(
+      failure_threshold=getattr(settings, "STOCKS_CIRCUIT_FAILURES", 5),
+      reset_timeout=getattr(settings, "STOCKS_CIRCUIT_RESET_SECONDS", 30),
+    )
+  return _breaker
+
+
+def build_provider(name=None):
+  name = name or getattr(settings, "STOCKS_MARKET_DATA_PROVIDER", "yfinance")
+  replay_dir = getattr(settings, "STOCKS_REPLAY_DIR", "fixtures/market_data")
+
+  if name == "yfinance":
+    provider = YFinanceProvider()
+  elif name == "replay":
+    provider = ReplayProvider(replay_dir, getattr(settings, "STOCKS_REPLAY_LATENCY_MS", 0))
+  elif name == "recording":
+    provider = RecordingProvider(YFinanceProvider(), replay_dir)
+  else:
+    raise ValueError(f"Unknown market data provider: {name}")
+
+  provider = InstrumentedProvider(provider)
+  if name != "replay":
+    provider = GuardedProvider(provider, get_rate_limiter(), get_circuit_breaker())
+  if getattr(settings, "STOCKS_CACHE_ENABLED", True):
+    provider = CachedProvider(provider, get_cache(), getattr(settings, "STOCKS_CACHE_TTLS", {}))
+  return provider
+
+
+def _reset_after_fork():
+  # A worker forked from a preloaded master builds its own limiter and
+  # breaker (and the provider holding them), so it starts from its share of
+  # the budget rather than the master's tokens, backoff and locks.
+  global _provider, _limiter, _breaker
+  _provider = _limiter = _breaker = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_provider():
+  global _provider
+  if _provider is None:
+    _provider = build_provider()
+  return _provider
+
+
+def uncached(provider):
+  """``provider`` without its response cache, for data that must be live.
+
+  Rate limiting and the circuit breaker still apply.
+  """
+  return provider.inner if isinstance(provider, CachedProvider) else provider
+
+
+def set_provider(provider):
+  """Replace the process-wide provider, e.g. from a benchmark or shell."""
+  global _provider, _timezones
+  _provider = provider
+  _timezones = {}
+
+
+_timezones = {}
+
+
+def exchange_timezone(ticker):
+  """IANA timezone ``ticker`` trades in, from its ``info``; UTC when unknown.
+
+  Batched downloads return intraday bars in UTC, so this is what tells
+  which exchange day (session) a bar belongs to.
+  """
+  ticker = ticker.upper()
+  tz = _timezones.get(ticker)
+  if tz is None:
+    try:
+      tz = get_provider().info(ticker).get("exchangeTimezoneName") or "UTC"
+    except Exception as e:
+      # Not remembered, so the next call asks again.
+      logger.warning(f"No exchange timezone for {ticker}, using UTC: {str(e)}")
+      return "UTC"
+    _timezones[ticker] = tz
+  return tz
@@ -0,0 +1,52 @@
+import pandas as pd
+
+
+def format_stock_summary(stock_data):
+  try:
+      open_price = stock_data["Open"]
+      close_price = stock_data["Close"]
+
+      change = close_price - open_price
+      percent = (change / open_price) * 100 if open_price else 0
+
+      return {
+        "value": f"{close_price:,.2f}", 
+        "change": f"{change:+.2f}", 
+        "percent": f"{percent:+.2f}%", 
+        "positive": change >= 0
+      }
+  except KeyError:
+    return {"error": "Missing required stock fields"}
+
+
+def latest_quotes(bars, ticker_list):
+  """Latest bar plus its display summary for each ticker in ``bars``."""
+  results = {}
+  for ticker in ticker_list:
+    try:
+      latest = bars[ticker].tail(1).reset_index().to_dict(orient="records")[0]
+      results[ticker] = {
+        "raw": latest,
+        "summary": format_stock_summary(latest)
+      }
+    except Exception:
+      results[ticker] = {"error": "No data found"}
+  return results
+
+
+def latest_bars(bars, ticker_list):
+  """One row per ticker holding its latest bar, for columnar responses."""
+  rows = []
+  for ticker in ticker_list:
+    frame = bars.get(ticker)
+    if frame is None or frame.empty:
+      continue
+    row = frame.tail(1).assign(Ticker=ticker)
+    # Exchanges report in their own timezones; align them before stacking.
+    if getattr(row.index, "tz", None) is not None:
+      row.index = row.index.tz_convert("UTC")
+    rows.append(row)
+  if not rows:
+    return pd.DataFrame(columns=["Ticker"])
+  frame = pd.concat(rows)
+  return frame[["Ticker"] + [c for c in frame.columns if c != "Ticker"]]
@@ -0,0 +1,128 @@
+import numpy as np
+
+# Financial ratios computed for many tickers at once. Each statement line
+# item becomes one column of an (n_tickers,) array taken from the latest
+# reporting period, so screening N tickers is a handful of array
+# operations instead of N scalar passes. Missing line items count as 0 and
+# a ratio is None whenever its denominator is 0, matching the original
+# per-ticker financial_ratios view.
+
+INCOME_ROWS = ["Total Revenue", "Gross Profit", "Operating Income", "Net Income", "EBIT", "Interest Expense"]
+BALANCE_ROWS = [
+  "Total Assets",
+  "Total Stockholder Equity",
+  "Total Debt",
+  "Total Current Assets",
+  "Total Current Liabilities",
+  "Inventory",
+  "Cash",
+  "Goodwill",
+]
+
+
+def _cell(value):
+  # None and unreadable cells count as 0; NaN stays NaN.
+  try:
+    return float(value) if value is not None else 0.0
+  except (TypeError, ValueError):
+    return 0.0
+
+
+def latest_values(frames, rows):
+  """Stack the most recent period of ``rows`` from each statement frame
+  into an ``(n_frames, n_rows)`` float array."""
+  values = np.zeros((len(frames), len(rows)))
+  for i, df in enumerate(frames):
+    latest = df.iloc[:, 0]
+    # A duplicated line item reads as its first occurrence from a
+    # single-period frame and is unusable (0) otherwise, as it was per ticker.
+    latest = latest[~latest.index.duplicated(keep="first" if df.shape[1] == 1 else False)]
+    present = np.isin(rows, latest.index)
+    values[i, present] = [_cell(v) for v in latest.reindex(rows)[present].to_numpy(dtype=object)]
+  return values
+
+
+def compute_ratio_arrays(income, balance):
+  """Vectorized ratios over stacked ``INCOME_ROWS``/``BALANCE_ROWS`` arrays.
+
+  Returns ``{name: (values, valid)}``; ``valid`` is False where the
+  per-ticker code would have produced None.
+  """
+  revenue, gross_profit, operating_income, net_income, ebit, interest_expense = income.T
+  (total_assets, total_equity, total_debt, current_assets,
+   current_liabilities, inventory, cash, intangibles) = balance.T
+
+  has_revenue = revenue != 0
+  has_equity = total_equity != 0
+  has_assets = total_assets != 0
+  has_liabilities = current_liabilities != 0
+  has_debt = total_debt != 0
+
+  with np.errstate(divide="ignore", invalid="ignore"):
+    return {
+      "GrossProfitMargin": (gross_profit / revenue * 100, has_revenue),
+      "OperatingMargin": (operating_income / revenue * 100, has_revenue),
+      "NetProfitMargin": (net_income / revenue * 100, has_revenue),
+      "ReturnOnEquity": (net_income / total_equity * 100, has_equity),
+      "ReturnOnAssets": (net_income / total_assets * 100, has_assets),
+      "CurrentRatio": (current_assets / current_liabilities, has_liabilities),
+      "QuickRatio": ((current_assets - inventory) / current_liabilities, has_liabilities),
+      "CashRatio": (cash / current_liabilities, has_liabilities),
+      "WorkingCapital": (current_assets - current_liabilities, (current_assets != 0) & has_liabilities),
+      "DebtToEquity": (total_debt / total_equity, has_equity),
+      "InterestCoverage": (ebit / np.abs(interest_expense), (ebit != 0) & (interest_expense != 0)),
+      "AssetCoverage": ((total_assets - intangibles - current_liabilities) / total_debt, has_assets & has_debt),
+    }
+
+
+def _percent(value, valid):
+  return f"{value:.2f}%" if valid and value else None
+
+
+def _rounded(value, valid):
+  return round(value, 2) if valid and value else None
+
+
+def format_ratios(arrays, i):
+  """Shape row ``i`` of ``compute_ratio_arrays`` output like the ratios API."""
+  cell = {name: (float(values[i]), bool(valid[i])) for name, (values, valid) in arrays.items()}
+  coverage, coverage_ok = cell["InterestCoverage"]
+  working_capital, working_capital_ok = cell["WorkingCapital"]
+  return {
+    "Profitability": {
+      "GrossProfitMargin": _percent(*cell["GrossProfitMargin"]),
+      "OperatingMargin": _percent(*cell["OperatingMargin"]),
+      "NetProfitMargin": _percent(*cell["NetProfitMargin"]),
+      "ReturnOnEquity": _percent(*cell["ReturnOnEquity"]),
+      "ReturnOnAssets": _percent(*cell["ReturnOnAssets"]),
+    },
+    "Liquidity": {
+      "CurrentRatio": _rounded(*cell["CurrentRatio"]),
+      "QuickRatio": _rounded(*cell["QuickRatio"]),
+      "CashRatio": _rounded(*cell["CashRatio"]),
+      "WorkingCapital": working_capital if working_capital_ok else None,
+    },
+    "Leverage": {
+      "DebtToEquity": _rounded(*cell["DebtToEquity"]),
+      "InterestCoverage": f"{coverage:.2f}x" if coverage_ok and coverage else None,
+      "AssetCoverage": _rounded(*cell["AssetCoverage"]),
+    },
+  }
+
+
+def compute_ratios(statements):
+  """``{ticker: (income, balance)}`` -> ``{ticker: ratios or None}``.
+
+  Tickers with an empty income statement or balance sheet map to None.
+  """
+  usable = [t for t, (income, balance) in statements.items() if not income.empty and not balance.empty]
+  results = {t: None for t in statements}
+  if not usable:
+    return results
+
+  income = latest_values([statements[t][0] for t in usable], INCOME_ROWS)
+  balance = latest_values([statements[t][1] for t in usable], BALANCE_ROWS)
+  arrays = compute_ratio_arrays(income, balance)
+  for i, ticker in enumerate(usable):
+    results[ticker] = format_ratios(arrays, i)
+  return results
@@ -0,0 +1,166 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+  from yfinance import exceptions as yf_exceptions
+except ImportError:  # older yfinance
+  yf_exceptions = None
+
+YFRateLimitError = getattr(yf_exceptions, "YFRateLimitError", None)
+# Upstream answered, but has nothing for what was asked (unknown or
+# delisted ticker, unsupported period).
+CLIENT_ERRORS = tuple(
+  e for e in (getattr(yf_exceptions, name, None) for name in ("YFTickerMissingError", "YFInvalidPeriodError")) if e
+)
+
+
+class UpstreamUnavailable(Exception):
+  """Upstream is throttling us or down; retry after ``retry_after`` seconds."""
+
+  def __init__(self, message, retry_after=1.0):
+    super().__init__(message)
+    self.retry_after = retry_after
+
+
+def http_status(error):
+  """Status code of the HTTP response behind ``error``, if it carries one."""
+  return getattr(getattr(error, "response", None), "status_code", None)
+
+
+def is_throttle(error):
+  if YFRateLimitError is not None and isinstance(error, YFRateLimitError):
+    return True
+  if http_status(error) == 429:
+    return True
+  text = str(error)
+  return "Too Many Requests" in text or "Rate limited" in text
+
+
+def is_client_error(error):
+  # Unknown tickers and the like: upstream answered, so it is healthy.
+  if isinstance(error, CLIENT_ERRORS):
+    return True
+  status = http_status(error)
+  return status is not None and 400 <= status < 500 and status != 429
+
+
+class AdaptiveRateLimiter:
+  """Token bucket for upstream calls that slows down when throttled.
+
+  Calls take a token, waiting for one at most ``max_wait`` seconds before
+  giving up with ``UpstreamUnavailable``, so requests never queue up
+  behind a long wait. Each throttling response halves the refill rate and
+  pauses all calls for an exponentially growing, jittered backoff; every
+  success then raises the rate again by a twentieth of the configured one.
+  """
+
+  def __init__(self, rate=5.0, burst=10, max_wait=2.0, min_rate=0.2, max_backoff=60.0):
+    self.base_rate = float(rate)
+    self.rate = float(rate)
+    self.burst = burst
+    self.max_wait = max_wait
+    self.min_rate = min_rate
+    self.max_backoff = max_backoff
+    self._tokens = float(burst)
+    self._updated = time.monotonic()
+    self._backoff = 0.0
+    self._paused_until = 0.0
+    self._lock = threading.Lock()
+
+  def acquire(self):
+    with self._lock:
+      now = time.monotonic()
+      self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+      self._updated = now
+      pause = max(self._paused_until - now, 0.0)
+      wait = pause + max(1 - self._tokens, 0.0) / self.rate
+      if wait > self.max_wait:
+        raise UpstreamUnavailable("Upstream rate limit reached, try again shortly", retry_after=wait)
+      # Reserve the token now; the wait covers its refill.
+      self._tokens -= 1
+    if wait:
+      time.sleep(wait)
+
+  def throttled(self):
+    with self._lock:
+      self.rate = max(self.rate / 2, self.min_rate)
+      self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+      self._paused_until = time.monotonic() + self._backoff * random.uniform(0.5, 1.0)
+      backoff = self._backoff
+    logger.warning(f"Upstream throttled us, backing off {backoff:.1f}s at {self.rate:.2f} calls/s")
+
+  def succeeded(self):
+    with self._lock:
+      self.rate = min(self.rate + self.base_rate / 20, self.base_rate)
+      self._backoff = 0.0
+
+  def retry_after(self):
+    with self._lock:
+      return max(self._paused_until - time.monotonic(), 1.0)
+
+  def stats(self):
+    with self._lock:
+      return {"rate": round(self.rate, 3), "backoff": self._backoff}
+
+
+class CircuitBreaker:
+  """Stops calling upstream after ``failure_threshold`` failures in a row.
+
+  While open, calls fail immediately with ``UpstreamUnavailable``. After
+  ``reset_timeout`` seconds a single trial call goes through: success
+  closes the circuit, failure keeps it open for another timeout.
+  """
+
+  CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+  def __init__(self, failure_threshold=5, reset_timeout=30.0):
+    self.failure_threshold = failure_threshold
+    self.reset_timeout = reset_timeout
+    self.state = self.CLOSED
+    self._failures = 0
+    self._opened_at = 0.0
+    self._trial = False
+    self._lock = threading.Lock()
+
+  def before_call(self):
+    with self._lock:
+      if self.state == self.OPEN:
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if remaining > 0:
+          raise UpstreamUnavailable("Upstream is unavailable, serving from cache only", retry_after=remaining)
+        self.state = self.HALF_OPEN
+      if self.state == self.HALF_OPEN:
+        if self._trial:
+          raise UpstreamUnavailable("Upstream is recovering, try again shortly", retry_after=1.0)
+        self._trial = True
+
+  def cancel(self):
+    """The call was not made after all (e.g. rate limited)."""
+    with self._lock:
+      self._trial = False
+
+  def succeeded(self):
+    with self._lock:
+      if self.state != self.CLOSED:
+        logger.info("Upstream recovered, closing circuit")
+      self.state = self.CLOSED
+      self._failures = 0
+      self._trial = False
+
+  def failed(self):
+    with self._lock:
+      self._failures += 1
+      self._trial = False
+      if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+        if self.state != self.OPEN:
+          logger.warning(f"Opening upstream circuit after {self._failures} failures")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+
+  def stats(self):
+    with self._lock:
+      return {"state": self.state, "consecutive_failures": self._failures}
@@ -0,0 +1,95 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import F, Q
+
+from .fundamentals import RATIO_FIELDS
+from .models import FundamentalsSnapshot
+
+# Screens the stored fundamentals snapshots; nothing here calls upstream.
+# Filters are query parameters named after the response fields, with an
+# optional Django-style operator suffix:
+#
+#   ?PERatio__lt=20&Sector=Technology&order=-MarketCap&limit=50
+
+FIELDS = {
+  "Ticker": "ticker",
+  "Sector": "sector",
+  "Industry": "industry",
+  "MarketCap": "market_cap",
+  "PERatio": "pe_ratio",
+  "EPS": "eps",
+  "BookValue": "book_value",
+  "DividendYield": "dividend_yield",
+  "Employees": "employees",
+  "RevenueTTM": "revenue_ttm",
+  "NetIncomeTTM": "net_income_ttm",
+  **RATIO_FIELDS,
+}
+TEXT_FIELDS = {"Ticker", "Sector", "Industry"}
+OPERATORS = {"eq", "ne", "lt", "lte", "gt", "gte", "in"}
+RESERVED = {"order", "limit", "offset", "format"}
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+
+def _value(name, raw):
+  if name in TEXT_FIELDS:
+    return raw
+  try:
+    return float(raw)
+  except ValueError:
+    raise ValueError(f"{name} needs a number, got {raw!r}")
+
+
+def screen(params):
+  """Run a screen described by query ``params``; returns ``(total, rows)``."""
+  queryset = FundamentalsSnapshot.objects.all()
+  for key, raw in params.items():
+    if key in RESERVED:
+      continue
+    name, _, op = key.partition("__")
+    op = op or "eq"
+    if name not in FIELDS:
+      raise ValueError(f"Unknown field: {name}")
+    if op not in OPERATORS:
+      raise ValueError(f"Unknown operator: {op}. Use one of {', '.join(sorted(OPERATORS))}")
+
+    field = FIELDS[name]
+    text = name in TEXT_FIELDS
+    if op == "in":
+      values = [_value(name, v.strip()) for v in raw.split(",") if v.strip()]
+      if name == "Ticker":
+        queryset = queryset.filter(ticker__in=[v.upper() for v in values])
+      elif text:
+        # Case-insensitive like ``eq``; an empty list matches nothing.
+        queryset = queryset.filter(reduce(or_, (Q(**{f"{field}__iexact": v}) for v in values), Q(pk__in=[])))
+      else:
+        queryset = queryset.filter(**{f"{field}__in": values})
+    elif op in ("eq", "ne"):
+      lookup = {f"{field}__iexact" if text else field: _value(name, raw)}
+      queryset = queryset.exclude(**lookup) if op == "ne" else queryset.filter(**lookup)
+    else:
+      queryset = queryset.filter(**{f"{field}__{op}": _value(name, raw)})
+
+  order = params.get("order", "-MarketCap")
+  descending = order.startswith("-")
+  name = order.lstrip("-")
+  if name not in FIELDS:
+    raise ValueError(f"Unknown field: {name}")
+  # Rows missing the sort value go last either way.
+  sort = F(FIELDS[name])
+  sort = sort.desc(nulls_last=True) if descending else sort.asc(nulls_last=True)
+
+  try:
+    limit = min(int(params.get("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+    offset = max(int(params.get("offset", 0)), 0)
+  except ValueError:
+    raise ValueError("limit and offset must be integers")
+  if limit < 1:
+    raise ValueError("limit must be at least 1")
+
+  total = queryset.count()
+  rows = queryset.order_by(sort, "ticker").values_list(*FIELDS.values())[offset:offset + limit]
+  return total, [dict(zip(FIELDS, row)) for row in rows]
@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+
+from .instrumentation import phase
+
+logger = logging.getLogger(__name__)
+
+# Full-text search over company profiles and news headlines, kept in its own
+# SQLite file with FTS5 tables. Documents are indexed as the data passes
+# through (fundamentals snapshots, stock-info lookups, news ingestion), and
+# structured fields such as the founding year are extracted once, here,
+# instead of on every request.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+  ticker TEXT PRIMARY KEY,
+  name TEXT, sector TEXT, industry TEXT, website TEXT,
+  founded INTEGER,
+  digest TEXT NOT NULL,
+  indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS companies_fts USING fts5(
+  name, sector, industry, summary, tokenize = 'porter unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS news (
+  item_id TEXT PRIMARY KEY,
+  tickers TEXT NOT NULL,
+  link TEXT, pub_date TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+  title, publisher, tokenize = 'porter unicode61'
+);
+"""
+
+# Column weights for bm25, in FTS column order.
+COMPANY_WEIGHTS = (10.0, 3.0, 3.0, 1.0)
+NEWS_WEIGHTS = (4.0, 1.0)
+MAX_RESULTS = 100
+
+_FOUNDED = re.compile(r"\b(?:founded|incorporated|established)\s+in\s+(\d{4})", re.IGNORECASE)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def extract_founding_year(text):
+  match = _FOUNDED.search(text or "")
+  return int(match.group(1)) if match else None
+
+
+def founding_year(info):
+  founded = info.get("founded")
+  return founded if isinstance(founded, int) else extract_founding_year(info.get("longBusinessSummary"))
+
+
+def match_query(text, any_term=False):
+  """FTS5 query for free text: every word must match, the last as a prefix."""
+  tokens = _TOKEN.findall(text or "")
+  if not tokens:
+    raise ValueError("Empty search query")
+  terms = [f'"{t}"' for t in tokens[:-1]] + [f'"{tokens[-1]}"*']
+  return (" OR " if any_term else " ").join(terms)
+
+
+class SearchIndex:
+  """FTS5 index of company descriptions and news headlines.
+
+  Writes are best effort: a failure is logged and never breaks the request
+  that produced the data.
+  """
+
+  def __init__(self, path):
+    self.path = str(path)
+    with closing(self._connect()) as conn:
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.executescript(SCHEMA)
+
+  def _connect(self):
+    return sqlite3.connect(self.path, timeout=30)
+
+  def index_company(self, ticker, info):
+    """Index ``info`` for ``ticker`` unless it is unchanged since last time."""
+    ticker = ticker.strip().upper()
+    name = info.get("longName") or info.get("shortName") or ticker
+    summary = info.get("longBusinessSummary") or ""
+    fields = (name, info.get("sector") or "", info.get("industry") or "", summary)
+    digest = hashlib.sha1("\x1f".join(fields).encode()).hexdigest()
+    try:
+      with closing(self._connect()) as conn, conn:
+        row = conn.execute("SELECT digest FROM companies WHERE ticker = ?", [ticker]).fetchone()
+        if row is not None and row[0] == digest:
+          return False
+        conn.execute("INSERT OR IGNORE INTO companies (ticker, digest, indexed_at) VALUES (?, '', 0)", [ticker])
+        rowid = conn.execute("SELECT rowid FROM companies WHERE ticker = ?", [ticker]).fetchone()[0]
+        conn.execute(
+          "UPDATE companies SET name = ?, sector = ?, industry = ?, website = ?, founded = ?, digest = ?, "
+          "indexed_at = ? WHERE rowid = ?",
+          [name, fields[1], fields[2], info.get("website"), founding_year(info), digest, time.time(), rowid],
+        )
+        conn.execute(
+          "INSERT OR REPLACE INTO companies_fts (rowid, name, sector, industry, summary) VALUES (?, ?, ?, ?, ?)",
+          [rowid, *fields],
+        )
+      return True
+    except sqlite3.Error as e:
+      logger.warning(f"Indexing {ticker} for search failed: {str(e)}")
+      return False
+
+  def index_news(self, ticker, items):
+    """Index ``NewsItem``s carried by ``ticker``; known stories just gain the ticker."""
+    ticker = ticker.strip().upper()
+    try:
+      with closing(self._connect()) as conn, conn:
+        for item in items:
+          pub_date = item.pub_date.strftime("%Y-%m-%dT%H:%M:%SZ") if item.pub_date else None
+          inserted = conn.execute(
+            "INSERT OR IGNORE INTO news (item_id, tickers, link, pub_date) VALUES (?, ?, ?, ?)",
+            [item.id, f",{ticker},", item.link, pub_date],
+          )
+          if not inserted.rowcount:
+            conn.execute(
+              "UPDATE news SET tickers = tickers || ? WHERE item_id = ? AND instr(tickers, ?) = 0",
+              [f"{ticker},", item.id, f",{ticker},"],
+            )
+            continue
+          rowid = inserted.lastrowid
+          conn.execute(
+            "INSERT INTO news_fts (rowid, title, publisher) VALUES (?, ?, ?)",
+            [rowid, item.title, item.publisher],
+          )
+    except sqlite3.Error as e:
+      logger.warning(f"Indexing news for {ticker} failed: {str(e)}")
+
+  @phase("fetch")
+  def companies(self, query, limit=20, sector=None):
+    sql = (
+      "SELECT c.ticker, c.name, c.sector, c.industry, c.founded, c.website, "
+      f"bm25(companies_fts, {', '.join(map(str, COMPANY_WEIGHTS))}) AS rank, "
+      "snippet(companies_fts, 3, '<b>', '</b>', '...', 16) "
+      "FROM companies_fts JOIN companies c ON c.rowid = companies_fts.rowid "
+      "WHERE companies_fts MATCH ?"
+    )
+    params = [query]
+    if sector:
+      sql += " AND c.sector = ? COLLATE NOCASE"
+      params.append(sector)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    with closing(self._connect()) as conn:
+      rows = conn.execute(sql, params).fetchall()
+    return [
+      {
+        "Ticker": ticker, "Name": name, "Sector": sector, "Industry": industry,
+        "FoundedYear": founded, "Website": website, "Score": round(-rank, 4), "Snippet": snippet,
+      }
+      for ticker, name, sector, industry, founded, website, rank, snippet in rows
+    ]
+
+  @phase("fetch")
+  def news(self, query, limit=20, ticker=None):
+    sql = (
+      "SELECT n.item_id, n.tickers, n.link, n.pub_date, news_fts.title, news_fts.publisher, "
+      f"bm25(news_fts, {', '.join(map(str, NEWS_WEIGHTS))}) AS rank "
+      "FROM news_fts JOIN news n ON n.rowid = news_fts.rowid "
+      "WHERE news_fts MATCH ?"
+    )
+    params = [query]
+    if ticker:
+      sql += " AND instr(n.tickers, ?) > 0"
+      params.append(f",{ticker.upper()},")
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    with closing(self._connect()) as conn:
+      rows = conn.execute(sql, params).fetchall()
+    return [
+      {
+        "id": item_id, "title": title, "publisher": publisher, "link": link, "time": pub_date or "N/A",
+        "tickers": tickers.strip(",").split(","), "score": round(-rank, 4),
+      }
+      for item_id, tickers, link, pub_date, title, publisher, rank in rows
+    ]
+
+
+_index = None
+
+
+def get_search_index():
+  global _index
+  if _index is None:
+    _index = SearchIndex(getattr(settings, "STOCKS_SEARCH_INDEX_PATH", "search.sqlite3"))
+  return _index
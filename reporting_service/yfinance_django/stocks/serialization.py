@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pandas as pd
+from django.http import HttpResponse
+
+from .instrumentation import JsonResponse, phase
+
+try:
+  import orjson
+except ImportError:  # pragma: no cover - plain json fallback
+  orjson = None
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+try:
+  import pyarrow as pa
+except ImportError:
+  pa = None
+
+# Compact encodings for bar responses. By default views keep answering
+# with one JSON object per bar; clients can ask for column arrays instead
+# with ?format=columns, or for binary payloads with ?format=arrow /
+# ?format=msgpack (or the matching Accept header).
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_TYPE = "application/msgpack"
+
+FORMATS = {
+  "columns": "application/json",
+  "arrow": ARROW_TYPE,
+  "msgpack": MSGPACK_TYPE,
+}
+
+
+def requested_format(request):
+  fmt = request.GET.get("format")
+  if fmt:
+    return fmt
+  accept = request.headers.get("Accept", "")
+  if ARROW_TYPE in accept:
+    return "arrow"
+  if MSGPACK_TYPE in accept or "application/x-msgpack" in accept:
+    return "msgpack"
+  return "records"
+
+
+def bar_columns(df):
+  """``{"ts": [...], "open": [...], ...}`` with ``ts`` in epoch milliseconds.
+
+  Missing and non-finite values are ``None``, as in the records payload.
+  """
+  columns = {}
+  if isinstance(df.index, pd.DatetimeIndex):
+    columns["ts"] = (df.index.asi8 // 10**6).tolist()
+  for name in df.columns:
+    values = df[name]
+    if values.dtype.kind == "f":
+      values = values.astype(object).where(np.isfinite(values.to_numpy()), None)
+    columns[str(name).lower().replace(" ", "_")] = values.to_numpy().tolist()
+  return columns
+
+
+def dumps(data):
+  if orjson is not None:
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+  return json.dumps(data).encode()
+
+
+@phase("serialize")
+def bars_response(request, df, records):
+  """Serialize bars in the format the client asked for.
+
+  ``records`` builds the default payload (what the endpoint always
+  returned), so the per-bar dict conversion only happens when needed.
+  """
+  fmt = requested_format(request)
+  if fmt == "records":
+    return JsonResponse(records(), safe=False)
+  if fmt not in FORMATS:
+    return JsonResponse({"error": f"Unsupported format: {fmt}"}, status=400)
+
+  if fmt == "columns":
+    return HttpResponse(dumps(bar_columns(df)), content_type=FORMATS[fmt])
+
+  if fmt == "msgpack":
+    if msgpack is None:
+      return JsonResponse({"error": "MessagePack output requires the msgpack package"}, status=406)
+    return HttpResponse(msgpack.packb(bar_columns(df)), content_type=FORMATS[fmt])
+
+  if pa is None:
+    return JsonResponse({"error": "Arrow output requires the pyarrow package"}, status=406)
+  table = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+  sink = pa.BufferOutputStream()
+  with pa.ipc.new_stream(sink, table.schema) as writer:
+    writer.write_table(table)
+  return HttpResponse(sink.getvalue().to_pybytes(), content_type=FORMATS[fmt])
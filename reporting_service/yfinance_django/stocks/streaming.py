@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .aggregation import get_intraday_aggregator
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+  """Receives quote events on a thread-safe queue (WSGI streams)."""
+
+  def __init__(self, tickers, max_pending=100):
+    self.tickers = set(tickers)
+    self.queue = queue.Queue(maxsize=max_pending)
+
+  def push(self, event):
+    try:
+      self.queue.put_nowait(event)
+    except queue.Full:
+      # A slow client only ever needs the newest bars.
+      try:
+        self.queue.get_nowait()
+      except queue.Empty:
+        pass
+      self.queue.put_nowait(event)
+
+  def get(self, timeout):
+    try:
+      return self.queue.get(timeout=timeout)
+    except queue.Empty:
+      return None
+
+
+class AsyncSubscriber(Subscriber):
+  """Receives quote events on an asyncio queue (ASGI streams)."""
+
+  def __init__(self, tickers, max_pending=100):
+    self.tickers = set(tickers)
+    self.loop = asyncio.get_running_loop()
+    self.queue = asyncio.Queue(maxsize=max_pending)
+
+  def _put(self, event):
+    if self.queue.full():
+      self.queue.get_nowait()
+    self.queue.put_nowait(event)
+
+  def push(self, event):
+    self.loop.call_soon_threadsafe(self._put, event)
+
+  async def get(self, timeout):
+    try:
+      return await asyncio.wait_for(self.queue.get(), timeout)
+    except asyncio.TimeoutError:
+      return None
+
+
+class LiveQuoteHub:
+  """One background poller shared by every streaming client.
+
+  Each poll fetches the latest 1m bar for the union of all subscribed
+  tickers in a single batched download and only pushes bars that changed
+  since the previous poll, so N clients watching a ticker cost one upstream
+  poll rather than N. The poller stops once the last client leaves.
+  """
+
+  def __init__(self, interval=5):
+    self.interval = interval
+    self._lock = threading.Lock()
+    self._subscribers = set()
+    self._latest = {}
+    self._thread = None
+
+  def subscribe(self, subscriber):
+    with self._lock:
+      self._subscribers.add(subscriber)
+      snapshot = [self._latest[t] for t in subscriber.tickers if t in self._latest]
+      if self._thread is None or not self._thread.is_alive():
+        self._thread = threading.Thread(target=self._run, name="stocks-live-poller", daemon=True)
+        self._thread.start()
+    for event in snapshot:
+      subscriber.push(event)
+
+  def unsubscribe(self, subscriber):
+    with self._lock:
+      self._subscribers.discard(subscriber)
+
+  def _watched(self):
+    with self._lock:
+      return sorted(set().union(*(s.tickers for s in self._subscribers))) if self._subscribers else []
+
+  def _run(self):
+    while True:
+      with self._lock:
+        if not self._subscribers:
+          self._thread = None
+          return
+
+      started = time.monotonic()
+      try:
+        tickers = self._watched()
+        if tickers:
+          self.poll(tickers)
+      except Exception as e:
+        logger.error(f"Live quote poll failed: {str(e)}")
+      time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+  def poll(self, tickers):
+    aggregator = get_intraday_aggregator()
+    aggregator.refresh(tickers, force=True)
+    bars = aggregator.latest(tickers)
+    changed = []
+    with self._lock:
+      for ticker, frame in bars.items():
+        if frame is None:
+          continue
+        bar = frame.reset_index().to_dict(orient="records")[0]
+        event = {"ticker": ticker, "bar": bar}
+        if self._latest.get(ticker) != event:
+          self._latest[ticker] = event
+          changed.append(event)
+      subscribers = list(self._subscribers)
+
+    for event in changed:
+      for subscriber in subscribers:
+        if event["ticker"] in subscriber.tickers:
+          subscriber.push(event)
+
+
+def format_event(event):
+  data = json.dumps(event, cls=DjangoJSONEncoder)
+  return f"event: quote\ndata: {data}\n\n"
+
+
+KEEPALIVE = ": keepalive\n\n"
+
+
+def stream_events(hub, tickers, keepalive):
+  subscriber = Subscriber(tickers)
+  hub.subscribe(subscriber)
+  try:
+    yield "retry: 5000\n\n"
+    while True:
+      event = subscriber.get(keepalive)
+      yield format_event(event) if event else KEEPALIVE
+  finally:
+    hub.unsubscribe(subscriber)
+
+
+async def astream_events(hub, tickers, keepalive):
+  subscriber = AsyncSubscriber(tickers)
+  hub.subscribe(subscriber)
+  try:
+    yield "retry: 5000\n\n"
+    while True:
+      event = await subscriber.get(keepalive)
+      yield format_event(event) if event else KEEPALIVE
+  finally:
+    hub.unsubscribe(subscriber)
+
+
+_hub = None
+
+
+def get_live_hub():
+  global _hub
+  if _hub is None:
+    _hub = LiveQuoteHub(interval=getattr(settings, "STOCKS_STREAM_POLL_SECONDS", 5))
+  return _hub
@@ -1,3 +1,1564 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import (
+  aggregation, bar_store, correlation, fanout, fundamentals, indicators, news, providers, search, serialization,
+)
+from .aggregation import IntradayAggregator
+from .batching import QuoteBatcher
+from .cache import TieredCache
+from .fanout import TickerTimeout, fetch_all
+from .management.commands import benchmark
+from .models import FundamentalsSnapshot
+from .movers import MoversSnapshot
+from .news import NewsStore, parse_item
+from .portfolio import analyze, parse_holdings
+from .prefetch import LeaderLease, WatchlistPrefetcher
+from .providers import (
+  CachedProvider, GuardedProvider, InstrumentedProvider, MarketDataProvider, RecordingProvider, ReplayProvider,
+  build_provider, set_provider,
+)
+from .ratios import compute_ratios
+from .resilience import AdaptiveRateLimiter, CircuitBreaker, UpstreamUnavailable, is_client_error, is_throttle
+from .streaming import LiveQuoteHub, Subscriber
+
+
+class StubProvider(MarketDataProvider):
+  """Serves canned frames and counts upstream calls."""
+
+  name = "stub"
+
+  def __init__(self, bars=None, info=None, statements=None, news=None):
+    self.bars = bars or {}
+    self.infos = info or {}
+    self.statements = statements or {}
+    self.stories = news or {}
+    self.calls = []
+
+  def _bars(self, ticker, interval, start=None, period=None):
+    frame = self.bars.get((ticker, interval))
+    if frame is None:
+      return None
+    if start is not None:
+      start = pd.Timestamp(start)
+      frame = frame[frame.index >= (start.tz_localize(frame.index.tz) if frame.index.tz else start)]
+    elif interval == "1d" and period and period.endswith("d"):
+      # Like Yahoo, "Nd" is the last N sessions.
+      frame = frame.tail(int(period[:-1]))
+    return frame
+
+  def history(self, ticker, period="1mo", interval="1d", start=None, end=None, **kwargs):
+    self.calls.append(("history", ticker))
+    frame = self._bars(ticker, interval, start, period)
+    return frame if frame is not None else pd.DataFrame()
+
+  def download(self, tickers, period="1mo", interval="1d", start=None, end=None, group_by="column", **kwargs):
+    self.calls.append(("download", tuple(tickers)))
+    frames = {t: self._bars(t, interval, start, period) for t in tickers}
+    frames = {t: f for t, f in frames.items() if f is not None}
+    return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+  def info(self, ticker):
+    self.calls.append(("info", ticker))
+    return dict(self.infos.get(ticker, {}))
+
+  def _statement(self, kind, ticker):
+    self.calls.append((kind, ticker))
+    return self.statements.get(ticker, {}).get(kind, pd.DataFrame())
+
+  def financials(self, ticker):
+    return self._statement("financials", ticker)
+
+  def balance_sheet(self, ticker):
+    return self._statement("balance_sheet", ticker)
+
+  def quarterly_income_stmt(self, ticker):
+    return self._statement("quarterly_income_stmt", ticker)
+
+  def news(self, ticker):
+    self.calls.append(("news", ticker))
+    return self.stories.get(ticker, [])
+
+
+class StocksTestMixin:
+  """Runs against a stub provider with fresh, throwaway stores."""
+
+  def setUp(self):
+    scratch = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, scratch, ignore_errors=True)
+    overrides = override_settings(
+      STOCKS_BAR_STORE_PATH=f"{scratch}/bars.sqlite3",
+      STOCKS_SEARCH_INDEX_PATH=f"{scratch}/search.sqlite3",
+      STOCKS_SHARED_CACHE=None,
+    )
+    overrides.enable()
+    self.addCleanup(overrides.disable)
+    self.reset()
+    self.addCleanup(self.reset)
+    self.client = Client(HTTP_HOST="localhost")
+
+  def reset(self):
+    aggregation._aggregator = None
+    bar_store._store = None
+    correlation._engine = None
+    search._index = None
+    fundamentals._store = None
+    providers._cache = None
+    set_provider(None)
+
+  def use(self, provider):
+    set_provider(provider)
+    return provider
+
+
+class StocksTestCase(StocksTestMixin, TestCase):
+  pass
+
+
+def daily_bars(closes, end=None):
+  """Daily OHLCV frame ending at ``end`` (today) from an array of closes."""
+  closes = np.asarray(closes, dtype=float)
+  index = pd.bdate_range(end=end or pd.Timestamp.now().normalize(), periods=len(closes), name="Date")
+  return pd.DataFrame({
+    "Open": closes, "High": closes * 1.01, "Low": closes * 0.99, "Close": closes,
+    "Volume": np.full(len(closes), 1000), "Dividends": 0.0, "Stock Splits": 0.0,
+  }, index=index)
+
+
+def minute_bars(tz, opens_at, minutes, days, seed=0):
+  """1m bars (UTC index, like yf.download) for sessions opening at local ``opens_at`` on ``days``."""
+  sessions = [pd.date_range(f"{day.date()} {opens_at}", periods=minutes, freq="min", tz=tz) for day in days]
+  index = sessions[0].append(sessions[1:]).tz_convert("UTC")
+  closes = random_walks(["x"], len(index), seed)["x"]
+  frame = daily_bars(closes)
+  frame.index = index.rename("Datetime")
+  return frame
+
+
+def random_walks(tickers, days, seed=0):
+  rng = np.random.default_rng(seed)
+  return {t: 100 * np.cumprod(1 + rng.normal(0, 0.02, days)) for t in tickers}
+
+
+def statement(rows, years):
+  return pd.DataFrame(rows, index=pd.to_datetime([f"{y}-09-30" for y in years])).T
+
+
+class FundamentalsTests(StocksTestCase):
+  def test_nan_statement_cells_are_stored_as_null(self):
+    # yfinance leaves the oldest annual column NaN for rows it lacks.
+    years = [2024, 2023, 2022, 2021]
+    income = statement({
+      "Total Revenue": [391e9, 383e9, 394e9, np.nan],
+      "Net Income": [94e9, 97e9, 100e9, np.nan],
+      "Gross Profit": [180e9, 170e9, 171e9, np.nan],
+    }, years)
+    balance = statement({
+      "Total Assets": [365e9, 353e9, 353e9, np.nan],
+      "Total Stockholder Equity": [57e9, 62e9, 51e9, np.nan],
+    }, years)
+    quarterly = statement({"Total Revenue": [95e9, 85e9, 91e9, np.nan], "Net Income": [np.nan] * 4}, years)
+    self.use(StubProvider(
+      info={"AAPL": {"sector": "Technology", "sharesOutstanding": 15e9, "beta": float("nan")}},
+      statements={"AAPL": {"financials": income, "balance_sheet": balance, "quarterly_income_stmt": quarterly}},
+    ))
+
+    response = self.client.get("/stocks/history/AAPL/")
+    self.assertEqual(response.status_code, 200)
+    history = response.json()
+    self.assertEqual([row["Year"] for row in history], years)
+    self.assertAlmostEqual(history[0]["EPS"], 94e9 / 15e9)
+    self.assertEqual(history[3], {"Year": 2021, "Revenue": None, "NetIncome": None, "EPS": None, "ROE": None})
+
+    response = self.client.get("/stocks/summary/AAPL/")
+    self.assertEqual(response.status_code, 200)
+    self.assertEqual(response.json()["RevenueTTM"], 271e9)
+    self.assertIsNone(response.json()["NetIncomeTTM"])
+    self.assertIsNone(fundamentals.get_fundamentals_store().snapshot("AAPL").info["beta"])
+
+  def test_unknown_tickers_are_not_stored(self):
+    self.use(StubProvider(info={"NOPE": {"trailingPegRatio": None}}))
+    response = self.client.get("/stocks/summary/NOPE/")
+    self.assertEqual(response.status_code, 200)
+    self.assertIsNone(response.json()["MarketCap"])
+    self.assertEqual(self.client.get("/stocks/ratios/NOPE/").status_code, 404)
+    self.assertFalse(FundamentalsSnapshot.objects.exists())
+    self.assertEqual(search.get_search_index().companies("nope"), [])
+
+  def test_etag_follows_the_content_not_the_checks(self):
+    provider = self.use(StubProvider(info={"AAPL": {"sector": "Technology", "marketCap": 3e12}}))
+    first = self.client.get("/stocks/summary/AAPL/")
+    self.assertNotIn("Last-Modified", first)
+
+    fundamentals.get_fundamentals_store().check_after = timedelta(0)
+    again = self.client.get("/stocks/summary/AAPL/", HTTP_IF_NONE_MATCH=first["ETag"])
+    self.assertEqual(again.status_code, 304)
+    self.assertEqual(provider.calls.count(("info", "AAPL")), 2)
+
+    provider.infos["AAPL"]["marketCap"] = 3.1e12
+    changed = self.client.get("/stocks/summary/AAPL/", HTTP_IF_NONE_MATCH=first["ETag"])
+    self.assertEqual(changed.status_code, 200)
+    self.assertNotEqual(changed["ETag"], first["ETag"])
+    self.assertEqual(changed.json()["MarketCap"], 3.1e12)
+
+  def test_first_ingest_racing_another_worker_keeps_one_row(self):
+    provider = self.use(StubProvider(info={"AAPL": {"sector": "Technology"}}))
+    fetch = provider.info
+
+    def info(ticker):
+      # Another worker stores the ticker while this one is fetching.
+      now = timezone.now()
+      FundamentalsSnapshot.objects.create(ticker=ticker, sector="Old", checked_at=now, statements_at=now)
+      return fetch(ticker)
+
+    provider.info = info
+    snapshot = fundamentals.get_fundamentals_store().snapshot("AAPL")
+    self.assertEqual(snapshot.sector, "Technology")
+    self.assertEqual(list(FundamentalsSnapshot.objects.values_list("ticker", "sector")), [("AAPL", "Technology")])
+
+
+def story(item_id, title):
+  return {"id": item_id, "content": {"title": title, "pubDate": "2025-01-02T14:00:00Z", "publisher": "Wire"}}
+
+
+class NewsPollingTests(StocksTestCase):
+  def test_polls_watchlist_and_recent_requests_only(self):
+    provider = self.use(StubProvider(news={"AAPL": [story("a1", "Apple")], "MSFT": [story("m1", "Microsoft")]}))
+    store = NewsStore(watchlist=["AAPL"], track_for=3600)
+    store.track(["MSFT", "NOPE"])
+    store.ingest("NOPE")
+    self.assertEqual(store.tracked(), ["AAPL", "MSFT"])
+
+    provider.calls.clear()
+    store.poll()
+    self.assertEqual(provider.calls, [("news", "AAPL"), ("news", "MSFT")])
+
+    store.track_for = 0
+    self.assertEqual(store.tracked(), ["AAPL"])
+
+  def test_one_leader_per_shared_cache(self):
+    shared = LocMemCache("stocks-tests-lease", {})
+    first, second = LeaderLease(shared, ttl=60), LeaderLease(shared, ttl=60)
+    self.assertTrue(first.held())
+    self.assertFalse(second.held())
+    self.assertTrue(first.held())
+    shared.delete(LeaderLease.KEY)
+    self.assertTrue(second.held())
+    self.assertFalse(first.held())
+
+
+class CorrelationTests(StocksTestCase):
+  def expected(self, tickers, window="1mo"):
+    size, period = correlation.WINDOWS[window]
+    closes = bar_store.get_bar_store().closes(tickers, period=period)
+    return closes.pct_change(fill_method=None).iloc[1:].tail(size).corr().to_numpy()
+
+  def test_matches_dataframe_corr(self):
+    walks = random_walks(["AAPL", "MSFT", "NVDA"], 60)
+    walks["NVDA"][30:33] = np.nan
+    self.use(StubProvider(bars={(t, "1d"): daily_bars(c) for t, c in walks.items()}))
+    engine = correlation.get_correlation_engine()
+
+    known, matrix = engine.correlations(["AAPL", "MSFT", "NOPE"], "1mo")
+    self.assertEqual(known, ["AAPL", "MSFT"])
+    np.testing.assert_allclose(matrix, self.expected(["AAPL", "MSFT"]))
+    known, matrix = engine.correlations(["NVDA", "AAPL"], "1mo")
+    np.testing.assert_allclose(matrix, self.expected(["NVDA", "AAPL"]))
+    self.assertNotIn("NOPE", engine._recent)
+
+  def test_universe_keeps_most_recent_tickers(self):
+    walks = random_walks(["AAPL", "MSFT", "NVDA"], 60)
+    self.use(StubProvider(bars={(t, "1d"): daily_bars(c) for t, c in walks.items()}))
+    engine = correlation.CorrelationEngine(max_tickers=2)
+    engine.correlations(["AAPL"], "1mo")
+    engine.correlations(["MSFT"], "1mo")
+    engine.correlations(["NVDA"], "1mo")
+    self.assertEqual(list(engine._recent), ["MSFT", "NVDA"])
+    self.assertEqual(set(engine._windows["1mo"][0].tickers), {"MSFT", "NVDA"})
+
+  def test_rebuilds_after_readjustment(self):
+    walks = random_walks(["AAPL", "MSFT"], 60)
+    provider = self.use(StubProvider(bars={(t, "1d"): daily_bars(c) for t, c in walks.items()}))
+    engine = correlation.get_correlation_engine()
+    engine.correlations(["AAPL", "MSFT"], "1mo")
+
+    # A 2:1 split re-adjusts all of AAPL's history, and a new return arrives.
+    adjusted = walks["AAPL"] / 2
+    adjusted[-1] *= 1.05
+    provider.bars[("AAPL", "1d")] = daily_bars(adjusted)
+    bar_store.get_bar_store().refresh_after["daily"] = 0
+    known, matrix = engine.correlations(["AAPL", "MSFT"], "1mo")
+    np.testing.assert_allclose(matrix, self.expected(["AAPL", "MSFT"]))
+    self.assertEqual(bar_store.get_bar_store().revision(["AAPL"]), 1)
+
+
+class BarStoreTests(StocksTestCase):
+  def test_incremental_sync_and_trim(self):
+    full = daily_bars(random_walks(["AAPL"], 80)["AAPL"])
+    provider = self.use(StubProvider(bars={("AAPL", "1d"): full.iloc[:-1]}))
+    store = bar_store.get_bar_store()
+
+    first = store.history("AAPL", period="3mo", interval="1d")
+    self.assertEqual(provider.calls, [("download", ("AAPL",))])
+    pd.testing.assert_series_equal(store.history("AAPL", period="5d")["Close"], first["Close"].tail(5))
+    self.assertEqual(len(provider.calls), 1)
+
+    # A new session arrives: only the tail from the last settled bar is fetched.
+    provider.bars[("AAPL", "1d")] = full
+    store.refresh_after["daily"] = 0
+    provider.calls.clear()
+    with mock.patch.object(provider, "download", wraps=provider.download) as download:
+      bars = store.history("AAPL", period="3mo", interval="1d")
+    self.assertEqual(download.call_count, 1)
+    self.assertEqual(download.call_args.kwargs["start"], first.index[-2].strftime("%Y-%m-%d"))
+    self.assertEqual(len(bars), len(first) + 1)
+    pd.testing.assert_series_equal(bars["Close"], full["Close"].tail(len(bars)), check_names=False, check_freq=False)
+
+  def test_start_just_beyond_five_sessions_is_backfilled(self):
+    full = daily_bars(random_walks(["AAPL"], 40)["AAPL"])
+    provider = self.use(StubProvider(bars={("AAPL", "1d"): full}))
+    store = bar_store.get_bar_store()
+    self.assertEqual(len(store.history("AAPL", period="5d")), 5)
+
+    # Within the padded "5d" start, but two sessions before what 5d fetched.
+    start = full.index[-7]
+    self.assertGreater(start, providers.period_start("5d"))
+    bars = store.history("AAPL", start=start.strftime("%Y-%m-%d"))
+    self.assertEqual(len(provider.calls), 2)
+    pd.testing.assert_series_equal(bars["Close"], full["Close"].tail(7), check_names=False, check_freq=False)
+    self.assertEqual(len(store.history("AAPL", start=full.index[-3].strftime("%Y-%m-%d"))), 3)
+    self.assertEqual(len(provider.calls), 2)
+
+  def test_unknown_tickers_are_remembered(self):
+    provider = self.use(StubProvider())
+    store = bar_store.get_bar_store()
+    for _ in range(3):
+      self.assertTrue(store.history("NOPE", period="1mo").empty)
+    self.assertEqual(provider.calls, [("download", ("NOPE",))])
+
+    later = time.time() + store.refresh_after["empty"] + 1
+    with mock.patch("stocks.bar_store.time.time", return_value=later):
+      store.history("NOPE", period="1mo")
+    self.assertEqual(len(provider.calls), 2)
+
+  def test_slow_ticker_does_not_block_others(self):
+    release = threading.Event()
+
+    class SlowProvider(StubProvider):
+      def download(self, tickers, *args, **kwargs):
+        if "SLOW" in tickers:
+          release.wait(10)
+        return super().download(tickers, *args, **kwargs)
+
+    self.use(SlowProvider(bars={(t, "1d"): daily_bars(c) for t, c in random_walks(["SLOW", "FAST"], 30).items()}))
+    store = bar_store.get_bar_store()
+    slow = threading.Thread(target=store.sync, args=(["SLOW"], "1mo"))
+    slow.start()
+    try:
+      self.assertFalse(store.history("FAST", period="1mo").empty)
+      self.assertTrue(slow.is_alive())
+    finally:
+      release.set()
+      slow.join()
+    self.assertFalse(store.history("SLOW", period="1mo").empty)
+
+  def test_intraday_days_are_exchange_sessions(self):
+    today = pd.Timestamp.now().normalize()
+    days = [today - pd.Timedelta(days=n) for n in (3, 2, 1)]
+    # NZX sessions run across midnight UTC, NSE ones within a UTC day.
+    self.use(StubProvider(
+      bars={
+        ("FPH.NZ", "1m"): minute_bars("Pacific/Auckland", "10:00", 405, days),
+        ("TCS.NS", "1m"): minute_bars("Asia/Kolkata", "09:15", 375, days),
+      },
+      info={"FPH.NZ": {"exchangeTimezoneName": "Pacific/Auckland"}, "TCS.NS": {"exchangeTimezoneName": "Asia/Kolkata"}},
+    ))
+    store = bar_store.get_bar_store()
+    for ticker, tz, minutes in (("FPH.NZ", "Pacific/Auckland", 405), ("TCS.NS", "Asia/Kolkata", 375)):
+      for sessions in (1, 2):
+        bars = store.history(ticker, period=f"{sessions}d", interval="1m")
+        self.assertEqual(len(bars), sessions * minutes)
+        self.assertEqual(bars.index.tz_convert(tz).normalize().nunique(), sessions)
+      self.assertEqual(len(store.history(ticker, period="5d", interval="1m")), 3 * minutes)
+
+
+class ScreenerTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    now = timezone.now()
+    for ticker, sector, industry, cap in (
+      ("AAPL", "Technology", "Consumer Electronics", 3e12),
+      ("MSFT", "Technology", "Software - Infrastructure", 2.5e12),
+      ("JNJ", "Healthcare", "Drug Manufacturers - General", 4e11),
+      ("XOM", "Energy", "Oil & Gas Integrated", 5e11),
+    ):
+      FundamentalsSnapshot.objects.create(
+        ticker=ticker, sector=sector, industry=industry, market_cap=cap, checked_at=now, statements_at=now,
+      )
+
+  def tickers(self, query):
+    response = self.client.get(f"/stocks/screener/?{query}")
+    self.assertEqual(response.status_code, 200, response.content)
+    return [row["Ticker"] for row in response.json()["results"]]
+
+  def test_text_filters_ignore_case(self):
+    self.assertEqual(self.tickers("Sector=technology"), ["AAPL", "MSFT"])
+    self.assertEqual(self.tickers("Sector__in=technology,ENERGY"), ["AAPL", "MSFT", "XOM"])
+    self.assertEqual(self.tickers("Industry__in=software%20-%20infrastructure"), ["MSFT"])
+    self.assertEqual(self.tickers("Ticker__in=jnj,xom"), ["XOM", "JNJ"])
+    self.assertEqual(self.tickers("Sector__ne=TECHNOLOGY"), ["XOM", "JNJ"])
+
+  def test_in_on_numbers_and_empty_lists(self):
+    self.assertEqual(self.tickers("MarketCap__in=4e11,5e11&order=MarketCap"), ["JNJ", "XOM"])
+    self.assertEqual(self.tickers("Sector__in=,"), [])
+
+
+class LimitTests(StocksTestCase):
+  def test_movers_reject_non_positive_limits(self):
+    for limit in ("-1", "0", "x"):
+      response = self.client.get(f"/stocks/top-gainers/AAPL,MSFT/?limit={limit}")
+      self.assertEqual(response.status_code, 400)
+
+  def test_screener_rejects_non_positive_limits(self):
+    for limit in ("-1", "0"):
+      response = self.client.get(f"/stocks/screener/?limit={limit}")
+      self.assertEqual(response.status_code, 400)
+      self.assertEqual(response.json()["error"], "limit must be at least 1")
+    self.assertEqual(self.client.get("/stocks/screener/?limit=5").status_code, 200)
+
+  def test_news_rejects_non_positive_limits(self):
+    self.use(StubProvider())
+    self.assertEqual(self.client.get("/stocks/multiple-news/AAPL/?limit=-1").status_code, 400)
+
+  def test_top_clamps_non_positive_k(self):
+    closes = pd.DataFrame(random_walks(["AAPL", "MSFT", "NVDA"], 10))
+    snapshot = MoversSnapshot(list(closes.columns), closes, closes * 0 + 1000)
+    self.assertEqual(snapshot.top("change", -1), [])
+    self.assertEqual(len(snapshot.top("change", 2)), 2)
+
+
+class ReplayProviderTests(StocksTestCase):
+  def test_download_matches_yfinance_timezones(self):
+    today = pd.Timestamp.now().normalize()
+    minutes = minute_bars("Asia/Kolkata", "09:15", 375, [today - pd.Timedelta(days=1)])
+    minutes.index = minutes.index.tz_convert("Asia/Kolkata")
+    days = daily_bars(random_walks(["x"], 5)["x"])
+    days.index = days.index.tz_localize("Asia/Kolkata")
+    stub = StubProvider(bars={("TCS.NS", "1m"): minutes, ("TCS.NS", "1d"): days})
+
+    root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    recorder = RecordingProvider(stub, root)
+    recorder.history("TCS.NS", period="1d", interval="1m")
+    recorder.history("TCS.NS", period="5d", interval="1d")
+
+    replay = ReplayProvider(root)
+    intraday = replay.download(["TCS.NS"], period="1d", interval="1m", group_by="ticker")["TCS.NS"]
+    self.assertEqual(str(intraday.index.tz), "UTC")
+    self.assertTrue(intraday.index.equals(minutes.index.tz_convert("UTC")))
+    daily = replay.download(["TCS.NS"], period="5d", interval="1d", group_by="ticker")["TCS.NS"]
+    self.assertIsNone(daily.index.tz)
+    self.assertTrue(daily.index.equals(days.index.tz_localize(None)))
+
+
+def resampled(minutes, tz, rule, offset=None):
+  local = minutes.tz_convert(tz) if rule != "1D" else minutes.tz_convert(tz).tz_localize(None)
+  frame = local[["Open", "High", "Low", "Close", "Volume"]].resample(rule, offset=offset).agg(
+    {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"},
+  )
+  frame = frame[frame["Open"].notna()]
+  return frame.tz_localize(tz) if rule == "1D" else frame
+
+
+class AggregationTests(StocksTestCase):
+  def assertResampled(self, aggregator, ticker, minutes, tz, offset):
+    for resolution, rule in (("5m", "5min"), ("15m", "15min"), ("1h", "1h"), ("1d", "1D")):
+      bars = aggregator.bars(ticker, resolution)
+      expected = resampled(minutes, tz, rule, offset if resolution == "1h" else None)
+      pd.testing.assert_frame_equal(bars, expected, check_names=False, check_dtype=False, check_freq=False)
+
+  def test_matches_resample_in_exchange_time(self):
+    today = pd.Timestamp.now().normalize()
+    days = [today - pd.Timedelta(days=n) for n in (2, 1)]
+    # NZX sessions straddle midnight UTC; NSE opens at a quarter past.
+    cases = [("FPH.NZ", "Pacific/Auckland", "10:00", 405, None), ("TCS.NS", "Asia/Kolkata", "09:15", 375, "15min")]
+    self.use(StubProvider(info={t: {"exchangeTimezoneName": tz} for t, tz, *_ in cases}))
+    aggregator = IntradayAggregator(refresh_after=3600)
+
+    for ticker, tz, opens_at, length, offset in cases:
+      minutes = minute_bars(tz, opens_at, length, days)
+      minutes = minutes.drop(minutes.index[[7, 8, 100]])
+      aggregator._refreshed[ticker] = float("inf")
+      # Fed in pieces, with the newest bar revised in between.
+      aggregator.ingest(ticker, minutes.iloc[:50])
+      revised = minutes.iloc[:50].copy()
+      revised.iloc[-1, revised.columns.get_loc("Low")] -= 1
+      aggregator.ingest(ticker, revised)
+      minutes.iloc[49] = revised.iloc[-1]
+      aggregator.ingest(ticker, minutes)
+
+      self.assertResampled(aggregator, ticker, minutes, tz, offset)
+      self.assertEqual(str(aggregator.bars(ticker, "1d").index.tz), tz)
+
+
+def wilder_rsi(close, n):
+  """Textbook RSI: Wilder averages seeded with the mean of the first n moves."""
+  deltas = np.diff(close)
+  gain, loss = np.maximum(deltas[:n], 0).mean(), np.maximum(-deltas[:n], 0).mean()
+  out = np.full(len(close), np.nan)
+  for i in range(n, len(close)):
+    if i > n:
+      gain = (gain * (n - 1) + max(deltas[i - 1], 0)) / n
+      loss = (loss * (n - 1) + max(-deltas[i - 1], 0)) / n
+    out[i] = 100 - 100 / (1 + gain / loss)
+  return out
+
+
+class IndicatorTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    indicators._engine = None
+    self.addCleanup(setattr, indicators, "_engine", None)
+
+  def test_full_mode_matches_pandas(self):
+    bars = daily_bars(random_walks(["AAPL"], 120)["AAPL"])
+    close = bars["Close"]
+    specs = indicators.parse_set("sma20,ema10,rsi14,macd,bb20")
+    frame = indicators.compute_indicators(bars, specs)
+
+    def masked(series, first):
+      series = series.copy()
+      series.iloc[:first] = np.nan
+      return series.to_numpy()
+
+    ema = lambda values, n: values.ewm(span=n, adjust=False).mean()
+    line = ema(close, 12) - ema(close, 26)
+    signal = ema(line, 9)
+    mid, std = close.rolling(20).mean(), close.rolling(20).std(ddof=0)
+    expected = {
+      "sma20": close.rolling(20).mean().to_numpy(),
+      "ema10": masked(ema(close, 10), 9),
+      "rsi14": wilder_rsi(close.to_numpy(), 14),
+      "macd": masked(line, 25),
+      "macd_signal": masked(signal, 33),
+      "macd_hist": masked(line - signal, 33),
+      "bb20_mid": mid.to_numpy(),
+      "bb20_upper": (mid + 2 * std).to_numpy(),
+      "bb20_lower": (mid - 2 * std).to_numpy(),
+    }
+    for column, values in expected.items():
+      with self.subTest(column):
+        np.testing.assert_allclose(frame[column].to_numpy(), values)
+
+  def test_vwap_sessions_are_exchange_days(self):
+    today = pd.Timestamp.now().normalize()
+    days = [today - pd.Timedelta(days=n) for n in (3, 2, 1)]
+    # 10:00-16:45 Auckland time runs across midnight UTC.
+    bars = minute_bars("Pacific/Auckland", "10:00", 405, days)
+    frame = indicators.compute_indicators(bars, [("vwap", None)], "1m", "Pacific/Auckland")
+
+    local = bars.assign(pv=(bars["High"] + bars["Low"] + bars["Close"]) / 3 * bars["Volume"])
+    sessions = bars.index.tz_convert("Pacific/Auckland").date
+    sums = local.groupby(sessions)[["pv", "Volume"]].cumsum()
+    np.testing.assert_allclose(frame["vwap"].to_numpy(), (sums["pv"] / sums["Volume"]).to_numpy())
+
+    state = indicators.IncrementalIndicators([("vwap", None)], "1m", "Pacific/Auckland")
+    self.assertAlmostEqual(state.feed(bars)["vwap"], frame["vwap"].iloc[-1])
+
+  def latest(self, ticker, query):
+    response = self.client.get(f"/stocks/indicators/{ticker}/?mode=latest&{query}")
+    self.assertEqual(response.status_code, 200)
+    return response.json()["values"]
+
+  def full(self, ticker, query):
+    response = self.client.get(f"/stocks/indicators/{ticker}/?{query}")
+    self.assertEqual(response.status_code, 200)
+    return response.json()[-1]
+
+  def assertSameValues(self, latest, full):
+    self.assertEqual(set(latest), set(full) - {"Datetime", "Date"})
+    for name, value in latest.items():
+      if full[name] is None:
+        self.assertIsNone(value, name)
+      else:
+        self.assertAlmostEqual(value, full[name], places=8, msg=name)
+
+  def test_latest_mode_matches_full_computation(self):
+    today = pd.Timestamp.now().normalize()
+    days = [today - pd.Timedelta(days=n) for n in (3, 2, 1)]
+    minutes = minute_bars("Pacific/Auckland", "10:00", 405, days)
+    provider = self.use(StubProvider(
+      bars={("FPH.NZ", "1m"): minutes.iloc[:-30]},
+      info={"FPH.NZ": {"exchangeTimezoneName": "Pacific/Auckland"}},
+    ))
+    query = "period=5d&interval=1m&set=rsi14,macd,bb20,sma50,ema20,vwap"
+    self.assertSameValues(self.latest("FPH.NZ", query), self.full("FPH.NZ", query))
+
+    store = bar_store.get_bar_store()
+    store.refresh_after["intraday"] = 0
+    # The forming bar is revised, then further bars arrive, the last one forming too.
+    forming = minutes.iloc[:-30].copy()
+    forming.iloc[-1, forming.columns.get_loc("Close")] *= 1.01
+    provider.bars[("FPH.NZ", "1m")] = forming
+    self.assertSameValues(self.latest("FPH.NZ", query), self.full("FPH.NZ", query))
+    for end in (-20, -19, None):
+      provider.bars[("FPH.NZ", "1m")] = minutes.iloc[:end]
+      self.assertSameValues(self.latest("FPH.NZ", query), self.full("FPH.NZ", query))
+
+  def test_slow_ticker_does_not_block_latest_for_others(self):
+    started, release = threading.Event(), threading.Event()
+
+    class SlowProvider(StubProvider):
+      def download(self, tickers, *args, **kwargs):
+        if "SLOW" in tickers:
+          started.set()
+          release.wait(10)
+        return super().download(tickers, *args, **kwargs)
+
+    self.use(SlowProvider(bars={(t, "1d"): daily_bars(c) for t, c in random_walks(["SLOW", "FAST"], 60).items()}))
+    engine = indicators.get_indicator_engine()
+    slow = threading.Thread(target=engine.latest, args=("SLOW", [("rsi", 14)], "3mo", "1d"))
+    slow.start()
+    started.wait(10)
+    try:
+      ts, values = engine.latest("FAST", [("rsi", 14)], "3mo", "1d")
+      self.assertIsNotNone(values["rsi14"])
+      self.assertTrue(slow.is_alive())
+    finally:
+      release.set()
+      slow.join()
+
+
+class PortfolioTests(StocksTestCase):
+  def test_statistics_on_a_hand_computed_series(self):
+    # A moves +10%, -10%, +10%; B is flat; the benchmark moves half as much as A.
+    self.use(StubProvider(bars={
+      ("A", "1d"): daily_bars([100, 110, 99, 108.9]),
+      ("B", "1d"): daily_bars([100, 100, 100, 100]),
+      ("SPY", "1d"): daily_bars([100, 105, 99.75, 104.7375]),
+    }))
+    tickers, weights = parse_holdings("A:1,B:1")
+    result = analyze(tickers, weights, benchmark="SPY", confidence=0.95)
+
+    # The portfolio returns +5%, -5%, +5%: exactly the benchmark.
+    self.assertAlmostEqual(result["total_return"], 1.05 * 0.95 * 1.05 - 1)
+    self.assertAlmostEqual(result["max_drawdown"], -0.05)
+    self.assertEqual(result["peak"], result["start"])
+    self.assertAlmostEqual(result["benchmark"]["beta"], 1.0)
+    self.assertAlmostEqual(result["benchmark"]["correlation"], 1.0)
+    self.assertEqual([round(row["beta"], 9) for row in result["weights"]], [2.0, 0.0])
+    self.assertEqual([row["risk_contribution"] for row in result["weights"]], [1.0, 0.0])
+
+    var = result["var"]
+    # 5% quantile of (-0.05, 0.05, 0.05) by linear interpolation: -0.05 + 0.1 * 0.1.
+    self.assertAlmostEqual(var["historical_var"], 0.04)
+    self.assertAlmostEqual(var["historical_es"], 0.05)
+    mean, sigma = 0.05 / 3, math.sqrt(0.02 / 3 / 2)
+    self.assertAlmostEqual(var["parametric_var"], -(mean - 1.6448536269514722 * sigma))
+
+  def test_short_weights_are_rejected(self):
+    with self.assertRaisesMessage(ValueError, "Weights must not be negative"):
+      parse_holdings("AAPL:1,MSFT:-0.5")
+    response = self.client.get("/stocks/portfolio/?holdings=AAPL:1,MSFT:-0.5")
+    self.assertEqual(response.status_code, 400)
+
+
+def scalar_ratios(income, balance):
+  """The per-ticker financial_ratios view the vectorized engine replaced."""
+  if income.empty or balance.empty:
+    return None
+
+  def safe_get(df, key, default=0):
+    try:
+      val = df.loc[key].iloc[0]
+      return float(val) if val is not None else default
+    except Exception:
+      return default
+
+  revenue = safe_get(income, "Total Revenue")
+  gross_profit = safe_get(income, "Gross Profit")
+  operating_income = safe_get(income, "Operating Income")
+  net_income = safe_get(income, "Net Income")
+  ebit = safe_get(income, "EBIT")
+  interest_expense = safe_get(income, "Interest Expense")
+
+  total_assets = safe_get(balance, "Total Assets")
+  total_equity = safe_get(balance, "Total Stockholder Equity")
+  total_debt = safe_get(balance, "Total Debt")
+  current_assets = safe_get(balance, "Total Current Assets")
+  current_liabilities = safe_get(balance, "Total Current Liabilities")
+  inventory = safe_get(balance, "Inventory")
+  cash = safe_get(balance, "Cash")
+  intangibles = safe_get(balance, "Goodwill")
+
+  gross_margin = (gross_profit / revenue * 100) if revenue else None
+  operating_margin = (operating_income / revenue * 100) if revenue else None
+  net_margin = (net_income / revenue * 100) if revenue else None
+  roe = (net_income / total_equity * 100) if total_equity else None
+  roa = (net_income / total_assets * 100) if total_assets else None
+
+  current_ratio = (current_assets / current_liabilities) if current_liabilities else None
+  quick_ratio = ((current_assets - inventory) / current_liabilities) if current_liabilities else None
+  cash_ratio = (cash / current_liabilities) if current_liabilities else None
+  working_capital = (current_assets - current_liabilities) if current_assets and current_liabilities else None
+
+  debt_to_equity = (total_debt / total_equity) if total_equity else None
+  interest_coverage = (ebit / abs(interest_expense)) if ebit and interest_expense else None
+  asset_coverage = ((total_assets - intangibles - current_liabilities) / total_debt) if total_assets and total_debt else None
+
+  return {
+    "Profitability": {
+      "GrossProfitMargin": f"{gross_margin:.2f}%" if gross_margin else None,
+      "OperatingMargin": f"{operating_margin:.2f}%" if operating_margin else None,
+      "NetProfitMargin": f"{net_margin:.2f}%" if net_margin else None,
+      "ReturnOnEquity": f"{roe:.2f}%" if roe else None,
+      "ReturnOnAssets": f"{roa:.2f}%" if roa else None,
+    },
+    "Liquidity": {
+      "CurrentRatio": round(current_ratio, 2) if current_ratio else None,
+      "QuickRatio": round(quick_ratio, 2) if quick_ratio else None,
+      "CashRatio": round(cash_ratio, 2) if cash_ratio else None,
+      "WorkingCapital": working_capital,
+    },
+    "Leverage": {
+      "DebtToEquity": round(debt_to_equity, 2) if debt_to_equity else None,
+      "InterestCoverage": f"{interest_coverage:.2f}x" if interest_coverage else None,
+      "AssetCoverage": round(asset_coverage, 2) if asset_coverage else None,
+    },
+  }
+
+
+INCOME = {
+  "Total Revenue": [400.0, 380.0], "Gross Profit": [180.0, 170.0], "Operating Income": [120.0, 110.0],
+  "Net Income": [95.0, 90.0], "EBIT": [125.0, 115.0], "Interest Expense": [-4.0, -3.0],
+}
+BALANCE = {
+  "Total Assets": [360.0, 350.0], "Total Stockholder Equity": [60.0, 62.0], "Total Debt": [100.0, 110.0],
+  "Total Current Assets": [150.0, 140.0], "Total Current Liabilities": [170.0, 150.0], "Inventory": [7.0, 6.0],
+  "Cash": [30.0, 29.0], "Goodwill": [0.0, 0.0],
+}
+
+
+def frame(rows, duplicate=None, columns=2, dtype=float):
+  df = pd.DataFrame(rows, index=pd.to_datetime(["2024-09-30", "2023-09-30"])).T.iloc[:, :columns]
+  if duplicate:
+    df = pd.concat([df, df.loc[[duplicate]] * 2])
+  return df.astype(dtype)
+
+
+class RatioEquivalenceTests(TestCase):
+  def test_matches_scalar_implementation(self):
+    with_none = frame(INCOME, dtype=object)
+    with_none.iloc[0, 0] = None
+    with_none.loc["EBIT"] = [None, 1.0]
+    cases = {
+      "plain": (frame(INCOME), frame(BALANCE)),
+      "nan": (frame({**INCOME, "Total Revenue": [np.nan, 1.0], "EBIT": [np.nan, 1.0]}),
+              frame({**BALANCE, "Total Debt": [np.nan, 1.0]})),
+      "zero": (frame({**INCOME, "Total Revenue": [0.0, 1.0], "Interest Expense": [0.0, 1.0]}),
+               frame({**BALANCE, "Total Stockholder Equity": [0.0, 1.0], "Total Current Liabilities": [0.0, 1.0],
+                      "Total Debt": [0.0, 1.0]})),
+      "duplicates": (frame(INCOME, duplicate="Net Income"), frame(BALANCE, duplicate="Total Assets")),
+      "duplicates-one-period": (frame(INCOME, duplicate="Net Income", columns=1),
+                                frame(BALANCE, duplicate="Total Debt", columns=1)),
+      "none": (with_none, frame(BALANCE, dtype=object)),
+      "missing": (frame({k: v for k, v in INCOME.items() if k != "Gross Profit"}),
+                  frame({k: v for k, v in BALANCE.items() if k != "Cash"})),
+      "empty": (pd.DataFrame(), frame(BALANCE)),
+    }
+    with warnings.catch_warnings():
+      # float() of a one-element Series, in the duplicated single-period case.
+      warnings.simplefilter("ignore", FutureWarning)
+      expected = {name: scalar_ratios(*statements) for name, statements in cases.items()}
+    actual = compute_ratios(cases)
+    for name in cases:
+      with self.subTest(name):
+        self.assertEqual(json.dumps(actual[name]), json.dumps(expected[name]))
+
+
+class CachedProviderTests(StocksTestCase):
+  def test_ttls_come_from_settings(self):
+    with override_settings(STOCKS_CACHE_ENABLED=True, STOCKS_CACHE_TTLS={"info": 7, "news": 0}):
+      provider = build_provider("replay")
+    self.assertEqual(provider._ttl("info"), 7)
+    self.assertEqual(provider._ttl("news"), 0)
+    self.assertEqual(provider._ttl("daily"), 0)
+
+  def test_hourly_bars_use_the_intraday_ttl(self):
+    provider = CachedProvider(StubProvider(), TieredCache(), {"intraday": 60, "daily": 900})
+    for interval in ("1m", "90m", "1h"):
+      self.assertEqual(provider._bars_ttl(interval), 60, interval)
+    for interval in ("1d", "1wk", "1mo"):
+      self.assertEqual(provider._bars_ttl(interval), 900, interval)
+
+
+class QuoteBatcherTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    today = pd.Timestamp.now().normalize()
+    self.minutes = {
+      t: minute_bars("America/New_York", "09:30", 390, [today - pd.Timedelta(days=1)], seed=i)
+      for i, t in enumerate(["AAPL", "MSFT", "NVDA"])
+    }
+    self.provider = StubProvider(bars={(t, "1m"): frame for t, frame in self.minutes.items()})
+
+  def test_concurrent_lookups_share_one_download(self):
+    self.use(self.provider)
+    batcher = QuoteBatcher(window=0.5)
+    results = {}
+    lookups = [["AAPL"], ["MSFT", "AAPL"], ["NVDA", "NOPE"]]
+    threads = [threading.Thread(target=lambda t=t: results.update(batcher.bars(t))) for t in lookups]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(len(self.provider.calls), 1)
+    self.assertEqual(sorted(self.provider.calls[0][1]), ["AAPL", "MSFT", "NOPE", "NVDA"])
+    self.assertEqual(batcher.stats(), {"requests": 3, "batches": 1})
+    self.assertIsNone(results["NOPE"])
+    for ticker in ("AAPL", "MSFT", "NVDA"):
+      pd.testing.assert_frame_equal(results[ticker], self.minutes[ticker], check_names=False, check_freq=False)
+
+  def test_full_batch_does_not_wait_for_the_window(self):
+    self.use(self.provider)
+    started = time.monotonic()
+    QuoteBatcher(window=10, max_size=2).bars(["AAPL", "MSFT"])
+    self.assertLess(time.monotonic() - started, 5)
+
+  def test_failure_reaches_every_waiting_request(self):
+    def unavailable(*args, **kwargs):
+      raise UpstreamUnavailable("Too Many Requests")
+
+    self.provider.download = unavailable
+    self.use(self.provider)
+    batcher = QuoteBatcher(window=0.2)
+    errors = []
+
+    def lookup(tickers):
+      try:
+        batcher.bars(tickers)
+      except UpstreamUnavailable as e:
+        errors.append(e)
+
+    threads = [threading.Thread(target=lookup, args=([t],)) for t in ("AAPL", "MSFT")]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(len(errors), 2)
+    self.assertEqual(batcher.stats()["batches"], 1)
+
+  def test_skips_the_response_cache(self):
+    self.use(CachedProvider(self.provider, TieredCache(), {"intraday": 60}))
+    batcher = QuoteBatcher(window=0)
+    batcher.bars(["AAPL"])
+    batcher.bars(["AAPL"])
+    self.assertEqual(len(self.provider.calls), 2)
+
+
+class FakeAggregator:
+  """Hands the hub a fixed latest bar per ticker."""
+
+  def __init__(self, closes):
+    self.closes = closes
+    self.refreshed = []
+
+  def refresh(self, tickers, force=False):
+    self.refreshed.append(list(tickers))
+
+  def latest(self, tickers):
+    index = pd.DatetimeIndex([pd.Timestamp("2025-01-02 15:59", tz="UTC")], name="Datetime")
+    return {
+      t: pd.DataFrame({"Close": [self.closes[t]]}, index=index) if t in self.closes else None
+      for t in tickers
+    }
+
+
+def drain(subscriber):
+  events = []
+  while (event := subscriber.get(0)) is not None:
+    events.append((event["ticker"], event["bar"]["Close"]))
+  return events
+
+
+class LiveQuoteHubTests(TestCase):
+  def setUp(self):
+    self.aggregator = FakeAggregator({"AAPL": 100.0, "MSFT": 200.0})
+    patcher = mock.patch("stocks.streaming.get_intraday_aggregator", return_value=self.aggregator)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_pushes_changes_to_subscribers_of_the_ticker_only(self):
+    hub = LiveQuoteHub(interval=3600)
+    apple, both = Subscriber(["AAPL"]), Subscriber(["AAPL", "MSFT"])
+    hub._subscribers.update([apple, both])
+
+    hub.poll(["AAPL", "MSFT", "NOPE"])
+    self.assertEqual(drain(apple), [("AAPL", 100.0)])
+    self.assertEqual(sorted(drain(both)), [("AAPL", 100.0), ("MSFT", 200.0)])
+
+    hub.poll(["AAPL", "MSFT"])
+    self.assertEqual(drain(apple), [])
+    self.assertEqual(drain(both), [])
+
+    self.aggregator.closes["MSFT"] = 201.0
+    hub.poll(["AAPL", "MSFT"])
+    self.assertEqual(drain(apple), [])
+    self.assertEqual(drain(both), [("MSFT", 201.0)])
+
+    # A late subscriber starts from the last known bars.
+    late = Subscriber(["MSFT"])
+    hub._thread = threading.current_thread()  # Looks alive, so no poller is started.
+    hub.subscribe(late)
+    self.assertEqual(drain(late), [("MSFT", 201.0)])
+
+  def test_poller_stops_after_last_unsubscribe(self):
+    hub = LiveQuoteHub(interval=0.01)
+    first, second = Subscriber(["AAPL"]), Subscriber(["MSFT"])
+    hub.subscribe(first)
+    hub.subscribe(second)
+    poller = hub._thread
+    self.assertEqual(first.get(5)["ticker"], "AAPL")
+
+    hub.unsubscribe(first)
+    time.sleep(0.05)
+    self.assertTrue(poller.is_alive())
+    self.assertEqual(self.aggregator.refreshed[-1], ["MSFT"])
+
+    hub.unsubscribe(second)
+    poller.join(5)
+    self.assertFalse(poller.is_alive())
+    self.assertIsNone(hub._thread)
+
+
+class StopLoop(Exception):
+  pass
+
+
+class WatchlistPrefetcherTests(TestCase):
+  def setUp(self):
+    self.aggregator = FakeAggregator({"AAPL": 100.0, "MSFT": 200.0, "NVDA": 300.0})
+    # The loop is driven by the tests rather than a background thread.
+    for patcher in (
+      mock.patch("stocks.prefetch.get_intraday_aggregator", return_value=self.aggregator),
+      mock.patch.object(WatchlistPrefetcher, "start"),
+    ):
+      patcher.start()
+      self.addCleanup(patcher.stop)
+    self.watchlists = {"tech": ["aapl", "msft"], "chips": ["NVDA"]}
+
+  def run_loop(self, prefetcher, rounds):
+    sleeps = mock.patch("stocks.prefetch.time.sleep", side_effect=[None] * (rounds - 1) + [StopLoop()])
+    with sleeps, self.assertRaises(StopLoop):
+      prefetcher._run()
+
+  def test_loop_refreshes_every_watchlist_each_round(self):
+    prefetcher = WatchlistPrefetcher(self.watchlists, interval=30)
+    self.run_loop(prefetcher, 2)
+    self.assertEqual(self.aggregator.refreshed, [["AAPL", "MSFT"], ["NVDA"]] * 2)
+    self.assertEqual(prefetcher.snapshot("tech")["MSFT"]["raw"]["Close"], 200.0)
+    self.assertEqual(len(self.aggregator.refreshed), 4)
+
+  def test_stale_snapshot_is_refreshed_on_read(self):
+    prefetcher = WatchlistPrefetcher(self.watchlists, interval=30, max_age=90)
+    prefetcher._snapshots["tech"] = (time.monotonic() - 60, {"AAPL": "older than interval"})
+    self.assertEqual(prefetcher.snapshot("tech"), {"AAPL": "older than interval"})
+    self.assertEqual(self.aggregator.refreshed, [])
+
+    prefetcher._snapshots["tech"] = (time.monotonic() - 120, {"AAPL": "older than max_age"})
+    self.assertEqual(prefetcher.snapshot("tech")["AAPL"]["raw"]["Close"], 100.0)
+    self.assertEqual(self.aggregator.refreshed, [["AAPL", "MSFT"]])
+    with self.assertRaises(KeyError):
+      prefetcher.snapshot("nope")
+
+  def test_only_the_leader_polls_and_others_serve_what_it_published(self):
+    shared = LocMemCache("stocks-tests-prefetch", {})
+    leader = WatchlistPrefetcher(self.watchlists, interval=30, shared=shared)
+    follower = WatchlistPrefetcher(self.watchlists, interval=30, shared=shared)
+    self.assertTrue(leader.is_leader())
+
+    self.run_loop(follower, 1)
+    self.assertEqual(self.aggregator.refreshed, [])
+    self.run_loop(leader, 1)
+    self.assertEqual(len(self.aggregator.refreshed), 2)
+
+    self.aggregator.closes["NVDA"] = 301.0
+    self.assertEqual(follower.snapshot("chips")["NVDA"]["raw"]["Close"], 300.0)
+    self.assertEqual(len(self.aggregator.refreshed), 2)
+
+
+class FanoutTests(TestCase):
+  def test_slow_and_failing_tickers_do_not_sink_the_others(self):
+    release = threading.Event()
+    self.addCleanup(release.set)
+
+    def fetch(ticker):
+      if ticker == "SLOW":
+        release.wait(10)
+      if ticker == "BAD":
+        raise LookupError("no such ticker")
+      return ticker.lower()
+
+    started = time.monotonic()
+    results = asyncio.run(fetch_all(["AAPL", "SLOW", "BAD", "MSFT"], fetch, timeout=0.2))
+    self.assertLess(time.monotonic() - started, 5)
+    self.assertEqual(list(results), ["AAPL", "SLOW", "BAD", "MSFT"])
+    self.assertEqual((results["AAPL"], results["MSFT"]), ("aapl", "msft"))
+    self.assertIsInstance(results["SLOW"], TickerTimeout)
+    self.assertIsInstance(results["BAD"], LookupError)
+
+  def test_limits_calls_in_flight(self):
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def fetch(ticker):
+      with lock:
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+      time.sleep(0.02)
+      with lock:
+        running[0] -= 1
+      return ticker
+
+    results = asyncio.run(fetch_all([f"T{i}" for i in range(8)], fetch, limit=2))
+    self.assertEqual(len(results), 8)
+    self.assertLessEqual(peak[0], 2)
+
+
+class DashboardTests(StocksTestMixin, TransactionTestCase):
+  def setUp(self):
+    super().setUp()
+    # The bundle's sources load on worker threads, hence a TransactionTestCase.
+    news._store = None
+    self.addCleanup(setattr, news, "_store", None)
+    patcher = mock.patch.object(NewsStore, "start")
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    today = pd.Timestamp.now().normalize()
+    years = [2024, 2023]
+    self.provider = StubProvider(
+      bars={("AAPL", "1m"): minute_bars("America/New_York", "09:30", 390, [today - pd.Timedelta(days=1)])},
+      info={"AAPL": {"sector": "Technology", "sharesOutstanding": 15e9, "exchangeTimezoneName": "America/New_York"}},
+      statements={"AAPL": {
+        "financials": statement({"Total Revenue": [391e9, 383e9], "Net Income": [94e9, 97e9]}, years),
+        "balance_sheet": statement({"Total Assets": [365e9, 353e9], "Total Stockholder Equity": [57e9, 62e9]}, years),
+        "quarterly_income_stmt": statement({"Total Revenue": [95e9, 85e9]}, years),
+      }},
+      news={"AAPL": [story("a1", "Apple")]},
+    )
+    # As deployed: the fundamentals and live sources both read info.
+    self.use(CachedProvider(self.provider, TieredCache(), {"info": 3600}))
+
+  def test_cold_bundle_loads_each_source_once(self):
+    response = self.client.get("/stocks/dashboard/AAPL/")
+    self.assertEqual(response.status_code, 200)
+    bundle = response.json()
+    self.assertEqual(set(bundle), {"Ticker", "summary", "ratios", "history", "stock-info", "news", "live"})
+    self.assertEqual(bundle["stock-info"]["Sector"], "Technology")
+    self.assertEqual(bundle["news"][0]["title"], "Apple")
+    self.assertIn("Close", bundle["live"])
+    kinds = [kind for kind, _ in self.provider.calls]
+    for kind in ("info", "financials", "balance_sheet", "quarterly_income_stmt", "news", "download"):
+      self.assertEqual(kinds.count(kind), 1, kind)
+
+  def test_failing_section_leaves_the_others_intact(self):
+    def unavailable(ticker):
+      raise UpstreamUnavailable("Too Many Requests")
+
+    self.provider.news = unavailable
+    bundle = self.client.get("/stocks/dashboard/AAPL/").json()
+    self.assertEqual(bundle["news"], {"error": "Failed to fetch news: Too Many Requests"})
+    self.assertEqual(bundle["stock-info"]["Sector"], "Technology")
+    self.assertNotIn("error", bundle["summary"])
+    self.assertNotIn("error", bundle["live"])
+
+
+class SerializationTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    self.bars = daily_bars(random_walks(["AAPL"], 30)["AAPL"])
+    self.use(StubProvider(bars={("AAPL", "1d"): self.bars}))
+
+  def test_columns_format_maps_missing_values_to_null(self):
+    for module in (serialization.orjson, None):
+      with self.subTest(orjson=module is not None), mock.patch.object(serialization, "orjson", module):
+        response = self.client.get("/stocks/indicators/AAPL/?period=3mo&set=sma20&format=columns")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/json")
+        columns = json.loads(response.content, parse_constant=self.fail)
+        self.assertEqual(columns["ts"], (self.bars.index.asi8 // 10**6).tolist())
+        self.assertEqual(columns["close"], self.bars["Close"].tolist())
+        self.assertEqual(columns["sma20"][:19], [None] * 19)
+        self.assertAlmostEqual(columns["sma20"][19], self.bars["Close"].iloc[:20].mean())
+
+  def test_binary_formats_need_their_packages(self):
+    with mock.patch.object(serialization, "msgpack", None), mock.patch.object(serialization, "pa", None):
+      for query, accept in (("?format=msgpack", ""), ("?format=arrow", ""), ("", serialization.ARROW_TYPE),
+                            ("", "application/x-msgpack")):
+        with self.subTest(query=query, accept=accept):
+          response = self.client.get(f"/stocks/AAPL/{query}", HTTP_ACCEPT=accept)
+          self.assertEqual(response.status_code, 406)
+    self.assertEqual(self.client.get("/stocks/AAPL/?format=xml").status_code, 400)
+
+  def test_accept_header_picks_the_format(self):
+    packer = SimpleNamespace(packb=lambda data: json.dumps(data).encode())
+    with mock.patch.object(serialization, "msgpack", packer):
+      response = self.client.get("/stocks/AAPL/", HTTP_ACCEPT="application/msgpack, application/json;q=0.5")
+    self.assertEqual(response["Content-Type"], serialization.MSGPACK_TYPE)
+    self.assertEqual(json.loads(response.content)["close"], self.bars["Close"].tail(5).tolist())
+    self.assertIn("Accept", response["Vary"])
+
+    response = self.client.get("/stocks/AAPL/", HTTP_ACCEPT="application/json")
+    self.assertEqual([row["Close"] for row in response.json()], self.bars["Close"].tail(5).tolist())
+
+
+class InstrumentationTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    bars = {("AAPL", "1d"): daily_bars(random_walks(["AAPL"], 30)["AAPL"])}
+    self.use(InstrumentedProvider(StubProvider(bars=bars)))
+
+  def test_server_timing_reports_each_phase(self):
+    response = self.client.get("/stocks/AAPL/")
+    self.assertEqual(response.status_code, 200)
+    entries = [part.strip() for part in response["Server-Timing"].split(",")]
+    self.assertEqual([e.split(";")[0] for e in entries], ["fetch", "upstream", "serialize", "compute", "total", "cache"])
+    durations = {e.split(";")[0]: float(re.search(r"dur=([\d.]+)", e).group(1)) for e in entries[:-1]}
+    self.assertGreater(durations["upstream"], 0)
+    self.assertGreaterEqual(durations["fetch"], durations["upstream"])
+    self.assertAlmostEqual(
+      durations["total"], durations["fetch"] + durations["serialize"] + durations["compute"], delta=0.5,
+    )
+    self.assertIn('desc="1 calls"', entries[1])
+    self.assertEqual(entries[-1], 'cache;desc="hits=0 misses=0"')
+
+  def test_metrics_are_prometheus_text(self):
+    self.client.get("/stocks/AAPL/")
+    response = self.client.get("/stocks/metrics/")
+    self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+    body = response.content.decode()
+    self.assertTrue(body.endswith("\n"))
+
+    sample = re.compile(r'^([a-z_]+)(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[\d.]+(e[+-]?\d+)?$')
+    declared = set()
+    for line in body.splitlines():
+      if line.startswith("# "):
+        self.assertRegex(line, r"^# (HELP [a-z_]+ .+|TYPE [a-z_]+ (counter|gauge|histogram))$")
+        declared.add(line.split()[2])
+        continue
+      match = sample.match(line)
+      self.assertIsNotNone(match, line)
+      # Every sample belongs to a declared family (histograms add suffixes).
+      name = match.group(1)
+      self.assertIn(name if name in declared else re.sub(r"_(bucket|sum|count)$", "", name), declared, line)
+
+    self.assertRegex(body, r'stocks_requests_total\{view="stock_data",method="GET",status="200"\} [1-9]')
+    self.assertRegex(body, r'stocks_upstream_calls_total\{kind="download"\} [1-9]')
+    buckets = [int(v) for v in re.findall(r'stocks_request_duration_seconds_bucket\{view="stock_data",le="[^"]+"\} (\d+)', body)]
+    self.assertEqual(buckets, sorted(buckets))
+    count = re.search(r'stocks_request_duration_seconds_count\{view="stock_data"\} (\d+)', body).group(1)
+    self.assertEqual(buckets[-1], int(count))
+
+
+class HttpError(Exception):
+  def __init__(self, status):
+    super().__init__(f"HTTP Error {status}")
+    self.response = SimpleNamespace(status_code=status)
+
+
+class Clock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+
+class ResilienceTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    self.clock = Clock()
+    # Only the resilience module's clock; the rest of the request keeps real time.
+    patcher = mock.patch("stocks.resilience.time", SimpleNamespace(monotonic=self.clock, sleep=time.sleep))
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def test_errors_are_classified_by_type_and_status(self):
+    from yfinance.exceptions import YFRateLimitError, YFTickerMissingError
+
+    self.assertTrue(is_client_error(YFTickerMissingError("NOPE", "no timezone found")))
+    self.assertTrue(is_client_error(HttpError(404)))
+    for error in (HttpError(500), HttpError(429), ValueError("Error 404 talking to Yahoo"), ConnectionError("404")):
+      self.assertFalse(is_client_error(error), error)
+    self.assertTrue(is_throttle(YFRateLimitError()))
+    self.assertTrue(is_throttle(HttpError(429)))
+    self.assertFalse(is_throttle(HttpError(503)))
+
+  def test_limiter_backs_off_and_recovers(self):
+    limiter = AdaptiveRateLimiter(rate=4, burst=1, max_wait=0.5)
+    with mock.patch("stocks.resilience.random.uniform", return_value=1.0):
+      limiter.throttled()
+      self.assertEqual(limiter.stats(), {"rate": 2.0, "backoff": 1.0})
+      limiter.throttled()
+    self.assertEqual(limiter.stats(), {"rate": 1.0, "backoff": 2.0})
+
+    with self.assertRaises(UpstreamUnavailable) as raised:
+      limiter.acquire()
+    self.assertAlmostEqual(raised.exception.retry_after, 2.0)
+    self.assertAlmostEqual(limiter.retry_after(), 2.0)
+
+    self.clock.now += 2
+    limiter.acquire()
+    limiter.succeeded()
+    self.assertEqual(limiter.stats(), {"rate": 1.2, "backoff": 0.0})
+    for _ in range(20):
+      limiter.succeeded()
+    self.assertEqual(limiter.stats()["rate"], 4.0)
+
+  def test_breaker_opens_half_opens_and_closes(self):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.failed()
+    breaker.before_call()
+    breaker.failed()
+    self.assertEqual(breaker.state, "open")
+    with self.assertRaises(UpstreamUnavailable) as raised:
+      breaker.before_call()
+    self.assertEqual(raised.exception.retry_after, 30)
+
+    # One trial call after the timeout; others wait for its outcome.
+    self.clock.now += 30
+    breaker.before_call()
+    self.assertEqual(breaker.state, "half_open")
+    with self.assertRaises(UpstreamUnavailable):
+      breaker.before_call()
+    breaker.failed()
+    self.assertEqual(breaker.state, "open")
+
+    self.clock.now += 30
+    breaker.before_call()
+    breaker.succeeded()
+    self.assertEqual(breaker.stats(), {"state": "closed", "consecutive_failures": 0})
+
+  def test_client_errors_do_not_trip_the_breaker(self):
+    from yfinance.exceptions import YFTickerMissingError
+
+    def missing(ticker):
+      raise YFTickerMissingError(ticker, "no timezone found")
+
+    stub = StubProvider()
+    stub.info = missing
+    breaker = CircuitBreaker(failure_threshold=2)
+    provider = GuardedProvider(stub, AdaptiveRateLimiter(rate=100, burst=100), breaker)
+    for _ in range(3):
+      with self.assertRaises(YFTickerMissingError):
+        provider.info("NOPE")
+    self.assertEqual(breaker.state, "closed")
+
+  def test_open_circuit_answers_503_with_retry_after(self):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.failed()
+    self.clock.now += 10.5
+    self.use(GuardedProvider(StubProvider(), AdaptiveRateLimiter(), breaker))
+    response = self.client.get("/stocks/AAPL/")
+    self.assertEqual(response.status_code, 503)
+    self.assertEqual(response["Retry-After"], "20")
+    self.assertEqual(response.json()["error"], "Upstream is unavailable, serving from cache only")
+
+
+COMPANIES = {
+  "NVDA": {"longName": "NVIDIA Corporation", "sector": "Technology", "industry": "Semiconductors",
+           "longBusinessSummary": "Designs graphics processors. Founded in 1993."},
+  "AMAT": {"longName": "Applied Materials", "sector": "Technology", "industry": "Semiconductor Equipment",
+           "longBusinessSummary": "Supplies equipment to NVIDIA's foundries and other chip makers."},
+  "JNJ": {"longName": "Johnson & Johnson", "sector": "Healthcare", "industry": "Drug Manufacturers",
+          "longBusinessSummary": "Develops medical devices and pharmaceuticals."},
+}
+
+
+class SearchTests(StocksTestCase):
+  def setUp(self):
+    super().setUp()
+    self.index = search.get_search_index()
+    for ticker, info in COMPANIES.items():
+      self.index.index_company(ticker, info)
+    # bm25 needs the matched terms to be rare across the index to score them.
+    for n in range(6):
+      self.index.index_company(f"FILL{n}", {"longName": f"Filler {n}", "sector": "Utilities"})
+    self.index.index_news("NVDA", [parse_item(story("n1", "NVIDIA unveils new graphics chips"))])
+    self.index.index_news("AMAT", [parse_item(story("a1", "Chip equipment orders rise"))])
+    self.index.index_news("NVDA", [parse_item(story("a1", "Chip equipment orders rise"))])
+
+  def search(self, query, **params):
+    response = self.client.get("/stocks/search/", {"q": query, **params})
+    self.assertEqual(response.status_code, 200, response.content)
+    return response.json()
+
+  def test_unchanged_companies_are_not_reindexed(self):
+    self.assertFalse(self.index.index_company("nvda", COMPANIES["NVDA"]))
+    self.assertTrue(self.index.index_company("NVDA", {**COMPANIES["NVDA"], "industry": "Chips"}))
+    self.assertEqual([c["Industry"] for c in self.search("nvidia corporation")["companies"]], ["Chips"])
+
+  def test_last_word_matches_as_a_prefix(self):
+    self.assertEqual([c["Ticker"] for c in self.search("graphics semicon")["companies"]], ["NVDA"])
+    self.assertEqual(self.search("semicon graphics")["companies"], [])
+    self.assertEqual(self.search("semicon", type="companies")["companies"][0]["FoundedYear"], 1993)
+
+  def test_name_matches_outrank_summary_matches(self):
+    companies = self.search("nvidia", type="companies")["companies"]
+    self.assertEqual([c["Ticker"] for c in companies], ["NVDA", "AMAT"])
+    self.assertGreater(companies[0]["Score"], companies[1]["Score"])
+    self.assertNotIn("news", self.search("nvidia", type="companies"))
+
+  def test_sector_and_ticker_filters(self):
+    self.assertEqual(sorted(c["Ticker"] for c in self.search("de")["companies"]), ["JNJ", "NVDA"])
+    self.assertEqual([c["Ticker"] for c in self.search("de", sector="healthcare")["companies"]], ["JNJ"])
+
+    news = self.search("chip", type="news")["news"]
+    self.assertEqual({n["id"] for n in news}, {"n1", "a1"})
+    self.assertEqual(next(n for n in news if n["id"] == "a1")["tickers"], ["AMAT", "NVDA"])
+    self.assertEqual([n["id"] for n in self.search("chip", type="news", ticker="amat")["news"]], ["a1"])
+
+  def test_query_syntax_is_quoted(self):
+    for query in ('"nvidia', "nvidia -amat", "NEAR(nvidia", "nvidia AND", "chip*)", "NOT nvidia:"):
+      with self.subTest(query=query):
+        self.search(query)
+    self.assertEqual(self.client.get("/stocks/search/", {"q": '"-*'}).json()["error"], "Empty search query")
+
+
+class GunicornConfTests(TestCase):
+  def load(self, **env):
+    # The profile reads the environment at import time, like gunicorn does.
+    self.addCleanup(sys.modules.pop, "yfinance_django.gunicorn_conf", None)
+    sys.modules.pop("yfinance_django.gunicorn_conf", None)
+    with mock.patch.dict(os.environ, env):
+      conf = importlib.import_module("yfinance_django.gunicorn_conf")
+      self.environ = dict(os.environ)
+    return conf
+
+  def test_worker_count_and_pollers_are_handed_to_the_workers(self):
+    conf = self.load(WEB_CONCURRENCY="3", STOCKS_PREFETCH_ON_STARTUP="1", STOCKS_NEWS_POLL_ON_STARTUP="0")
+    self.assertEqual(conf.workers, 3)
+    self.assertEqual(self.environ["STOCKS_WORKER_PROCESSES"], "3")
+    # The master must not start pollers; post_fork does in each worker.
+    self.assertEqual(self.environ["STOCKS_PREFETCH_ON_STARTUP"], "0")
+
+    with mock.patch("stocks.prefetch.get_prefetcher") as prefetcher, mock.patch("stocks.news.get_news_store") as store:
+      conf.post_fork(None, None)
+    prefetcher.return_value.start.assert_called_once_with()
+    store.return_value.start.assert_not_called()
+
+  def test_when_ready_preloads_unless_disabled(self):
+    conf = self.load()
+    with mock.patch("stocks.preload.preload") as preload:
+      with mock.patch.dict(os.environ, {"STOCKS_PRELOAD": "0"}):
+        conf.when_ready(None)
+      preload.assert_not_called()
+      conf.when_ready(None)
+    preload.assert_called_once_with()
+
+  @override_settings(STOCKS_WORKER_PROCESSES=4, STOCKS_UPSTREAM_RATE=8, STOCKS_UPSTREAM_BURST=10)
+  def test_forked_worker_gets_a_fresh_pool_and_its_share_of_the_budget(self):
+    self.addCleanup(setattr, providers, "_limiter", None)
+    self.addCleanup(setattr, providers, "_breaker", None)
+    self.addCleanup(set_provider, None)
+    providers._limiter = None
+    master = providers.get_rate_limiter()
+    master.throttled()
+    fanout.get_executor().submit(int).result()
+
+    read, write = os.pipe()
+    with warnings.catch_warnings():
+      warnings.simplefilter("ignore", DeprecationWarning)
+      pid = os.fork()
+    if pid == 0:
+      try:
+        os.close(read)
+        limiter = providers.get_rate_limiter()
+        state = {
+          "pool": fanout._executor is None, "fresh": limiter is not master,
+          "rate": limiter.rate, "burst": limiter.burst,
+        }
+        os.write(write, json.dumps(state).encode())
+      finally:
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as pipe:
+      state = json.loads(pipe.read())
+    os.waitpid(pid, 0)
+
+    self.assertEqual(state, {"pool": True, "fresh": True, "rate": 2.0, "burst": 2})
+    self.assertIsNotNone(fanout._executor)
+    self.assertIs(providers.get_rate_limiter(), master)
+
+
+class TieredCacheTests(TestCase):
+  def test_concurrent_misses_share_one_fetch(self):
+    cache = TieredCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+      calls.append(1)
+      started.set()
+      release.wait(10)
+      return "quote"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("k", 60, fetch))) for _ in range(8)]
+    threads[0].start()
+    started.wait(10)
+    for thread in threads[1:]:
+      thread.start()
+    release.set()
+    for thread in threads:
+      thread.join()
+    self.assertEqual(results, ["quote"] * 8)
+    self.assertEqual(len(calls), 1)
+    self.assertEqual(cache.get_or_fetch("k", 60, lambda: "refetched"), "quote")
+
+  def test_processes_share_one_fetch_through_the_shared_cache(self):
+    shared = LocMemCache("stocks-tests-tiered", {})
+    workers = [TieredCache(shared=shared, poll_interval=0.01) for _ in range(2)]
+    started, release = threading.Event(), threading.Event()
+
+    def fetch():
+      started.set()
+      release.wait(10)
+      return "info"
+
+    leader = threading.Thread(target=workers[0].get_or_fetch, args=("k", 60, fetch))
+    leader.start()
+    started.wait(10)
+    threading.Timer(0.05, release.set).start()
+    self.assertEqual(workers[1].get_or_fetch("k", 60, lambda: self.fail("fetched twice")), "info")
+    leader.join()
+
+  def test_serves_stale_value_when_refetch_fails(self):
+    cache = TieredCache(stale_for=60)
+    cache.get_or_fetch("k", 0.01, lambda: "old")
+    time.sleep(0.02)
+
+    def fail():
+      raise UpstreamUnavailable("Too Many Requests")
+
+    self.assertEqual(cache.get_or_fetch("k", 60, fail), "old")
+    self.assertEqual(cache.stats()["stale"], 1)
+    with self.assertRaises(UpstreamUnavailable):
+      TieredCache(stale_for=0).get_or_fetch("k", 60, fail)
+
+
+class HttpCacheTests(StocksTestCase):
+  def test_versioned_view_answers_304_without_upstream_calls(self):
+    provider = self.use(StubProvider(info={"AAPL": {"sector": "Technology", "marketCap": 3e12}}))
+    response = self.client.get("/stocks/summary/AAPL/")
+    self.assertEqual(response.status_code, 200)
+    self.assertIn("max-age=", response["Cache-Control"])
+    calls = len(provider.calls)
+
+    again = self.client.get("/stocks/summary/AAPL/", HTTP_IF_NONE_MATCH=response["ETag"])
+    self.assertEqual(again.status_code, 304)
+    self.assertEqual(again["ETag"], response["ETag"])
+    self.assertEqual(again.content, b"")
+    self.assertEqual(len(provider.calls), calls)
+    self.assertEqual(self.client.get("/stocks/summary/AAPL/", HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+  def test_stale_responses_are_not_cached_publicly(self):
+    provider = self.use(StubProvider(info={"AAPL": {"sector": "Technology", "marketCap": 3e12}}))
+    fresh = self.client.get("/stocks/summary/AAPL/")
+    self.assertEqual(fresh["Cache-Control"], "public, max-age=21600")
+
+    def unavailable(ticker):
+      raise UpstreamUnavailable("Too Many Requests")
+
+    provider.info = unavailable
+    fundamentals.get_fundamentals_store().check_after = timedelta(0)
+    stale = self.client.get("/stocks/summary/AAPL/")
+    self.assertEqual(stale.status_code, 200)
+    self.assertEqual(stale["X-Data-Stale"], "true")
+    self.assertEqual(stale["Cache-Control"], "no-cache, max-age=0")
+
+  def test_max_age_comes_from_settings(self):
+    with override_settings(STOCKS_HTTP_MAX_AGE={"analytics": 42}):
+      self.assertEqual(self.client.get("/stocks/screener/")["Cache-Control"], "public, max-age=42")
+    with override_settings(STOCKS_HTTP_MAX_AGE={}):
+      self.assertEqual(self.client.get("/stocks/screener/")["Cache-Control"], "public, max-age=0")
+
+  def test_body_etag_view_answers_304(self):
+    response = self.client.get("/stocks/screener/")
+    self.assertEqual(response.status_code, 200)
+    again = self.client.get("/stocks/screener/", HTTP_IF_NONE_MATCH=response["ETag"])
+    self.assertEqual(again.status_code, 304)
+
+
+class BenchmarkCommandTests(StocksTestMixin, TransactionTestCase):
+  def test_smoke_run_against_replay_fixture(self):
+    today = pd.Timestamp.now().normalize()
+    years = [2024, 2023]
+    stub = StubProvider(
+      bars={
+        ("AAPL", "1d"): daily_bars(random_walks(["AAPL"], 30)["AAPL"]),
+        ("AAPL", "1m"): minute_bars("America/New_York", "09:30", 390, [today - pd.Timedelta(days=1)]),
+      },
+      info={"AAPL": {"sector": "Technology", "exchangeTimezoneName": "America/New_York"}},
+      statements={"AAPL": {
+        "financials": statement({"Total Revenue": [391e9, 383e9], "Net Income": [94e9, 97e9]}, years),
+        "balance_sheet": statement({"Total Assets": [365e9, 353e9]}, years),
+        "quarterly_income_stmt": statement({"Total Revenue": [95e9, 85e9]}, years),
+      }},
+    )
+    root = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    recorder = RecordingProvider(stub, f"{root}/fixtures")
+    recorder.history("AAPL", period="1mo", interval="1d")
+    recorder.history("AAPL", period="1d", interval="1m")
+    for kind in ("info", "financials", "balance_sheet", "quarterly_income_stmt"):
+      getattr(recorder, kind)("AAPL")
+
+    # The test runner already set up the environment and a test database.
+    with (
+      mock.patch.object(benchmark, "setup_test_environment"),
+      mock.patch.object(benchmark, "teardown_test_environment"),
+      mock.patch.object(benchmark.connection.creation, "create_test_db"),
+      mock.patch.object(benchmark.connection.creation, "destroy_test_db"),
+    ):
+      call_command(
+        "benchmark", replay_dir=f"{root}/fixtures", tickers="AAPL", requests=3, warmup=1, concurrency=1,
+        only="stock_data,stock_summary,live_price", output=f"{root}/report.json", stdout=io.StringIO(),
+      )
+
+    with open(f"{root}/report.json") as f:
+      report = json.load(f)
+    self.assertEqual(
+      [r["name"] for r in report["results"]],
+      ["live_price", "stock_summary", "stock_data", "stock_data?period=1y&points=100&downsample=lttb",
+       "stock_data?period=1y&format=columns"],
+    )
+    for result in report["results"]:
+      self.assertEqual(result["statuses"], {"200": 3}, result["name"])
+      self.assertGreater(result["process_peak_rss_mb"], 0)
+    # The replay and scratch-store settings only applied during the run.
+    self.assertNotEqual(settings.STOCKS_REPLAY_DIR, f"{root}/fixtures")
+    self.assertNotIn(root, settings.STOCKS_BAR_STORE_PATH)
@@ -4,17 +4,29 @@ from django.urls import path
 urlpatterns = [
     path("", views.index, name="index"),
     path("live/<str:ticker>/", views.live_price, name="live_price"),
+    path("intraday/<str:ticker>/", views.intraday_bars, name="intraday"),
     path("multiple-live/<str:tickers>/", views.multiple_live_prices, name="multiple_live_prices"),
     path("multiple-live-others/", views.multiple_live_prices_others, name="multiple_live_prices_others"),
+    path("stream/<str:tickers>/", views.live_price_stream, name="live_price_stream"),
     path("summary/<str:ticker>/", views.stock_summary, name="stock_summary"),
     path("ratios/<str:ticker>/", views.financial_ratios, name="financial_ratios"),
+    path("multiple-ratios/<str:tickers>/", views.multiple_financial_ratios, name="multiple_financial_ratios"),
     path("history/<str:ticker>/", views.financial_history, name="financial_history"),
+    path("dashboard/<str:ticker>/", views.dashboard_view, name="dashboard"),
+    path("indicators/<str:ticker>/", views.indicators_view, name="indicators"),
+    path("portfolio/", views.portfolio_view, name="portfolio"),
+    path("search/", views.search_view, name="search"),
+    path("screener/", views.screener_view, name="screener"),
     path('heatmap/<str:tickers>/', views.heatmap_view, name='heatmap'),
     path('top-gainers/<str:tickers>/', views.top_gainers_view, name='top_gainers'),
     path('top-losers/<str:tickers>/', views.top_losers_view, name='top_losers'),
+    path('most-volatile/<str:tickers>/', views.most_volatile_view, name='most_volatile'),
+    path('volume-spikes/<str:tickers>/', views.volume_spikes_view, name='volume_spikes'),
     path('multiple-news/<str:tickers>/', views.multiple_stock_news, name='mulitple_stock_news'),
+    path('news-feed/<str:tickers>/', views.news_feed, name='news_feed'),
     path('stock-info/<str:tickers>/', views.stock_basic_info, name='stock-info'),
     path('health/', views.api_health_check, name='api_health_check'),
+    path('metrics/', views.metrics_view, name='metrics'),
 
     # Always keep this last
     path("<str:ticker>/", views.stock_data, name="stock_data"),
@@ -1,450 +1,521 @@
+import numpy as np
 import pandas as pd
 from django.shortcuts import render
 import logging
-import yfinance as yf
-from django.http import JsonResponse
-import re
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.cache import never_cache
+import math
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
+from .bar_store import get_bar_store
+from .aggregation import RESOLUTIONS, get_intraday_aggregator
+from .batching import get_quote_batcher
+from .correlation import get_correlation_engine, resolve_window
+from .dashboard import basic_info, bundle, dashboard_kind, parse_sections
+from .downsampling import MODES, downsample
+from .fanout import fetch_all
+from .fundamentals import content_version, get_fundamentals_store
+from .http_cache import bars_kind, http_cache
+from .indicators import compute_indicators, get_indicator_engine, parse_set
+from .instrumentation import JsonResponse, mark_stale, registry
+from .movers import get_movers_index
+from .news import MAX_PAGE, get_news_store
+from .portfolio import analyze, parse_holdings
+from .prefetch import get_prefetcher
+from .providers import exchange_timezone, get_cache, get_circuit_breaker, get_provider, get_rate_limiter, is_intraday
+from .quotes import latest_bars, latest_quotes
+from .ratios import compute_ratios
+from .resilience import UpstreamUnavailable
+from .screener import screen
+from .search import MAX_RESULTS, get_search_index, match_query
+from .serialization import bars_response
+from .streaming import astream_events, get_live_hub, stream_events
 
 logger = logging.getLogger(__name__)
 
+def error_response(e, message=None):
+  # Throttled or unavailable upstream is temporary: tell clients when to retry.
+  if isinstance(e, UpstreamUnavailable):
+    response = JsonResponse({"error": message or str(e)}, status=503)
+    response["Retry-After"] = str(max(math.ceil(e.retry_after), 1))
+    return response
+  return JsonResponse({"error": message or str(e)}, status=400)
+
 def index(request):
   return render(request, 'index.html')
 
+INTERVALS = ("1m", "2m", "5m", "15m", "30m", "60m", "90m", "1h", "1d", "5d", "1wk", "1mo", "3mo")
+
+def bars_version(request, ticker, period="5d"):
+  interval = request.GET.get("interval", "1d")
+  if interval not in INTERVALS:
+    return None
+  start = request.GET.get("start") or None
+  return get_bar_store().version(ticker, request.GET.get("period", period), interval, start=start), None
+
+def fundamentals_version(request, ticker):
+  return content_version(get_fundamentals_store().snapshot(ticker)), None
+
+@http_cache(bars_kind, version=bars_version)
 def stock_data(request, ticker):
   try:
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period="5d")
-    data_json = hist.reset_index().to_dict(orient="records")
-    return JsonResponse(data_json, safe=False)
+    period = request.GET.get("period", "5d")
+    interval = request.GET.get("interval", "1d")
+    start = request.GET.get("start") or None
+    end = request.GET.get("end") or None
+    mode = request.GET.get("downsample", "ohlc")
+    try:
+      points = int(request.GET["points"]) if request.GET.get("points") else None
+    except ValueError:
+      return JsonResponse({"error": "points must be an integer"}, status=400)
+    if interval not in INTERVALS:
+      return JsonResponse({"error": f"Unsupported interval: {interval}"}, status=400)
+    if mode not in MODES:
+      return JsonResponse({"error": f"Unsupported downsample mode: {mode}. Use one of {', '.join(MODES)}"}, status=400)
+    if points is not None and points < 3:
+      return JsonResponse({"error": "points must be at least 3"}, status=400)
+
+    hist = get_bar_store().history(ticker, period=period, interval=interval, start=start, end=end)
+    if points is not None:
+      hist = downsample(hist, points, mode)
+    return bars_response(request, hist, lambda: hist.reset_index().to_dict(orient="records"))
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
-def live_price(request, ticker):
+@http_cache(bars_kind, version=partial(bars_version, period="6mo"))
+def indicators_view(request, ticker):
   try:
-    stock = yf.Ticker(ticker)
-    data = stock.history(period="1d", interval="1m")
-    if not data.empty:
-      latest = data.tail(1).reset_index().to_dict(orient="records")[0]
-      return JsonResponse(latest, safe=False)
-    else:
+    period = request.GET.get("period", "6mo")
+    interval = request.GET.get("interval", "1d")
+    mode = request.GET.get("mode", "full")
+    if interval not in INTERVALS:
+      return JsonResponse({"error": f"Unsupported interval: {interval}"}, status=400)
+    if mode not in ("full", "latest"):
+      return JsonResponse({"error": f"Unsupported mode: {mode}. Use full or latest"}, status=400)
+    try:
+      specs = parse_set(request.GET.get("set", "rsi14,macd,bb20"))
+    except ValueError as e:
+      return JsonResponse({"error": str(e)}, status=400)
+
+    if mode == "latest":
+      # Advances the running state with any bars that arrived since the
+      # last call instead of recomputing the whole window.
+      ts, values = get_indicator_engine().latest(ticker, specs, period=period, interval=interval)
+      return JsonResponse({"ticker": ticker.upper(), "timestamp": ts, "values": values})
+
+    bars = get_bar_store().history(ticker, period=period, interval=interval)
+    tz = exchange_timezone(ticker) if is_intraday(interval) else "UTC"
+    frame = compute_indicators(bars, specs, interval, tz)
+    records = lambda: frame.astype(object).where(frame.notna(), None).reset_index().to_dict(orient="records")
+    return bars_response(request, frame, records)
+  except Exception as e:
+    return error_response(e)
+
+@http_cache("quote")
+def intraday_bars(request, ticker):
+  try:
+    resolution = request.GET.get("resolution", "5m")
+    if resolution not in RESOLUTIONS:
+      return JsonResponse({"error": f"Unsupported resolution: {resolution}. Use one of {', '.join(RESOLUTIONS)}"}, status=400)
+    try:
+      limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+    except ValueError:
+      return JsonResponse({"error": "limit must be an integer"}, status=400)
+    if limit is not None and limit < 1:
+      return JsonResponse({"error": "limit must be at least 1"}, status=400)
+
+    bars = get_intraday_aggregator().bars(ticker.strip().upper(), resolution, limit)
+    if bars is None:
       return JsonResponse({"error": "No data found"}, status=404)
+    return bars_response(request, bars, lambda: bars.reset_index().to_dict(orient="records"))
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
-def format_stock_summary(stock_data):
+@http_cache("quote")
+def live_price(request, ticker):
   try:
-      open_price = stock_data["Open"]
-      close_price = stock_data["Close"]
+    ticker = ticker.strip().upper()
+    latest = get_intraday_aggregator().latest([ticker])[ticker]
+    if latest is not None:
+      return bars_response(request, latest, lambda: latest.reset_index().to_dict(orient="records")[0])
+    else:
+      return JsonResponse({"error": "No data found"}, status=404)
+  except Exception as e:
+    return error_response(e)
 
-      change = close_price - open_price
-      percent = (change / open_price) * 100 if open_price else 0
+def live_price_stream(request, tickers):
+  ticker_list = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+  if not ticker_list:
+    return JsonResponse({"error": "No tickers given"}, status=400)
 
-      return {
-        "value": f"{close_price:,.2f}", 
-        "change": f"{change:+.2f}", 
-        "percent": f"{percent:+.2f}%", 
-        "positive": change >= 0
-      }
-  except KeyError:
-    return {"error": "Missing required stock fields"}
+  hub = get_live_hub()
+  keepalive = getattr(settings, "STOCKS_STREAM_KEEPALIVE_SECONDS", 15)
+  if isinstance(request, ASGIRequest):
+    events = astream_events(hub, ticker_list, keepalive)
+  else:
+    events = stream_events(hub, ticker_list, keepalive)
 
+  response = StreamingHttpResponse(events, content_type="text/event-stream")
+  response["Cache-Control"] = "no-cache"
+  response["X-Accel-Buffering"] = "no"
+  return response
 
+@http_cache("quote")
 def multiple_live_prices(request, tickers):
   try:
     ticker_list = [t.strip().upper() for t in tickers.split(",")]
-    data = yf.download(ticker_list, period="1d", interval="1m", group_by="ticker")
-
-    results = {}
-    for ticker in ticker_list:
-      try:
-        latest = data[ticker].dropna().tail(1).reset_index().to_dict(orient="records")[0]
-        results[ticker] = {
-          "raw": latest,
-          "summary": format_stock_summary(latest)
-        }
-      except Exception:
-        results[ticker] = {"error": "No data found"}
-    return JsonResponse(results, safe=False)
+    bars = get_intraday_aggregator().latest(ticker_list)
+    return bars_response(request, latest_bars(bars, ticker_list), lambda: latest_quotes(bars, ticker_list))
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
+@http_cache("quote")
 def multiple_live_prices_others(request):
   try:
-    tickers = ['^NSEI', 'USDINR=X', 'TCS.NS', 'GLD', 'NVDA']
-    ticker_list = [t.strip().upper() for t in tickers]
-    data = yf.download(ticker_list, period="1d", interval="1m", group_by="ticker")
-    print(f"Downloaded data: {data}")
-
-    results = {}
-    for ticker in ticker_list:
-      try:
-        latest = data[ticker].dropna().tail(1).reset_index().to_dict(orient="records")[0]
-        results[ticker] = {
-          "raw": latest,
-          "summary": format_stock_summary(latest)
-        }
-      except Exception:
-        results[ticker] = {"error": "No data found"}
-    return JsonResponse(results, safe=False)
+    return JsonResponse(get_prefetcher().snapshot("others"), safe=False)
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
-
-def extract_founding_year(text):
-  match = re.search(r'\b(?:founded|incorporated)\s+in\s+(\d{4})', text, re.IGNORECASE)
-  if match:
-    return int(match.group(1))
-  else:
-    return None
+    return error_response(e)
 
+@http_cache("fundamentals", version=fundamentals_version)
 def stock_summary(request, ticker):
   try:
-    stock = yf.Ticker(ticker)
-    info = stock.info  
-    
-    market_cap = info.get("marketCap")
-    sector = info.get("sector")
-    pe_ratio = info.get("trailingPE")
-    book_value = info.get("bookValue")
-    div_yield = info.get("dividendYield")
-    eps = info.get("epsTrailingTwelveMonths") or info.get("earningsPerShare")
-    employees = info.get("fullTimeEmployees")
-    founded = info.get("founded") or info.get("longBusinessSummary") 
-      
-    revenue_ttm, net_income_ttm = None, None
-    try:
-      inc = stock.quarterly_income_stmt
-      if not inc.empty:
-        if "Total Revenue" in inc.index:
-          revenue_ttm = inc.loc["Total Revenue"].iloc[:4].sum()
-        if "Net Income" in inc.index:
-          net_income_ttm = inc.loc["Net Income"].iloc[:4].sum()
-    except Exception:
-      pass
-
-    result = {
-      "MarketCap": market_cap,
-      "RevenueTTM": revenue_ttm,
-      "Sector": sector,
-      "NetIncomeTTM": net_income_ttm,
-      "EPS": eps,
-      "Employees": employees,
-      "PERatio": pe_ratio,
-      "BookValue": book_value,
-      "Founded": founded,
-      "DividendYield": div_yield,
-    }
+    return JsonResponse(get_fundamentals_store().snapshot(ticker).summary, safe=False)
+  except Exception as e:
+    return error_response(e)
+
+@http_cache("fundamentals", version=fundamentals_version)
+def financial_ratios(request, ticker):
+  try:
+    result = get_fundamentals_store().snapshot(ticker).ratios
+    if result is None:
+      return JsonResponse({"error": "Financial data not available"}, status=404)
 
     return JsonResponse(result, safe=False)
-  
+
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
-def financial_ratios(request, ticker):
+@http_cache(dashboard_kind)
+async def dashboard_view(request, ticker):
   try:
-    stock = yf.Ticker(ticker)
+    try:
+      sections = parse_sections(request.GET.get("sections"))
+      news_limit = int(request.GET.get("news_limit", 20))
+    except ValueError as e:
+      return JsonResponse({"error": str(e)}, status=400)
+    if news_limit < 1:
+      return JsonResponse({"error": "news_limit must be at least 1"}, status=400)
+
+    return JsonResponse(await bundle(ticker, sections, news_limit))
+  except Exception as e:
+    return error_response(e)
 
-    income = stock.financials
-    balance = stock.balance_sheet
-    cashflow = stock.cashflow
+@http_cache("fundamentals")
+async def multiple_financial_ratios(request, tickers):
+  try:
+    ticker_list = [t.strip().upper() for t in tickers.split(",")]
+    market = get_provider()
+    fetched = await fetch_all(ticker_list, lambda t: (market.financials(t), market.balance_sheet(t)))
 
-    if income.empty or balance.empty:
-      return JsonResponse({"error": "Financial data not available"}, status=404)
+    statements = {t: v for t, v in fetched.items() if not isinstance(v, Exception)}
+    ratios = compute_ratios(statements)
 
-    def safe_get(df, key, default=0):
-        try:
-            val = df.loc[key].iloc[0]
-            return float(val) if val is not None else default
-        except Exception:
-            return default
-
-    revenue = safe_get(income, "Total Revenue")
-    gross_profit = safe_get(income, "Gross Profit")
-    operating_income = safe_get(income, "Operating Income")
-    net_income = safe_get(income, "Net Income")
-    ebit = safe_get(income, "EBIT")
-    interest_expense = safe_get(income, "Interest Expense")
-
-    total_assets = safe_get(balance, "Total Assets")
-    total_equity = safe_get(balance, "Total Stockholder Equity")
-    total_debt = safe_get(balance, "Total Debt")
-    current_assets = safe_get(balance, "Total Current Assets")
-    current_liabilities = safe_get(balance, "Total Current Liabilities")
-    inventory = safe_get(balance, "Inventory")
-    cash = safe_get(balance, "Cash")
-    intangibles = safe_get(balance, "Goodwill")
-
-    gross_margin = (gross_profit / revenue * 100) if revenue else None
-    operating_margin = (operating_income / revenue * 100) if revenue else None
-    net_margin = (net_income / revenue * 100) if revenue else None
-    roe = (net_income / total_equity * 100) if total_equity else None
-    roa = (net_income / total_assets * 100) if total_assets else None
-
-    current_ratio = (current_assets / current_liabilities) if current_liabilities else None
-    quick_ratio = ((current_assets - inventory) / current_liabilities) if current_liabilities else None
-    cash_ratio = (cash / current_liabilities) if current_liabilities else None
-    working_capital = (current_assets - current_liabilities) if current_assets and current_liabilities else None
-
-    debt_to_equity = (total_debt / total_equity) if total_equity else None
-    interest_coverage = (ebit / abs(interest_expense)) if ebit and interest_expense else None
-    asset_coverage = ((total_assets - intangibles - current_liabilities) / total_debt) if total_assets and total_debt else None
-
-    result = {
-      "Profitability": {
-        "GrossProfitMargin": f"{gross_margin:.2f}%" if gross_margin else None,
-        "OperatingMargin": f"{operating_margin:.2f}%" if operating_margin else None,
-        "NetProfitMargin": f"{net_margin:.2f}%" if net_margin else None,
-        "ReturnOnEquity": f"{roe:.2f}%" if roe else None,
-        "ReturnOnAssets": f"{roa:.2f}%" if roa else None,
-      },
-      "Liquidity": {
-        "CurrentRatio": round(current_ratio, 2) if current_ratio else None,
-        "QuickRatio": round(quick_ratio, 2) if quick_ratio else None,
-        "CashRatio": round(cash_ratio, 2) if cash_ratio else None,
-        "WorkingCapital": working_capital,
-      },
-      "Leverage": {
-        "DebtToEquity": round(debt_to_equity, 2) if debt_to_equity else None,
-        "InterestCoverage": f"{interest_coverage:.2f}x" if interest_coverage else None,
-        "AssetCoverage": round(asset_coverage, 2) if asset_coverage else None,
-      }
-    }
+    results = {}
+    for ticker in ticker_list:
+      if isinstance(fetched[ticker], Exception):
+        results[ticker] = {"error": f"Failed to fetch financials: {str(fetched[ticker])}"}
+      elif ratios[ticker] is None:
+        results[ticker] = {"error": "Financial data not available"}
+      else:
+        results[ticker] = ratios[ticker]
 
-    return JsonResponse(result, safe=False)
+    return JsonResponse(results, safe=False)
 
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
+@http_cache("fundamentals", version=fundamentals_version)
 def financial_history(request, ticker):
   try:
-    stock = yf.Ticker(ticker)
-    
-    income = stock.financials
-    balance = stock.balance_sheet
-    shares_out = stock.info.get("sharesOutstanding")
-
-    if income.empty or balance.empty:
+    data = get_fundamentals_store().snapshot(ticker).history
+    if data is None:
       return JsonResponse({"error": "Financial data not available"}, status=404)
 
-    data = []
-    for year in income.columns[:5]: 
-        try:
-          revenue = income.loc["Total Revenue"].get(year)
-        except KeyError:
-          revenue = None
-
-        try:
-          net_income = income.loc["Net Income"].get(year)
-        except KeyError:
-          net_income = None
-
-        try:
-          equity = balance.loc["Total Stockholder Equity"].get(year)
-        except KeyError:
-          equity = None
-
-        eps = net_income / shares_out if net_income and shares_out else None
-
-        roe = net_income / equity if net_income and equity else None
-
-        data.append({
-          "Year": year.year if hasattr(year, "year") else str(year),
-          "Revenue": revenue,
-          "NetIncome": net_income,
-          "EPS": eps,
-          "ROE": roe
-        })
-
     return JsonResponse(data, safe=False)
 
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
+
+@http_cache("analytics")
+def portfolio_view(request):
+  try:
+    try:
+      tickers, weights = parse_holdings(request.GET.get("holdings"))
+      confidence = float(request.GET.get("confidence", 0.95))
+      horizon = int(request.GET.get("horizon", 1))
+    except ValueError as e:
+      return JsonResponse({"error": str(e)}, status=400)
+    if not 0.5 < confidence < 1:
+      return JsonResponse({"error": "confidence must be between 0.5 and 1"}, status=400)
+    if not 1 <= horizon <= 30:
+      return JsonResponse({"error": "horizon must be between 1 and 30 days"}, status=400)
+
+    benchmark = request.GET.get("benchmark", settings.STOCKS_PORTFOLIO_BENCHMARK) or None
+    result = analyze(
+      tickers, weights, benchmark=benchmark, period=request.GET.get("period", "1y"),
+      confidence=confidence, horizon=horizon, series=request.GET.get("series") == "1",
+    )
+    return JsonResponse(result)
+  except Exception as e:
+    return error_response(e)
+
+@http_cache("search")
+def search_view(request):
+  try:
+    kind = request.GET.get("type", "all")
+    if kind not in ("all", "companies", "news"):
+      return JsonResponse({"error": f"Unsupported type: {kind}. Use all, companies or news"}, status=400)
+    try:
+      query = match_query(request.GET.get("q"), any_term=request.GET.get("match") == "any")
+      limit = int(request.GET.get("limit", 20))
+    except ValueError as e:
+      return JsonResponse({"error": str(e)}, status=400)
+    if not 1 <= limit <= MAX_RESULTS:
+      return JsonResponse({"error": f"limit must be between 1 and {MAX_RESULTS}"}, status=400)
+
+    index = get_search_index()
+    result = {"query": request.GET.get("q")}
+    if kind in ("all", "companies"):
+      result["companies"] = index.companies(query, limit, sector=request.GET.get("sector"))
+    if kind in ("all", "news"):
+      result["news"] = index.news(query, limit, ticker=request.GET.get("ticker"))
+    return JsonResponse(result)
+  except Exception as e:
+    return error_response(e)
 
+@http_cache("analytics")
+def screener_view(request):
+  try:
+    total, results = screen(request.GET)
+    return JsonResponse({"count": total, "results": results}, safe=False)
+  except Exception as e:
+    return error_response(e)
+
+@http_cache("analytics")
 def heatmap_view(request, tickers):
   try:
     logger.info(f"Heatmap request for tickers: {tickers}")
     ticker_list = [t.strip().upper() for t in tickers.split(",")]
     logger.info(f"Processed ticker list: {ticker_list}")
-    
+
     try:
-      df = yf.download(ticker_list, period="6mo", progress=False)["Adj Close"]
-      logger.info(f"Downloaded data shape: {df.shape}")
+      window = resolve_window(request.GET.get("window", "6mo"))
+    except ValueError as window_error:
+      return JsonResponse({"error": str(window_error)}, status=400)
+
+    try:
+      known, corr = get_correlation_engine().correlations(ticker_list, window)
+      logger.info(f"Correlation matrix shape: {corr.shape}")
     except Exception as download_error:
       logger.error(f"Download error: {str(download_error)}")
-      return JsonResponse({"error": f"Failed to download data: {str(download_error)}"}, status=400)
+      return error_response(download_error, f"Failed to download data: {str(download_error)}")
 
-    if df.empty:
+    if not known or np.isnan(corr).all():
       logger.warning("No data found for the given tickers")
       return JsonResponse({"error": "No data found"}, status=404)
-      
+
     if len(ticker_list) == 1:
       return JsonResponse({ticker_list[0]: {ticker_list[0]: 1.0}}, safe=False)
-      
+
     try:
-      corr = df.corr().round(2).fillna(0)
-      logger.info(f"Correlation matrix shape: {corr.shape}")
-          
+      rows = dict(zip(known, np.nan_to_num(np.round(corr, 2)).tolist()))
+
       corr_dict = {}
       for ticker1 in ticker_list:
-        if ticker1 in corr.index:
-          corr_dict[ticker1] = {}
-          for ticker2 in ticker_list:
-            if ticker2 in corr.columns:
-              corr_dict[ticker1][ticker2] = float(corr.loc[ticker1, ticker2])
-            else:
-              corr_dict[ticker1][ticker2] = 0.0
+        if ticker1 in rows:
+          row = dict(zip(known, rows[ticker1]))
+          corr_dict[ticker1] = {ticker2: row.get(ticker2, 0.0) for ticker2 in ticker_list}
         else:
           corr_dict[ticker1] = {t: 1.0 if t == ticker1 else 0.0 for t in ticker_list}
-        
-          logger.info(f"Returning correlation data for {len(corr_dict)} tickers")
-          return JsonResponse(corr_dict, safe=False)
-          
+
+      logger.info(f"Returning correlation data for {len(corr_dict)} tickers")
+      return JsonResponse(corr_dict, safe=False)
+
     except Exception as corr_error:
       logger.error(f"Correlation calculation error: {str(corr_error)}")
       return JsonResponse({"error": f"Correlation calculation failed: {str(corr_error)}"}, status=400)
-          
+
   except Exception as e:
     logger.error(f"General error in heatmap_view: {str(e)}")
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
 
-def top_gainers_view(request, tickers):
+def movers_view(request, tickers, metric, largest, label, value_key):
   try:
-    logger.info(f"Top gainers request for tickers: {tickers}")
+    logger.info(f"{label} request for tickers: {tickers}")
     ticker_list = [t.strip().upper() for t in tickers.split(",")]
     try:
-      df = yf.download(ticker_list, period="5d", progress=False)["Adj Close"]
-      logger.info(f"Downloaded data shape for gainers: {df.shape}")
+      limit = int(request.GET.get("limit", 5))
+    except ValueError:
+      return JsonResponse({"error": "limit must be an integer"}, status=400)
+    if limit < 1:
+      return JsonResponse({"error": "limit must be at least 1"}, status=400)
+    try:
+      snapshot = get_movers_index().snapshot(ticker_list)
+      logger.info(f"Movers snapshot for {label.lower()}: {snapshot.sessions} sessions")
     except Exception as download_error:
-      logger.error(f"Download error for gainers: {str(download_error)}")
-      return JsonResponse({"error": f"Failed to download data: {str(download_error)}"}, status=400)
+      logger.error(f"Download error for {label.lower()}: {str(download_error)}")
+      return error_response(download_error, f"Failed to download data: {str(download_error)}")
 
-    if df.empty:
+    if snapshot.sessions == 0:
       return JsonResponse({"error": "No data found"}, status=404)
 
     try:
-      if len(df) < 2:
+      if snapshot.sessions < 2:
         return JsonResponse({"error": "Not enough data for calculation"}, status=400)
-          
-      pct_change = ((df.iloc[-1] - df.iloc[0]) / df.iloc[0] * 100).fillna(0)
-      top_gainers = pct_change.sort_values(ascending=False).head(5)
 
-      result = [{"Ticker": str(t), "Change%": float(chg)} for t, chg in top_gainers.items()]
-      logger.info(f"Returning {len(result)} top gainers")
+      result = [{"Ticker": t, value_key: v} for t, v in snapshot.top(metric, limit, largest)]
+      logger.info(f"Returning {len(result)} {label.lower()}")
       return JsonResponse(result, safe=False)
-        
+
     except Exception as calc_error:
-      logger.error(f"Calculation error for gainers: {str(calc_error)}")
+      logger.error(f"Calculation error for {label.lower()}: {str(calc_error)}")
       return JsonResponse({"error": f"Calculation failed: {str(calc_error)}"}, status=400)
-          
+
   except Exception as e:
-    logger.error(f"General error in top_gainers_view: {str(e)}")
-    return JsonResponse({"error": str(e)}, status=400)
+    logger.error(f"General error in movers_view: {str(e)}")
+    return error_response(e)
 
-def top_losers_view(request, tickers):
-  try:
-    logger.info(f"Top losers request for tickers: {tickers}")
-    ticker_list = [t.strip().upper() for t in tickers.split(",")]
-    
-    try:
-      df = yf.download(ticker_list, period="5d", progress=False)["Adj Close"]
-      logger.info(f"Downloaded data shape for losers: {df.shape}")
-    except Exception as download_error:
-      logger.error(f"Download error for losers: {str(download_error)}")
-      return JsonResponse({"error": f"Failed to download data: {str(download_error)}"}, status=400)
+@http_cache("analytics")
+def top_gainers_view(request, tickers):
+  return movers_view(request, tickers, "change", True, "Top gainers", "Change%")
 
-    if df.empty:
-      return JsonResponse({"error": "No data found"}, status=404)
+@http_cache("analytics")
+def top_losers_view(request, tickers):
+  return movers_view(request, tickers, "change", False, "Top losers", "Change%")
 
-    try:
-      if len(df) < 2:
-        return JsonResponse({"error": "Not enough data for calculation"}, status=400)
-          
-      pct_change = ((df.iloc[-1] - df.iloc[0]) / df.iloc[0] * 100).fillna(0)
-      top_losers = pct_change.sort_values(ascending=True).head(5)
+@http_cache("analytics")
+def most_volatile_view(request, tickers):
+  return movers_view(request, tickers, "volatility", True, "Most volatile", "Volatility%")
 
-      result = [{"Ticker": str(t), "Change%": float(chg)} for t, chg in top_losers.items()]
-      logger.info(f"Returning {len(result)} top losers")
-      return JsonResponse(result, safe=False)
-        
-    except Exception as calc_error:
-      logger.error(f"Calculation error for losers: {str(calc_error)}")
-      return JsonResponse({"error": f"Calculation failed: {str(calc_error)}"}, status=400)
-          
-  except Exception as e:
-    logger.error(f"General error in top_losers_view: {str(e)}")
-    return JsonResponse({"error": str(e)}, status=400)
+@http_cache("analytics")
+def volume_spikes_view(request, tickers):
+  return movers_view(request, tickers, "volume_spike", True, "Volume spikes", "VolumeSpike")
 
+@never_cache
 def api_health_check(request):
   return JsonResponse({
     "status": "ok",
     "message": "API is working",
-    "timestamp": pd.Timestamp.now().isoformat()
+    "timestamp": pd.Timestamp.now().isoformat(),
+    "cache": get_cache().stats(),
+    "quote_batching": get_quote_batcher().stats(),
+    "intraday": get_intraday_aggregator().stats(),
+    "upstream": {
+      "circuit": get_circuit_breaker().stats(),
+      "rate_limit": get_rate_limiter().stats(),
+    },
   })
 
-def multiple_stock_news(request, tickers):
+@never_cache
+def metrics_view(request):
+  cache = get_cache().stats()
+  batching = get_quote_batcher().stats()
+  body = registry.render({
+    "stocks_cache_entries": ("Entries held in the in-process provider cache.", cache["entries"]),
+    "stocks_quote_batch_requests": ("Live quote lookups received by the batcher.", batching["requests"]),
+    "stocks_quote_batches": ("Batched live quote downloads made.", batching["batches"]),
+    "stocks_upstream_circuit_open": ("1 while the upstream circuit breaker is open.", int(get_circuit_breaker().state != "closed")),
+    "stocks_upstream_rate_limit": ("Current upstream call rate allowed, per second.", get_rate_limiter().stats()["rate"]),
+  })
+  return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def refresh_news(ticker_list):
+  """Ingest tickers the news poller has not covered lately; returns failures."""
+  store = get_news_store()
+  store.track(ticker_list)
+  store.start()
+  fetched = await fetch_all(store.stale(ticker_list), store.ingest)
+  return {t: e for t, e in fetched.items() if isinstance(e, Exception)}
+
+@http_cache("news")
+async def multiple_stock_news(request, tickers):
   try:
-    ticker_list = [t.strip().upper() for t in tickers.split(",")]
-    results = {}
+    ticker_list = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",")))
+    try:
+      limit = min(int(request.GET.get("limit", 20)), MAX_PAGE)
+    except ValueError:
+      return JsonResponse({"error": "limit must be an integer"}, status=400)
+    if limit < 1:
+      return JsonResponse({"error": "limit must be at least 1"}, status=400)
+    failed = await refresh_news(ticker_list)
+    stored = await sync_to_async(get_news_store().latest)(ticker_list, limit)
 
+    results = {}
     for ticker in ticker_list:
-      try:
-        stock = yf.Ticker(ticker)
-        news_items = stock.news or []
-        formatted_news = []
-
-        for n in news_items:
-          content = n.get("content")
-          if not isinstance(content, dict):
-            continue  # skip if content is None or malformed
-
-          formatted_news.append({
-            "id": n.get("id", "N/A"),
-            "title": content.get("title", "N/A"),
-            "link": content.get("link", "N/A"),
-            "publisher": content.get("publisher", "N/A"),
-            "time": content.get("pubDate", "N/A"),
-            "type": content.get("type", "N/A"),
-            "thumbnail": content.get("thumbnail", {}),
-          })
-
-        results[ticker] = formatted_news if formatted_news else "No news found"
-
-      except Exception as inner_e:
-        results[ticker] = {"error": f"Failed to fetch news: {str(inner_e)}"}
+      news_items = stored.get(ticker)
+      if ticker in failed:
+        if not news_items:
+          results[ticker] = {"error": f"Failed to fetch news: {str(failed[ticker])}"}
+          continue
+        mark_stale()
+      results[ticker] = news_items if news_items else "No news found"
 
     return JsonResponse(results, safe=False)
 
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
 
-def stock_basic_info(request, tickers):
+@http_cache("news")
+async def news_feed(request, tickers):
   try:
-    ticker_list = [t.strip().upper() for t in tickers.split(",")]
-    results = []
+    ticker_list = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",")))
+    try:
+      since = int(request.GET["since"]) if request.GET.get("since") else None
+      limit = int(request.GET.get("limit", 50))
+    except ValueError:
+      return JsonResponse({"error": "since and limit must be integers"}, status=400)
+    if not 1 <= limit <= MAX_PAGE:
+      return JsonResponse({"error": f"limit must be between 1 and {MAX_PAGE}"}, status=400)
+
+    failed = await refresh_news(ticker_list)
+    if failed:
+      mark_stale()
+    page = await sync_to_async(get_news_store().feed)(ticker_list, since, limit)
+    if failed:
+      page["errors"] = {t: f"Failed to fetch news: {str(e)}" for t, e in failed.items()}
+    return JsonResponse(page)
 
-    for ticker in ticker_list:
-      try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+  except Exception as e:
+    return error_response(e)
 
+def fetch_and_index_info(ticker):
+  info = get_provider().info(ticker)
+  get_search_index().index_company(ticker, info)
+  return info
+
+@http_cache("fundamentals")
+async def stock_basic_info(request, tickers):
+  try:
+    ticker_list = [t.strip().upper() for t in tickers.split(",")]
+    fetched = await fetch_all(ticker_list, fetch_and_index_info)
+
+    results = []
+    for ticker, info in fetched.items():
+      if isinstance(info, Exception):
         results.append({
             "Ticker": ticker,
-            "LongBusinessSummary": info.get("longBusinessSummary"),
-            "Sector": info.get("sector"),
-            "FullTimeEmployees": info.get("fullTimeEmployees"),
-            "Website": info.get("website"),
-            "MarketCap": info.get("marketCap"),
-            "Beta": info.get("beta"),
-            "TrailingEPS": info.get("trailingEps"),
-            "TrailingPE": info.get("trailingPE"),
-        })
-      except Exception as inner_e:
-        results.append({
-            "Ticker": ticker,
-            "error": f"Failed to fetch info: {str(inner_e)}"
+            "error": f"Failed to fetch info: {str(info)}"
         })
+        continue
+
+      results.append(basic_info(ticker, info))
 
     return JsonResponse(results, safe=False)
 
   except Exception as e:
-    return JsonResponse({"error": str(e)}, status=400)
+    return error_response(e)
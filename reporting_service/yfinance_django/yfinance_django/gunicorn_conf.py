@@ -0,0 +1,46 @@
+"""
+Gunicorn profile for running several worker processes on one host.
+
+    gunicorn -c python:yfinance_django.gunicorn_conf yfinance_django.wsgi
+
+The app is imported once in the master (``preload_app``), which then syncs
+the watchlist bars into the bar store and publishes the first quotes before
+forking, so every worker starts warm. Workers share market data through the
+SQLite bar store and the "stocks" shared cache: a miss is fetched upstream
+by one worker while the others wait for its result, and only one worker
+polls the watchlists.
+"""
+
+import multiprocessing
+import os
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+preload_app = True
+
+# Read by the settings, which load after this file.
+os.environ.setdefault("STOCKS_WORKER_PROCESSES", str(workers))
+
+# Threads do not survive a fork, so the watchlist and news pollers are
+# started in each worker (where only the elected leader polls quotes)
+# rather than in the master.
+_prefetch = os.environ.get("STOCKS_PREFETCH_ON_STARTUP", "0") == "1"
+_news = os.environ.get("STOCKS_NEWS_POLL_ON_STARTUP", "0") == "1"
+os.environ["STOCKS_PREFETCH_ON_STARTUP"] = "0"
+os.environ["STOCKS_NEWS_POLL_ON_STARTUP"] = "0"
+
+
+def when_ready(server):
+  if os.environ.get("STOCKS_PRELOAD", "1") == "1":
+    from stocks.preload import preload
+    preload()
+
+
+def post_fork(server, worker):
+  if _prefetch:
+    from stocks.prefetch import get_prefetcher
+    get_prefetcher().start()
+  if _news:
+    from stocks.news import get_news_store
+    get_news_store().start()
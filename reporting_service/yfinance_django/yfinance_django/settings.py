@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'stocks.middleware.timing_middleware',
+    'stocks.middleware.compression_middleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.security.SecurityMiddleware',
@@ -139,4 +141,157 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
     "https://financial-ai-apnn.vercel.app",
     "https://financial-ai-07.vercel.app",
-]
\ No newline at end of file
+]
+
+# Market data
+# "yfinance" talks to Yahoo directly, "replay" serves fixtures recorded under
+# STOCKS_REPLAY_DIR and "recording" calls Yahoo while writing those fixtures.
+STOCKS_MARKET_DATA_PROVIDER = os.environ.get("STOCKS_MARKET_DATA_PROVIDER", "yfinance")
+STOCKS_REPLAY_DIR = os.environ.get("STOCKS_REPLAY_DIR", os.path.join(BASE_DIR, "fixtures", "market_data"))
+STOCKS_REPLAY_LATENCY_MS = float(os.environ.get("STOCKS_REPLAY_LATENCY_MS", 0))
+
+# Market data cache
+# Every provider call is cached in-process with a per-data-type TTL. Set
+# STOCKS_SHARED_CACHE to one of the CACHES aliases below to also share
+# entries between worker processes. The "stocks" alias is a file cache on
+# local disk, or a Redis server when STOCKS_CACHE_URL (redis://...) is set.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stocks': {
+        'BACKEND': 'stocks.cache.SharedFileCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'stocks'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+if os.environ.get("STOCKS_CACHE_URL"):
+    CACHES['stocks'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ["STOCKS_CACHE_URL"],
+    }
+
+# Number of worker processes serving the app (set by the gunicorn profile in
+# yfinance_django/gunicorn_conf.py). With more than one, the shared cache is
+# on by default, the upstream rate budget is split between workers and only
+# one of them polls the watchlists.
+STOCKS_WORKER_PROCESSES = int(os.environ.get("STOCKS_WORKER_PROCESSES", 1))
+
+STOCKS_CACHE_ENABLED = os.environ.get("STOCKS_CACHE_ENABLED", "1") == "1"
+STOCKS_CACHE_MAX_ENTRIES = int(os.environ.get("STOCKS_CACHE_MAX_ENTRIES", 2048))
+STOCKS_SHARED_CACHE = os.environ.get("STOCKS_SHARED_CACHE") or ("stocks" if STOCKS_WORKER_PROCESSES > 1 else None)
+# A worker fetching a key holds it this long (seconds) while others wait.
+STOCKS_SHARED_LEASE_SECONDS = float(os.environ.get("STOCKS_SHARED_LEASE_SECONDS", 15))
+# Seconds each kind of upstream data stays cached; kinds missing here are
+# not cached.
+STOCKS_CACHE_TTLS = {
+    "intraday": 60,
+    "daily": 15 * 60,
+    "info": 24 * 60 * 60,
+    "financials": 24 * 60 * 60,
+    "news": 5 * 60,
+}
+
+# Local OHLCV store. Windows are served from here and only the missing tail
+# is fetched upstream once the stored bars are older than the refresh age
+# (seconds). Tickers upstream returned no bars for are retried after "empty".
+STOCKS_BAR_STORE_PATH = os.environ.get("STOCKS_BAR_STORE_PATH", os.path.join(BASE_DIR, "bars.sqlite3"))
+STOCKS_BAR_STORE_REFRESH = {
+    "intraday": 60,
+    "daily": 15 * 60,
+    "empty": 5 * 60,
+}
+
+# The correlation heatmap tracks at most this many recently requested
+# tickers; the least recently requested ones are dropped beyond it.
+STOCKS_CORRELATION_MAX_TICKERS = int(os.environ.get("STOCKS_CORRELATION_MAX_TICKERS", 200))
+
+# Multi-ticker views fetch tickers concurrently: at most this many upstream
+# calls at once, each with its own timeout (seconds).
+STOCKS_FANOUT_CONCURRENCY = int(os.environ.get("STOCKS_FANOUT_CONCURRENCY", 8))
+STOCKS_FANOUT_TIMEOUT = float(os.environ.get("STOCKS_FANOUT_TIMEOUT", 10))
+STOCKS_FANOUT_THREADS = int(os.environ.get("STOCKS_FANOUT_THREADS", 32))
+
+# Live quote lookups arriving within this window (milliseconds) are merged
+# into one upstream download of up to STOCKS_QUOTE_BATCH_MAX tickers.
+STOCKS_QUOTE_BATCH_WINDOW_MS = float(os.environ.get("STOCKS_QUOTE_BATCH_WINDOW_MS", 50))
+STOCKS_QUOTE_BATCH_MAX = int(os.environ.get("STOCKS_QUOTE_BATCH_MAX", 200))
+
+# Live price streaming (server-sent events): one shared poller refreshes all
+# watched tickers every STOCKS_STREAM_POLL_SECONDS.
+STOCKS_STREAM_POLL_SECONDS = float(os.environ.get("STOCKS_STREAM_POLL_SECONDS", 5))
+STOCKS_STREAM_KEEPALIVE_SECONDS = float(os.environ.get("STOCKS_STREAM_KEEPALIVE_SECONDS", 15))
+
+# Watchlists whose latest quotes are refreshed in the background every
+# STOCKS_PREFETCH_INTERVAL_SECONDS and served from memory. The refresher
+# starts on first use, or at startup with STOCKS_PREFETCH_ON_STARTUP=1.
+STOCKS_WATCHLISTS = {
+    "others": ['^NSEI', 'USDINR=X', 'TCS.NS', 'GLD', 'NVDA'],
+}
+STOCKS_PREFETCH_INTERVAL_SECONDS = float(os.environ.get("STOCKS_PREFETCH_INTERVAL_SECONDS", 30))
+STOCKS_PREFETCH_ON_STARTUP = os.environ.get("STOCKS_PREFETCH_ON_STARTUP", "0") == "1"
+
+# Movers (gainers/losers/volatility/volume spikes) are computed once per
+# ticker universe and reused for this many seconds.
+STOCKS_MOVERS_REFRESH_SECONDS = float(os.environ.get("STOCKS_MOVERS_REFRESH_SECONDS", 60))
+
+# Fundamentals snapshots (stored in the database): info is re-checked every
+# STOCKS_FUNDAMENTALS_CHECK_SECONDS, statements are re-fetched when a new
+# reporting period shows up or after STOCKS_FUNDAMENTALS_MAX_AGE_SECONDS.
+STOCKS_FUNDAMENTALS_CHECK_SECONDS = int(os.environ.get("STOCKS_FUNDAMENTALS_CHECK_SECONDS", 6 * 3600))
+STOCKS_FUNDAMENTALS_MAX_AGE_SECONDS = int(os.environ.get("STOCKS_FUNDAMENTALS_MAX_AGE_SECONDS", 7 * 86400))
+
+# Upstream protection: calls to Yahoo go through a token bucket
+# (STOCKS_UPSTREAM_RATE calls/s, bursts of STOCKS_UPSTREAM_BURST) that backs
+# off when throttled, and a circuit breaker that stops calling after
+# STOCKS_CIRCUIT_FAILURES failures in a row. Meanwhile cached data up to
+# STOCKS_CACHE_STALE_SECONDS past its TTL is served, marked X-Data-Stale.
+STOCKS_UPSTREAM_RATE = float(os.environ.get("STOCKS_UPSTREAM_RATE", 5))
+STOCKS_UPSTREAM_BURST = int(os.environ.get("STOCKS_UPSTREAM_BURST", 10))
+STOCKS_UPSTREAM_MAX_WAIT_SECONDS = float(os.environ.get("STOCKS_UPSTREAM_MAX_WAIT_SECONDS", 2))
+STOCKS_CIRCUIT_FAILURES = int(os.environ.get("STOCKS_CIRCUIT_FAILURES", 5))
+STOCKS_CIRCUIT_RESET_SECONDS = float(os.environ.get("STOCKS_CIRCUIT_RESET_SECONDS", 30))
+STOCKS_CACHE_STALE_SECONDS = int(os.environ.get("STOCKS_CACHE_STALE_SECONDS", 24 * 3600))
+
+# Benchmark the portfolio endpoint measures beta against unless a request
+# names another one (an empty value disables it).
+STOCKS_PORTFOLIO_BENCHMARK = os.environ.get("STOCKS_PORTFOLIO_BENCHMARK", "^NSEI")
+
+# Multi-process profile (yfinance_django/gunicorn_conf.py): before forking
+# workers the master syncs these windows of bars for every watchlist ticker
+# and STOCKS_PRELOAD_TICKERS. Set STOCKS_PRELOAD=0 to skip.
+STOCKS_PRELOAD_WINDOWS = [("1y", "1d"), ("1d", "1m")]
+STOCKS_PRELOAD_TICKERS = [t for t in os.environ.get("STOCKS_PRELOAD_TICKERS", "").split(",") if t]
+
+# News: stories are ingested into the database and deduplicated. A poller
+# re-ingests the watchlists, and tickers requested in the last
+# STOCKS_NEWS_TRACK_SECONDS, every STOCKS_NEWS_REFRESH_SECONDS. It runs only
+# in the worker holding the prefetch leader lease, and starts on first use,
+# or at startup with STOCKS_NEWS_POLL_ON_STARTUP=1.
+STOCKS_NEWS_REFRESH_SECONDS = float(os.environ.get("STOCKS_NEWS_REFRESH_SECONDS", 300))
+STOCKS_NEWS_TRACK_SECONDS = float(os.environ.get("STOCKS_NEWS_TRACK_SECONDS", 3600))
+STOCKS_NEWS_POLL_ON_STARTUP = os.environ.get("STOCKS_NEWS_POLL_ON_STARTUP", "0") == "1"
+
+# Full-text search index (SQLite FTS5) over company descriptions and news
+# headlines, filled as fundamentals, stock info and news are fetched.
+STOCKS_SEARCH_INDEX_PATH = os.environ.get("STOCKS_SEARCH_INDEX_PATH", os.path.join(BASE_DIR, "search.sqlite3"))
+
+# HTTP caching: Cache-Control max-age, in seconds, per kind of data the
+# stocks endpoints serve (see stocks/http_cache.py). Responses are
+# compressed with brotli when the package is installed, gzip otherwise.
+STOCKS_HTTP_MAX_AGE = {
+    "quote": int(os.environ.get("STOCKS_HTTP_MAX_AGE_QUOTE", 5)),
+    "intraday": int(os.environ.get("STOCKS_HTTP_MAX_AGE_INTRADAY", 60)),
+    "daily": int(os.environ.get("STOCKS_HTTP_MAX_AGE_DAILY", 300)),
+    "fundamentals": int(os.environ.get("STOCKS_HTTP_MAX_AGE_FUNDAMENTALS", 6 * 3600)),
+    "news": int(os.environ.get("STOCKS_HTTP_MAX_AGE_NEWS", 60)),
+    "analytics": int(os.environ.get("STOCKS_HTTP_MAX_AGE_ANALYTICS", 300)),
+    "search": int(os.environ.get("STOCKS_HTTP_MAX_AGE_SEARCH", 300)),
+}
+
+# Intraday aggregation: the latest STOCKS_INTRADAY_CAPACITY 1m bars per
+# ticker are kept in memory, with 5m/15m/1h/day bars built from them as
+# they arrive. Tickers are refreshed from upstream at most every
+# STOCKS_INTRADAY_REFRESH_SECONDS.
+STOCKS_INTRADAY_CAPACITY = int(os.environ.get("STOCKS_INTRADAY_CAPACITY", 2000))
+STOCKS_INTRADAY_REFRESH_SECONDS = float(os.environ.get("STOCKS_INTRADAY_REFRESH_SECONDS", 5))